@@ -7,25 +7,34 @@ import discord
 from discord.ext import commands
 import logging
 from datetime import datetime
-from config import (
-    MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID,
-    MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID,
-    MINECRAFT_ADMIN_EMBED_COLOR,
-    MINECRAFT_ADMIN_TITLE,
-    MINECRAFT_ADMIN_DESCRIPTION,
-    MINECRAFT_ADMIN_FIELDS,
-    MINECRAFT_ADMIN_BUTTON_LABEL,
-    DISCORD_ADMIN_APPLICATION_CHANNEL_ID,
-    DISCORD_ADMIN_RESPONSES_CHANNEL_ID,
-    DISCORD_ADMIN_EMBED_COLOR,
-    DISCORD_ADMIN_TITLE,
-    DISCORD_ADMIN_DESCRIPTION,
-    DISCORD_ADMIN_FIELDS,
-    DISCORD_ADMIN_BUTTON_LABEL
+from embed_templates import guild_icon_url
+from config_store import get_config
+from sharding import owns_guild
+from outbound import Priority, schedule
+from panel_registry import get_panel_registry
+from admission import admit, refund
+from dm_queue import get_dm_queue
+from metrics import REGISTRY
+from application_store import (
+    get_application_store,
+    STATUSES,
+    APPLICATION_TYPES,
+    PENDING,
+    REVIEWING,
+    ACCEPTED,
+    REJECTED,
+    FINAL_STATUSES,
+    MINECRAFT,
+    DISCORD
 )
+from config import APPLICATIONS_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Метрики заявок
+APPLICATIONS_SUBMITTED = REGISTRY.counter('limonericx_applications_submitted_total', 'Поданные заявки', ('type',))
+APPLICATION_DECISIONS = REGISTRY.counter('limonericx_application_decisions_total', 'Решения по заявкам', ('type', 'status'))
+
 class MinecraftAdminApplicationModal(discord.ui.Modal, title='Заявка в администрацию Minecraft'):
     def __init__(self):
         super().__init__()
@@ -61,6 +70,7 @@ class MinecraftAdminApplicationModal(discord.ui.Modal, title='Заявка в а
     )
 
     async def on_submit(self, interaction: discord.Interaction):
+        admitted = False  # токен заявки потрачен, а заявка ещё не отправлена
         try:
             # Проверяем возраст
             try:
@@ -78,10 +88,16 @@ class MinecraftAdminApplicationModal(discord.ui.Modal, title='Заявка в а
                 )
                 return
             
+            config = get_config(interaction.client).snapshot.guild(interaction.guild_id)
+            if config is None:
+                await interaction.response.send_message("❌ Заявки на этом сервере не принимаются.", ephemeral=True)
+                return
+            section = config['minecraft_admin']
+            
             # Создаем embed для заявки
             embed = discord.Embed(
                 title="🛡️ Новая заявка в администрацию Minecraft",
-                color=MINECRAFT_ADMIN_EMBED_COLOR,
+                color=section['color'],
                 timestamp=datetime.now()
             )
             
@@ -122,12 +138,39 @@ class MinecraftAdminApplicationModal(discord.ui.Modal, title='Заявка в а
             )
             
             # Создаем кнопки для рассмотрения заявки
-            view = ApplicationReviewView(application_type="minecraft")
+            view = ApplicationReviewView()
             
             # Отправляем заявку в канал рассмотрения
-            responses_channel = interaction.guild.get_channel(MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID)
+            responses_channel = interaction.guild.get_channel(section['responses_channel_id'])
             if responses_channel:
-                await responses_channel.send(embed=embed, view=view)
+                # Токен заявки тратится только на заявку, которую есть куда отправить
+                if not await admit(interaction, 'application:submit', 'minecraft', self.minecraft_nick.value, self.reason.value):
+                    return
+                admitted = True
+                
+                # Подтверждаем форму до отправки: отправка в канал рассмотрения может ждать очереди
+                await interaction.response.defer(ephemeral=True, thinking=True)
+                
+                # Заявка сохраняется в хранилище, сообщение в канале рассмотрения - её карточка
+                store = get_application_store(interaction.client)
+                store.create(
+                    interaction.id, interaction.user.id, interaction.user.name, 'minecraft',
+                    self.minecraft_nick.value, age_num, self.reason.value, self.experience.value,
+                    guild_id=interaction.guild_id
+                )
+                try:
+                    message = await schedule(
+                        interaction.client,
+                        Priority.STAFF,
+                        ('send', responses_channel.id),
+                        lambda: responses_channel.send(embed=embed, view=view)
+                    )
+                except Exception:
+                    store.discard(interaction.id)
+                    raise
+                if message is not None:
+                    store.attach_message(interaction.id, message.id)
+                admitted = False
                 
                 # Отвечаем пользователю
                 success_embed = discord.Embed(
@@ -135,15 +178,22 @@ class MinecraftAdminApplicationModal(discord.ui.Modal, title='Заявка в а
                     description=f"Ваша заявка в администрацию Minecraft отправлена на рассмотрение.\n\nИгровой ник: `{self.minecraft_nick.value}`\nРезультат рассмотрения сообщат в личные сообщения в течение 3-7 дней.",
                     color=0x00ff00
                 )
-                await interaction.response.send_message(embed=success_embed, ephemeral=True)
+                await interaction.followup.send(embed=success_embed, ephemeral=True)
                 
+                APPLICATIONS_SUBMITTED.labels('minecraft').inc()
                 logger.info(f'Подана заявка в администрацию Minecraft от {interaction.user.name} (ник: {self.minecraft_nick.value})')
             else:
                 await interaction.response.send_message("❌ Ошибка: канал для заявок не найден!", ephemeral=True)
                 
         except Exception as e:
             logger.error(f'Ошибка при подаче заявки в администрацию Minecraft: {e}')
-            await interaction.response.send_message("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
+            if admitted:
+                # Заявка не отправлена по вине бота - повторная подача не должна ждать 5 минут
+                refund(interaction, 'application:submit')
+            if interaction.response.is_done():
+                await interaction.followup.send("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
+            else:
+                await interaction.response.send_message("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
 
 class DiscordAdminApplicationModal(discord.ui.Modal, title='Заявка в администрацию Discord'):
     def __init__(self):
@@ -180,6 +230,7 @@ class DiscordAdminApplicationModal(discord.ui.Modal, title='Заявка в ад
     )
 
     async def on_submit(self, interaction: discord.Interaction):
+        admitted = False  # токен заявки потрачен, а заявка ещё не отправлена
         try:
             # Проверяем возраст
             try:
@@ -197,10 +248,16 @@ class DiscordAdminApplicationModal(discord.ui.Modal, title='Заявка в ад
                 )
                 return
             
+            config = get_config(interaction.client).snapshot.guild(interaction.guild_id)
+            if config is None:
+                await interaction.response.send_message("❌ Заявки на этом сервере не принимаются.", ephemeral=True)
+                return
+            section = config['discord_admin']
+            
             # Создаем embed для заявки
             embed = discord.Embed(
                 title="🎫 Новая заявка в администрацию Discord",
-                color=DISCORD_ADMIN_EMBED_COLOR,
+                color=section['color'],
                 timestamp=datetime.now()
             )
             
@@ -241,12 +298,39 @@ class DiscordAdminApplicationModal(discord.ui.Modal, title='Заявка в ад
             )
             
             # Создаем кнопки для рассмотрения заявки
-            view = ApplicationReviewView(application_type="discord")
+            view = ApplicationReviewView()
             
             # Отправляем заявку в канал рассмотрения
-            responses_channel = interaction.guild.get_channel(DISCORD_ADMIN_RESPONSES_CHANNEL_ID)
+            responses_channel = interaction.guild.get_channel(section['responses_channel_id'])
             if responses_channel:
-                await responses_channel.send(embed=embed, view=view)
+                # Токен заявки тратится только на заявку, которую есть куда отправить
+                if not await admit(interaction, 'application:submit', 'discord', self.discord_nick.value, self.reason.value):
+                    return
+                admitted = True
+                
+                # Подтверждаем форму до отправки: отправка в канал рассмотрения может ждать очереди
+                await interaction.response.defer(ephemeral=True, thinking=True)
+                
+                # Заявка сохраняется в хранилище, сообщение в канале рассмотрения - её карточка
+                store = get_application_store(interaction.client)
+                store.create(
+                    interaction.id, interaction.user.id, interaction.user.name, 'discord',
+                    self.discord_nick.value, age_num, self.reason.value, self.experience.value,
+                    guild_id=interaction.guild_id
+                )
+                try:
+                    message = await schedule(
+                        interaction.client,
+                        Priority.STAFF,
+                        ('send', responses_channel.id),
+                        lambda: responses_channel.send(embed=embed, view=view)
+                    )
+                except Exception:
+                    store.discard(interaction.id)
+                    raise
+                if message is not None:
+                    store.attach_message(interaction.id, message.id)
+                admitted = False
                 
                 # Отвечаем пользователю
                 success_embed = discord.Embed(
@@ -254,188 +338,345 @@ class DiscordAdminApplicationModal(discord.ui.Modal, title='Заявка в ад
                     description=f"Ваша заявка в администрацию Discord отправлена на рассмотрение.\n\nDiscord ник: `{self.discord_nick.value}`\nРезультат рассмотрения сообщат в личные сообщения в течение 2-5 дней.",
                     color=0x00ff00
                 )
-                await interaction.response.send_message(embed=success_embed, ephemeral=True)
+                await interaction.followup.send(embed=success_embed, ephemeral=True)
                 
+                APPLICATIONS_SUBMITTED.labels('discord').inc()
                 logger.info(f'Подана заявка в администрацию Discord от {interaction.user.name} (ник: {self.discord_nick.value})')
             else:
                 await interaction.response.send_message("❌ Ошибка: канал для заявок не найден!", ephemeral=True)
                 
         except Exception as e:
             logger.error(f'Ошибка при подаче заявки в администрацию Discord: {e}')
-            await interaction.response.send_message("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
+            if admitted:
+                # Заявка не отправлена по вине бота - повторная подача не должна ждать 5 минут
+                refund(interaction, 'application:submit')
+            if interaction.response.is_done():
+                await interaction.followup.send("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
+            else:
+                await interaction.response.send_message("❌ Произошла ошибка при подаче заявки. Попробуйте позже.", ephemeral=True)
+
+DECISION_MESSAGES = {
+    ACCEPTED: (
+        "✅ Заявка принята",
+        "Ваша заявка в администрацию {server} принята! В ближайшее время с вами свяжутся и выдадут тестовое задание.",
+        0x00ff00
+    ),
+    REJECTED: (
+        "❌ Заявка отклонена",
+        "К сожалению, ваша заявка в администрацию {server} отклонена. Вы можете подать новую заявку позже.",
+        0xff0000
+    ),
+}
+
+def notify_decision(client, record):
+    """Постановка личного сообщения о решении в очередь (доставка идёт в фоне)"""
+    if record is None or record.status not in DECISION_MESSAGES:
+        return
+    title, description, color = DECISION_MESSAGES[record.status]
+    server = 'Minecraft' if record.application_type == 'minecraft' else 'Discord'
+    embed = discord.Embed(title=title, description=description.format(server=server), color=color)
+    embed.set_footer(text=f"ID заявки: {record.application_id}")
+    get_dm_queue(client).enqueue(
+        record.applicant_id,
+        f'application:{record.status}',
+        embed=embed,
+        key=f'application:{record.application_id}:decision'
+    )
 
 class ApplicationReviewView(discord.ui.View):
-    def __init__(self, application_type):
+    """
+    Кнопки рассмотрения заявки. View постоянная и общая для всех карточек:
+    заявка определяется по сообщению, её тип и статус берутся из хранилища
+    """
+    
+    def __init__(self, status=PENDING):
         super().__init__(timeout=None)
-        self.application_type = application_type
+        final = status in FINAL_STATUSES
+        self.accept_application.disabled = final
+        self.reject_application.disabled = final
+        self.review_application.disabled = final or status == REVIEWING
     
-    @discord.ui.button(label='✅ Принять', style=discord.ButtonStyle.green)
-    async def accept_application(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = interaction.message.embeds[0]
-        embed.color = 0x00ff00  # Зеленый - принято
-        embed.title = embed.title.replace("Новая заявка", "✅ Принятая заявка")
-        
-        embed.add_field(
-            name="👨‍💼 Принял заявку",
-            value=interaction.user.mention,
-            inline=True
-        )
+    async def _decide(self, interaction, status, color, title, field_name):
+        """Запись решения и обновление карточки. Возвращает тип заявки; None - решение не записано (ответ уже отправлен)"""
+        if not await admit(interaction, 'application:review'):
+            return None
         
-        # Отключаем кнопки
-        for item in self.children:
-            if hasattr(item, 'disabled'):
-                item.disabled = True
+        store = get_application_store(interaction.client)
+        record = store.by_message(interaction.message.id)
+        if record is not None:
+            application_type = record.application_type
+            if store.set_status(interaction.message.id, status, interaction.user.id) is None:
+                await interaction.response.send_message("❌ По этой заявке уже принято решение.", ephemeral=True)
+                return None
+            record.status = status
+            notify_decision(interaction.client, record)
+        else:
+            # Карточка подана до появления хранилища: обновляется только сообщение
+            application_type = MINECRAFT if 'Minecraft' in (interaction.message.embeds[0].title or '') else DISCORD
         
-        await interaction.response.edit_message(embed=embed, view=self)
-        
-        logger.info(f'Заявка в администрацию {self.application_type} принята пользователем {interaction.user.name}')
-    
-    @discord.ui.button(label='❌ Отклонить', style=discord.ButtonStyle.red)
-    async def reject_application(self, interaction: discord.Interaction, button: discord.ui.Button):
         embed = interaction.message.embeds[0]
-        embed.color = 0xff0000  # Красный - отклонено
-        embed.title = embed.title.replace("Новая заявка", "❌ Отклоненная заявка")
+        embed.color = color
+        embed.title = embed.title.replace("Новая заявка", title)
         
         embed.add_field(
-            name="👨‍💼 Отклонил заявку",
+            name=field_name,
             value=interaction.user.mention,
             inline=True
         )
         
-        # Отключаем кнопки
-        for item in self.children:
-            if hasattr(item, 'disabled'):
-                item.disabled = True
-        
-        await interaction.response.edit_message(embed=embed, view=self)
+        # Общая view не меняется: карточка получает новую с кнопками для нового статуса
+        await interaction.response.edit_message(embed=embed, view=ApplicationReviewView(status))
         
-        logger.info(f'Заявка в администрацию {self.application_type} отклонена пользователем {interaction.user.name}')
+        APPLICATION_DECISIONS.labels(application_type, status).inc()
+        return application_type
+    
+    @discord.ui.button(label='✅ Принять', style=discord.ButtonStyle.green, custom_id="application:accept")
+    async def accept_application(self, interaction: discord.Interaction, button: discord.ui.Button):
+        application_type = await self._decide(interaction, ACCEPTED, 0x00ff00, "✅ Принятая заявка", "👨‍💼 Принял заявку")
+        if application_type:
+            logger.info(f'Заявка в администрацию {application_type} принята пользователем {interaction.user.name}')
+    
+    @discord.ui.button(label='❌ Отклонить', style=discord.ButtonStyle.red, custom_id="application:reject")
+    async def reject_application(self, interaction: discord.Interaction, button: discord.ui.Button):
+        application_type = await self._decide(interaction, REJECTED, 0xff0000, "❌ Отклоненная заявка", "👨‍💼 Отклонил заявку")
+        if application_type:
+            logger.info(f'Заявка в администрацию {application_type} отклонена пользователем {interaction.user.name}')
     
-    @discord.ui.button(label='📋 На рассмотрении', style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label='📋 На рассмотрении', style=discord.ButtonStyle.secondary, custom_id="application:review")
     async def review_application(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = interaction.message.embeds[0]
-        embed.color = 0xffaa00  # Оранжевый - на рассмотрении
-        embed.title = embed.title.replace("Новая заявка", "📋 Заявка на рассмотрении")
-        
-        embed.add_field(
-            name="👀 Взял на рассмотрение",
-            value=interaction.user.mention,
-            inline=True
-        )
-        
-        button.disabled = True
-        await interaction.response.edit_message(embed=embed, view=self)
-        
-        logger.info(f'Заявка в администрацию {self.application_type} взята на рассмотрение пользователем {interaction.user.name}')
+        application_type = await self._decide(interaction, REVIEWING, 0xffaa00, "📋 Заявка на рассмотрении", "👀 Взял на рассмотрение")
+        if application_type:
+            logger.info(f'Заявка в администрацию {application_type} взята на рассмотрение пользователем {interaction.user.name}')
 
 class MinecraftAdminApplicationView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, label=None):
         super().__init__(timeout=None)
+        if label is not None:
+            self.create_minecraft_application.label = label
     
-    @discord.ui.button(label=MINECRAFT_ADMIN_BUTTON_LABEL, style=discord.ButtonStyle.primary, emoji="🛡️")
+    @discord.ui.button(label='📝 Подать заявку', style=discord.ButtonStyle.primary, emoji="🛡️", custom_id="applications:minecraft")
     async def create_minecraft_application(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not await admit(interaction, 'application:open'):
+            return
+        
         modal = MinecraftAdminApplicationModal()
         await interaction.response.send_modal(modal)
 
 class DiscordAdminApplicationView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, label=None):
         super().__init__(timeout=None)
+        if label is not None:
+            self.create_discord_application.label = label
     
-    @discord.ui.button(label=DISCORD_ADMIN_BUTTON_LABEL, style=discord.ButtonStyle.primary, emoji="🎫")
+    @discord.ui.button(label='📝 Подать заявку', style=discord.ButtonStyle.primary, emoji="🎫", custom_id="applications:discord")
     async def create_discord_application(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not await admit(interaction, 'application:open'):
+            return
+        
         modal = DiscordAdminApplicationModal()
         await interaction.response.send_modal(modal)
 
-async def setup_minecraft_admin_applications(bot):
-    """Настройка системы заявок в администрацию Minecraft"""
-    try:
-        application_channel = bot.get_channel(MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID)
-        if not application_channel:
-            logger.error(f'Канал для заявок в администрацию Minecraft не найден: {MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID}')
-            return
-        
-        # Создаем красивое сообщение с информацией о заявках
-        embed = discord.Embed(
-            title=MINECRAFT_ADMIN_TITLE,
-            description=MINECRAFT_ADMIN_DESCRIPTION,
-            color=MINECRAFT_ADMIN_EMBED_COLOR
-        )
-        
-        # Добавляем поля с информацией
-        for field in MINECRAFT_ADMIN_FIELDS:
-            embed.add_field(
-                name=field["name"],
-                value=field["value"],
-                inline=field["inline"]
-            )
-        
-        embed.set_footer(
-            text="Администрация Limonericx • Присоединяйтесь к нашей команде!",
-            icon_url=application_channel.guild.icon.url if application_channel.guild.icon else None
+STATUS_TITLES = {
+    PENDING: "🆕 Новые",
+    REVIEWING: "📋 На рассмотрении",
+    ACCEPTED: "✅ Принятые",
+    REJECTED: "❌ Отклоненные",
+}
+
+TYPE_TITLES = {
+    'minecraft': "Minecraft",
+    'discord': "Discord",
+}
+
+# Тип заявки -> раздел конфигурации с её каналами
+APPLICATION_SECTIONS = {
+    'minecraft': 'minecraft_admin',
+    'discord': 'discord_admin',
+}
+
+def applications_page_embed(config, store, records, filters, page):
+    """Embed со страницей заявок сервера (config - конфигурация этого сервера)"""
+    parts = [STATUS_TITLES[filters['status']] if filters['status'] else "📂 Все"]
+    if filters['application_type']:
+        parts.append(TYPE_TITLES[filters['application_type']])
+    if filters['applicant_id']:
+        parts.append(f"от <@{filters['applicant_id']}>")
+    
+    embed = discord.Embed(
+        title="Заявки в администрацию",
+        description=" · ".join(parts),
+        color=0x5865f2
+    )
+    
+    if not records:
+        embed.add_field(name="Пусто", value="Заявок по этому фильтру нет.", inline=False)
+    for record in records:
+        created = f"<t:{int(record.created_at)}:d>"
+        value = f"<@{record.applicant_id}> · `{record.nick}` · {record.age} лет · {created}"
+        if record.reviewer_id:
+            value += f"\nРассмотрел: <@{record.reviewer_id}>"
+        if record.message_id:
+            channel_id = config[APPLICATION_SECTIONS[record.application_type]]['responses_channel_id']
+            value += f"\n[Карточка заявки](https://discord.com/channels/{config.guild_id}/{channel_id}/{record.message_id})"
+        embed.add_field(
+            name=f"{STATUS_TITLES[record.status]} · {TYPE_TITLES.get(record.application_type, record.application_type)} · #{record.application_id}",
+            value=value,
+            inline=False
         )
-        
-        # Создаем кнопку для подачи заявки
-        view = MinecraftAdminApplicationView()
-        
-        # Очищаем канал от старых сообщений бота
-        async for message in application_channel.history(limit=10):
-            if message.author == bot.user:
-                try:
-                    await message.delete()
-                except:
-                    pass
-        
-        # Отправляем новое сообщение с системой заявок
-        await application_channel.send(embed=embed, view=view)
-        
-        logger.info(f'Система заявок в администрацию Minecraft настроена в канале: {application_channel.name}')
-        
-    except Exception as e:
-        logger.error(f'Ошибка настройки системы заявок в администрацию Minecraft: {e}')
+    
+    counts = store.counts(filters['application_type'], config.guild_id, applicant_id=filters['applicant_id'])
+    embed.set_footer(text=f"Страница {page} · " + " · ".join(f"{STATUS_TITLES[status]}: {counts[status]}" for status in STATUSES))
+    return embed
 
-async def setup_discord_admin_applications(bot):
-    """Настройка системы заявок в администрацию Discord"""
-    try:
-        application_channel = bot.get_channel(DISCORD_ADMIN_APPLICATION_CHANNEL_ID)
-        if not application_channel:
-            logger.error(f'Канал для заявок в администрацию Discord не найден: {DISCORD_ADMIN_APPLICATION_CHANNEL_ID}')
-            return
-        
-        # Создаем красивое сообщение с информацией о заявках
-        embed = discord.Embed(
-            title=DISCORD_ADMIN_TITLE,
-            description=DISCORD_ADMIN_DESCRIPTION,
-            color=DISCORD_ADMIN_EMBED_COLOR
+class ApplicationsPageView(discord.ui.View):
+    """Листание заявок по курсору (только для вызвавшего команду)"""
+    
+    def __init__(self, author_id, config, filters, cursor, page=1):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.config = config  # конфигурация сервера на момент вызова команды
+        self.filters = filters
+        self.cursor = cursor
+        self.page = page
+        self.next_page.disabled = cursor is None
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Листать может только тот, кто вызвал команду.", ephemeral=True)
+            return False
+        return True
+    
+    @discord.ui.button(label='Далее ▶', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        store = get_application_store(interaction.client)
+        records, cursor = store.search(
+            applicant_id=self.filters['applicant_id'],
+            application_type=self.filters['application_type'],
+            status=self.filters['status'],
+            cursor=self.cursor,
+            limit=APPLICATIONS_PAGE_SIZE,
+            guild_id=self.config.guild_id
         )
-        
-        # Добавляем поля с информацией
-        for field in DISCORD_ADMIN_FIELDS:
-            embed.add_field(
-                name=field["name"],
-                value=field["value"],
-                inline=field["inline"]
+        view = ApplicationsPageView(self.author_id, self.config, self.filters, cursor, self.page + 1)
+        embed = applications_page_embed(self.config, store, records, self.filters, view.page)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+async def send_applications_page(ctx, tokens):
+    """
+    Первая страница заявок для команды рецензента.
+    Фильтры в любом порядке: статус (pending, reviewing, accepted, rejected, all),
+    тип (minecraft, discord) и участник (упоминание или ID)
+    """
+    filters = {'status': PENDING, 'application_type': None, 'applicant_id': None}
+    status_given = False
+    for token in tokens:
+        lowered = token.lower()
+        if lowered in STATUSES or lowered == 'all':
+            filters['status'] = None if lowered == 'all' else lowered
+            status_given = True
+        elif lowered in APPLICATION_TYPES:
+            filters['application_type'] = lowered
+        else:
+            try:
+                member = await commands.UserConverter().convert(ctx, token)
+            except commands.BadArgument:
+                await ctx.send(f"❌ Неизвестный фильтр `{token}`. Пример: `!applications pending minecraft @участник`")
+                return
+            filters['applicant_id'] = member.id
+    
+    # Заявки конкретного участника по умолчанию показываются все, а не только новые
+    if filters['applicant_id'] and not status_given:
+        filters['status'] = None
+    
+    # Рецензент видит заявки только того сервера, где вызвал команду
+    config = get_config(ctx.bot).snapshot.guild(ctx.guild.id) if ctx.guild else None
+    if config is None:
+        await ctx.send("❌ Заявки на этом сервере не принимаются.")
+        return
+    
+    store = get_application_store(ctx.bot)
+    records, cursor = store.search(
+        applicant_id=filters['applicant_id'],
+        application_type=filters['application_type'],
+        status=filters['status'],
+        limit=APPLICATIONS_PAGE_SIZE,
+        guild_id=config.guild_id
+    )
+    view = ApplicationsPageView(ctx.author.id, config, filters, cursor)
+    await ctx.send(embed=applications_page_embed(config, store, records, filters, view.page), view=view)
+
+async def setup_minecraft_admin_applications(bot, guild_ids=None):
+    """
+    Настройка системы заявок в администрацию Minecraft на серверах guild_ids (None - на всех настроенных).
+    Ошибка на одном сервере не мешает остальным; если такие были, в конце выбрасывается RuntimeError
+    """
+    snapshot = get_config(bot).snapshot
+    failed = []
+    for guild_id in (snapshot.guilds if guild_ids is None else guild_ids):
+        config = snapshot.guild(guild_id)
+        if config is None or config['minecraft_admin']['application_channel_id'] is None or not owns_guild(bot, guild_id):
+            continue  # сервер убран из конфигурации, заявки на нём не принимаются или его обслуживает другой процесс
+        try:
+            section = config['minecraft_admin']
+            application_channel = bot.get_channel(section['application_channel_id'])
+            if not application_channel:
+                logger.error(f"Канал для заявок в администрацию Minecraft не найден: {section['application_channel_id']}")
+                failed.append(guild_id)
+                continue
+            
+            # Создаем красивое сообщение с информацией о заявках
+            embed = config.templates['minecraft_admin'].render(
+                footer_icon_url=guild_icon_url(application_channel.guild)
             )
-        
-        embed.set_footer(
-            text="Администрация Discord Limonericx • Помогите нам модерировать сервер!",
-            icon_url=application_channel.guild.icon.url if application_channel.guild.icon else None
-        )
-        
-        # Создаем кнопку для подачи заявки
-        view = DiscordAdminApplicationView()
-        
-        # Очищаем канал от старых сообщений бота
-        async for message in application_channel.history(limit=10):
-            if message.author == bot.user:
-                try:
-                    await message.delete()
-                except:
-                    pass
-        
-        # Отправляем новое сообщение с системой заявок
-        await application_channel.send(embed=embed, view=view)
-        
-        logger.info(f'Система заявок в администрацию Discord настроена в канале: {application_channel.name}')
-        
-    except Exception as e:
-        logger.error(f'Ошибка настройки системы заявок в администрацию Discord: {e}')
\ No newline at end of file
+            
+            # Создаем кнопку для подачи заявки
+            view = MinecraftAdminApplicationView(section['button_label'])
+            
+            # Публикуем панель или обновляем существующую на месте
+            await get_panel_registry(bot).ensure_panel(bot, config.panel_name('minecraft_admin'), application_channel, embed, view)
+            
+            logger.info(f'Система заявок в администрацию Minecraft настроена в канале: {application_channel.name}')
+            
+        except Exception as e:
+            logger.error(f'Ошибка настройки системы заявок в администрацию Minecraft на сервере {guild_id}: {e}')
+            failed.append(guild_id)
+    if failed:
+        raise RuntimeError(f'заявки в администрацию Minecraft не настроены на серверах: {", ".join(map(str, failed))}')
+
+async def setup_discord_admin_applications(bot, guild_ids=None):
+    """
+    Настройка системы заявок в администрацию Discord на серверах guild_ids (None - на всех настроенных).
+    Ошибка на одном сервере не мешает остальным; если такие были, в конце выбрасывается RuntimeError
+    """
+    snapshot = get_config(bot).snapshot
+    failed = []
+    for guild_id in (snapshot.guilds if guild_ids is None else guild_ids):
+        config = snapshot.guild(guild_id)
+        if config is None or config['discord_admin']['application_channel_id'] is None or not owns_guild(bot, guild_id):
+            continue  # сервер убран из конфигурации, заявки на нём не принимаются или его обслуживает другой процесс
+        try:
+            section = config['discord_admin']
+            application_channel = bot.get_channel(section['application_channel_id'])
+            if not application_channel:
+                logger.error(f"Канал для заявок в администрацию Discord не найден: {section['application_channel_id']}")
+                failed.append(guild_id)
+                continue
+            
+            # Создаем красивое сообщение с информацией о заявках
+            embed = config.templates['discord_admin'].render(
+                footer_icon_url=guild_icon_url(application_channel.guild)
+            )
+            
+            # Создаем кнопку для подачи заявки
+            view = DiscordAdminApplicationView(section['button_label'])
+            
+            # Публикуем панель или обновляем существующую на месте
+            await get_panel_registry(bot).ensure_panel(bot, config.panel_name('discord_admin'), application_channel, embed, view)
+            
+            logger.info(f'Система заявок в администрацию Discord настроена в канале: {application_channel.name}')
+            
+        except Exception as e:
+            logger.error(f'Ошибка настройки системы заявок в администрацию Discord на сервере {guild_id}: {e}')
+            failed.append(guild_id)
+    if failed:
+        raise RuntimeError(f'заявки в администрацию Discord не настроены на серверах: {", ".join(map(str, failed))}')
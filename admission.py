@@ -0,0 +1,167 @@
+"""
+Контроль допуска для кнопок и форм
+Ограничивает, как часто один пользователь может выполнять действие (открыть тикет,
+подать заявку), и отсекает повторную отправку той же формы. Память ограничена:
+записи вытесняются по LRU и по времени простоя
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from metrics import Counter
+from outbound import TokenBucket
+from state_backend import SharedTokenBucket, get_state_backend
+from config import ADMISSION_LIMITS, ADMISSION_MAX_ENTRIES, ADMISSION_TTL, ADMISSION_DEDUPE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Причины отказа
+RATE_LIMITED = 'rate_limited'
+DUPLICATE = 'duplicate'
+
+class Rejection:
+    """Отказ в допуске: причина и через сколько секунд можно повторить"""
+
+    __slots__ = ('reason', 'retry_after')
+
+    def __init__(self, reason, retry_after=0.0):
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def message(self):
+        """Текст для пользователя"""
+        if self.reason == DUPLICATE:
+            return "⚠️ Вы уже отправили такую же форму совсем недавно, она обрабатывается."
+        return f"⏳ Слишком много запросов. Попробуйте снова через {max(1, round(self.retry_after))} с."
+
+class _Entry:
+    """Состояние одной пары (пользователь, действие)"""
+
+    __slots__ = ('bucket', 'fingerprint', 'fingerprint_at', 'touched_at')
+
+    def __init__(self, bucket, now):
+        self.bucket = bucket
+        self.fingerprint = None
+        self.fingerprint_at = 0.0
+        self.touched_at = now
+
+class AdmissionController:
+    """
+    Token bucket на пару (пользователь, действие) и проверка повторов в памяти.
+    С общим бэкендом состояния bucket'ы общие для всех процессов: пользователь с нескольких
+    серверов на разных шардах получает один лимит, а не по лимиту на процесс
+    """
+
+    def __init__(self, limits=None, max_entries=ADMISSION_MAX_ENTRIES, ttl=ADMISSION_TTL,
+                 dedupe_window=ADMISSION_DEDUPE_WINDOW, backend=None):
+        self.limits = dict(ADMISSION_LIMITS if limits is None else limits)
+        self.backend = backend if backend is not None and backend.shared else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dedupe_window = dedupe_window
+        self._entries = OrderedDict()  # (ID пользователя, действие) -> _Entry, от давних к свежим
+
+        # Метрики
+        self.admitted = defaultdict(Counter)   # действие -> допущено
+        self.rejected = defaultdict(Counter)   # (действие, причина) -> отказано
+        self.refunded = defaultdict(Counter)   # действие -> возвращено токенов
+        self.evicted = Counter()
+
+    @staticmethod
+    def fingerprint(*values):
+        """Отпечаток содержимого формы для поиска повторов"""
+        raw = '\x1f'.join(' '.join(str(value).split()).casefold() for value in values)
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).digest()
+
+    def _evict(self, now):
+        """Вытеснение простаивающих записей и переполнения (с начала - самые давние)"""
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.touched_at < self.ttl:
+                break
+            del self._entries[key]
+            self.evicted.inc()
+
+    def _entry(self, user_id, action, now):
+        key = (user_id, action)
+        entry = self._entries.get(key)
+        if entry is None:
+            rate, capacity = self.limits.get(action, self.limits['default'])
+            if self.backend is not None:
+                bucket = SharedTokenBucket(self.backend, f'admission:{user_id}:{action}', rate, capacity)
+            else:
+                bucket = TokenBucket(rate, capacity)
+            entry = self._entries[key] = _Entry(bucket, now)
+            self._evict(now)
+        else:
+            self._entries.move_to_end(key)
+        entry.touched_at = now
+        return entry
+
+    def check(self, user_id, action, fingerprint=None):
+        """Проверка допуска: None - действие разрешено, иначе Rejection"""
+        now = time.monotonic()
+        entry = self._entry(user_id, action, now)
+
+        if (fingerprint is not None and fingerprint == entry.fingerprint
+                and now - entry.fingerprint_at < self.dedupe_window):
+            self.rejected[(action, DUPLICATE)].inc()
+            return Rejection(DUPLICATE)
+
+        if not entry.bucket.try_acquire(now):
+            self.rejected[(action, RATE_LIMITED)].inc()
+            return Rejection(RATE_LIMITED, entry.bucket.delay(now))
+
+        if fingerprint is not None:
+            entry.fingerprint = fingerprint
+            entry.fingerprint_at = now
+        self.admitted[action].inc()
+        return None
+
+    def refund(self, user_id, action):
+        """
+        Возврат токена допущенного действия, которое не состоялось по вине бота
+        (не удалось отправить заявку и т.п.); повтор той же формы снова разрешён
+        """
+        entry = self._entries.get((user_id, action))
+        if entry is None:
+            return
+        entry.bucket.refund()
+        entry.fingerprint = None
+        self.refunded[action].inc()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'evicted': self.evicted.value,
+            'admitted': {action: counter.value for action, counter in self.admitted.items()},
+            'rejected': {f'{action}:{reason}': counter.value for (action, reason), counter in self.rejected.items()},
+            'refunded': {action: counter.value for action, counter in self.refunded.items()},
+        }
+
+def get_admission(bot):
+    """Общий контроль допуска бота (создаётся при первом обращении)"""
+    admission = getattr(bot, 'admission', None)
+    if admission is None:
+        admission = AdmissionController(backend=get_state_backend(bot))
+        bot.admission = admission
+    return admission
+
+async def admit(interaction, action, *form_values):
+    """
+    Проверка допуска перед обработкой кнопки или формы.
+    При отказе пользователь получает скрытый ответ, функция возвращает False
+    """
+    fingerprint = AdmissionController.fingerprint(*form_values) if form_values else None
+    rejection = get_admission(interaction.client).check(interaction.user.id, action, fingerprint)
+    if rejection is None:
+        return True
+
+    logger.info(f'Отклонено действие {action} пользователя {interaction.user.name}: {rejection.reason}')
+    await interaction.response.send_message(rejection.message(), ephemeral=True)
+    return False
+
+def refund(interaction, action):
+    """Возврат токена действия, допущенного admit(), если само действие не удалось"""
+    get_admission(interaction.client).refund(interaction.user.id, action)
@@ -0,0 +1,228 @@
+"""
+Хранилище заявок в администрацию
+Заявки (автор, тип, статус, ответы формы, рассмотревший) хранятся в SQLite с индексами
+по серверу, автору, типу, статусу и дате. Выборки для рецензентов идут постранично по курсору
+(created_at, ID) - скорость не зависит от номера страницы и размера истории
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from config import APPLICATIONS_DB_PATH, LIMONERICX_SERVER_ID
+
+logger = logging.getLogger(__name__)
+
+# Статусы заявки
+PENDING = 'pending'
+REVIEWING = 'reviewing'
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+STATUSES = (PENDING, REVIEWING, ACCEPTED, REJECTED)
+FINAL_STATUSES = (ACCEPTED, REJECTED)  # решение по заявке, которое больше не меняется
+
+# Типы заявок
+MINECRAFT = 'minecraft'
+DISCORD = 'discord'
+APPLICATION_TYPES = (MINECRAFT, DISCORD)
+
+class ApplicationRecord:
+    """Одна заявка"""
+
+    __slots__ = (
+        'application_id', 'message_id', 'applicant_id', 'applicant_name', 'application_type', 'nick',
+        'age', 'reason', 'experience', 'status', 'reviewer_id', 'created_at', 'reviewed_at', 'guild_id'
+    )
+
+    def __init__(self, application_id, message_id, applicant_id, applicant_name, application_type, nick,
+                 age, reason, experience, status=PENDING, reviewer_id=None, created_at=None, reviewed_at=None,
+                 guild_id=None):
+        self.application_id = application_id
+        self.message_id = message_id
+        self.applicant_id = applicant_id
+        self.applicant_name = applicant_name
+        self.application_type = application_type
+        self.nick = nick
+        self.age = age
+        self.reason = reason
+        self.experience = experience
+        self.status = status
+        self.reviewer_id = reviewer_id
+        self.created_at = time.time() if created_at is None else created_at
+        self.reviewed_at = reviewed_at
+        self.guild_id = guild_id
+
+    def as_row(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+def encode_cursor(record):
+    """Курсор страницы: позиция последней показанной заявки"""
+    return f'{record.created_at!r}:{record.application_id}'
+
+def decode_cursor(cursor):
+    created_at, application_id = cursor.split(':', 1)
+    return float(created_at), int(application_id)
+
+class ApplicationStore:
+    """Заявки в SQLite с выборками по индексам"""
+
+    COLUMNS = ', '.join(ApplicationRecord.__slots__)
+
+    def __init__(self, path=APPLICATIONS_DB_PATH):
+        self.path = path
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS applications (
+                application_id INTEGER PRIMARY KEY,
+                message_id INTEGER,
+                applicant_id INTEGER NOT NULL,
+                applicant_name TEXT NOT NULL,
+                application_type TEXT NOT NULL,
+                nick TEXT NOT NULL,
+                age INTEGER,
+                reason TEXT NOT NULL,
+                experience TEXT,
+                status TEXT NOT NULL,
+                reviewer_id INTEGER,
+                created_at REAL NOT NULL,
+                reviewed_at REAL,
+                guild_id INTEGER
+            )
+        ''')
+        # Заявки, поданные до поддержки нескольких серверов, относятся к основному серверу
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(applications)')}
+        if 'guild_id' not in columns:
+            self._db.execute('ALTER TABLE applications ADD COLUMN guild_id INTEGER')
+            self._db.execute('UPDATE applications SET guild_id = ?', (LIMONERICX_SERVER_ID,))
+
+        # Индексы повторяют порядок выборок: фильтр, затем (created_at, ID) для курсора
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_created ON applications (created_at, application_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_applicant ON applications (applicant_id, created_at, application_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_status ON applications (status, created_at, application_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_type_status ON applications (application_type, status, created_at, application_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_message ON applications (message_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_guild_status ON applications (guild_id, status, created_at, application_id)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS applications_guild_type_status ON applications (guild_id, application_type, status, created_at, application_id)')
+
+    def _one(self, where, params):
+        row = self._db.execute(f'SELECT {self.COLUMNS} FROM applications WHERE {where}', params).fetchone()
+        return ApplicationRecord(*row) if row else None
+
+    # ------------------------------------------------------------------
+    # Запросы
+
+    def get(self, application_id):
+        return self._one('application_id = ?', (application_id,))
+
+    def by_message(self, message_id):
+        """Заявка по ID сообщения в канале рассмотрения"""
+        return self._one('message_id = ?', (message_id,))
+
+    def search(self, applicant_id=None, application_type=None, status=None, since=None, until=None,
+               cursor=None, limit=10, guild_id=None):
+        """
+        Заявки от новых к старым (guild_id - только заявки этого сервера). cursor - значение
+        из предыдущей страницы. Возвращает (заявки, курсор следующей страницы или None)
+        """
+        conditions = []
+        params = []
+        for column, value in (('guild_id', guild_id), ('applicant_id', applicant_id),
+                              ('application_type', application_type), ('status', status)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('created_at < ?')
+            params.append(until)
+        if cursor is not None:
+            conditions.append('(created_at, application_id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = self._db.execute(
+            f'SELECT {self.COLUMNS} FROM applications {where} '
+            f'ORDER BY created_at DESC, application_id DESC LIMIT ?',
+            (*params, limit + 1)
+        ).fetchall()
+
+        records = [ApplicationRecord(*row) for row in rows[:limit]]
+        next_cursor = encode_cursor(records[-1]) if len(rows) > limit else None
+        return records, next_cursor
+
+    def counts(self, application_type=None, guild_id=None, applicant_id=None):
+        """Количество заявок по статусам (с теми же фильтрами, что и search)"""
+        conditions = []
+        params = []
+        for column, value in (('guild_id', guild_id), ('applicant_id', applicant_id),
+                              ('application_type', application_type)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = self._db.execute(f'SELECT status, COUNT(*) FROM applications {where} GROUP BY status', params)
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows.fetchall())
+        return counts
+
+    def stats(self):
+        return self.counts()
+
+    # ------------------------------------------------------------------
+    # Изменения
+
+    def create(self, application_id, applicant_id, applicant_name, application_type, nick, age, reason, experience,
+               guild_id=None):
+        record = ApplicationRecord(
+            application_id, None, applicant_id, applicant_name, application_type, nick, age, reason, experience or None,
+            guild_id=guild_id
+        )
+        placeholders = ', '.join('?' for _ in ApplicationRecord.__slots__)
+        self._db.execute(f'INSERT OR REPLACE INTO applications ({self.COLUMNS}) VALUES ({placeholders})', record.as_row())
+        return record
+
+    def attach_message(self, application_id, message_id):
+        self._db.execute('UPDATE applications SET message_id = ? WHERE application_id = ?', (message_id, application_id))
+
+    def discard(self, application_id):
+        """Удаление заявки, которую не удалось отправить на рассмотрение"""
+        self._db.execute('DELETE FROM applications WHERE application_id = ?', (application_id,))
+
+    def set_status(self, message_id, status, reviewer_id):
+        """
+        Решение рецензента по заявке из сообщения. None - заявки нет (подана до появления
+        хранилища) или по ней уже принято окончательное решение: оно не перезаписывается
+        """
+        record = self.by_message(message_id)
+        if record is None:
+            return None
+        reviewed_at = time.time()
+        # Условие в UPDATE: из двух одновременных нажатий решение запишет только первое
+        cursor = self._db.execute(
+            f'UPDATE applications SET status = ?, reviewer_id = ?, reviewed_at = ? '
+            f'WHERE application_id = ? AND status NOT IN ({", ".join("?" for _ in FINAL_STATUSES)})',
+            (status, reviewer_id, reviewed_at, record.application_id, *FINAL_STATUSES)
+        )
+        if not cursor.rowcount:
+            return None
+        record.status = status
+        record.reviewer_id = reviewer_id
+        record.reviewed_at = reviewed_at
+        return record
+
+def get_application_store(bot):
+    """Общее хранилище заявок бота (создаётся при первом обращении)"""
+    store = getattr(bot, 'application_store', None)
+    if store is None:
+        store = ApplicationStore()
+        bot.application_store = store
+    return store
@@ -0,0 +1,72 @@
+"""
+Ограниченная группа фоновых задач
+Обработчики событий отдают сюда работу, которую не нужно ждать (отложенные ответы,
+реакции). Число одновременно выполняемых задач ограничено: сверх лимита новая работа
+отбрасывается, ошибки задач логируются и не теряются молча
+"""
+
+import asyncio
+import logging
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+class BackgroundTasks:
+    """Фоновые задачи с лимитом одновременных и учётом ошибок"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._tasks = set()
+
+        # Метрики
+        self.started = Counter()
+        self.dropped = Counter()
+        self.failed = Counter()
+
+    @property
+    def in_flight(self):
+        return len(self._tasks)
+
+    def spawn(self, coro):
+        """Запуск корутины в фоне. Возвращает False, если лимит исчерпан и работа отброшена"""
+        if len(self._tasks) >= self.limit:
+            coro.close()
+            self.dropped.inc()
+            return False
+
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        self.started.inc()
+        return True
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.failed.inc()
+            logger.error(f'Ошибка фоновой задачи {self.name}: {error!r}')
+
+    def cancel(self):
+        """Отмена всех задач без ожидания"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def close(self):
+        """Отмена всех задач и ожидание их завершения"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'limit': self.limit,
+            'started': self.started.value,
+            'dropped': self.dropped.value,
+            'failed': self.failed.value,
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк движка активности с общей кучей таймеров
+Запускает систему активности на сотнях каналов и считает, сколько событий кучи
+обработано и сколько процессорного времени ушло: без трафика и при сообщениях
+в небольшой части каналов
+
+Запуск из корня проекта: python benchmarks/bench_activity_heap.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_activity
+from chat_activity import ChatActivitySystem
+
+DURATION = 3.0          # секунд на прогон
+TIMEOUT_MINUTES = 0.02  # 1.2 с тишины до сообщения бота
+MESSAGE_INTERVAL = 0.1  # пауза между сообщениями в "живых" каналах
+
+class FakeBot:
+    """Минимальная замена бота: каналов нет, сообщения никуда не отправляются"""
+
+    user = SimpleNamespace(id=0)
+
+    def get_channel(self, channel_id):
+        return None
+
+    def add_listener(self, func, name):
+        pass
+
+    def remove_listener(self, func, name):
+        pass
+
+class CountingSystem(ChatActivitySystem):
+    """Система активности, считающая обработанные события кучи"""
+
+    def __init__(self, *args, **kwargs):
+        self.events = 0
+        super().__init__(*args, **kwargs)
+
+    def _on_idle_check(self, state, now):
+        self.events += 1
+        super()._on_idle_check(state, now)
+
+    def _on_random_reaction(self, state, now):
+        self.events += 1
+        super()._on_random_reaction(state, now)
+
+def make_message(channel_id, author):
+    return SimpleNamespace(id=time.monotonic_ns(), channel=SimpleNamespace(id=channel_id), author=author,
+                           content='привет')
+
+async def run(channels, live):
+    settings = [
+        {'channel_id': 1000 + index, 'inactivity_timeout': TIMEOUT_MINUTES, 'reaction_interval': (60, 60)}
+        for index in range(channels)
+    ]
+    system = CountingSystem(FakeBot(), settings)
+    author = SimpleNamespace(id=1)
+    messages = 0
+
+    cpu_start = time.process_time()
+    deadline = time.monotonic() + DURATION
+    while time.monotonic() < deadline:
+        for index in range(live):
+            system.record_activity(make_message(1000 + index, author))
+            messages += 1
+        await asyncio.sleep(MESSAGE_INTERVAL)
+    cpu = time.process_time() - cpu_start
+
+    system.stop()
+    return messages, system.events, cpu
+
+async def main():
+    # Случайные реакции не должны сработать за время прогона
+    chat_activity.random.randint = lambda low, high: high
+
+    print(f'{"каналов":>8} {"живых":>6} {"сообщений":>10} {"событий кучи":>13} {"CPU, мс":>8}')
+    for channels in (10, 100, 500):
+        for live in (0, 10):
+            messages, events, cpu = await run(channels, live)
+            print(f'{channels:>8} {live:>6} {messages:>10} {events:>13} {cpu * 1000:>8.1f}')
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк сборки приветственного embed
+Сравнивает прежнюю сборку discord.Embed с нуля и рендер предкомпилированного шаблона
+
+Запуск из корня проекта: python benchmarks/bench_embed_templates.py
+"""
+
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from embed_templates import guild_icon_url
+from config_store import ConfigSnapshot, merge_guilds
+from config import (
+    WELCOME_COLOR,
+    WELCOME_TITLE,
+    WELCOME_DESCRIPTION,
+    WELCOME_FIELDS
+)
+
+# Шаблон из снимка конфигурации по умолчанию, как у бота без файла переопределений
+WELCOME_TEMPLATE = ConfigSnapshot(1, *merge_guilds({})).primary.templates['welcome']
+
+def make_member(index):
+    """Минимальная замена discord.Member с нужными для embed атрибутами"""
+    guild = SimpleNamespace(
+        member_count=1000 + index,
+        icon=SimpleNamespace(url="https://cdn.discordapp.com/icons/1/icon.png")
+    )
+    return SimpleNamespace(
+        mention=f"<@{100000000000000000 + index}>",
+        display_avatar=SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{index}/a.png"),
+        guild=guild
+    )
+
+def legacy_welcome_embed(member):
+    """Сборка embed так, как это делалось до шаблонов"""
+    embed = discord.Embed(
+        title=WELCOME_TITLE,
+        description=f"{WELCOME_DESCRIPTION}\n\n{member.mention}",
+        color=WELCOME_COLOR
+    )
+    for field in WELCOME_FIELDS:
+        embed.add_field(
+            name=field["name"],
+            value=field["value"],
+            inline=field["inline"]
+        )
+    embed.set_thumbnail(url=member.display_avatar.url)
+    embed.set_footer(
+        text=f"Участник #{member.guild.member_count} • Добро пожаловать!",
+        icon_url=member.guild.icon.url if member.guild.icon else None
+    )
+    return embed
+
+def template_welcome_embed(member):
+    """Сборка embed из предкомпилированного шаблона"""
+    return WELCOME_TEMPLATE.render(
+        description=f"{WELCOME_DESCRIPTION}\n\n{member.mention}",
+        thumbnail_url=member.display_avatar.url,
+        footer_text=f"Участник #{member.guild.member_count} • Добро пожаловать!",
+        footer_icon_url=guild_icon_url(member.guild)
+    )
+
+def bench(builder, members, repeat, number):
+    """Лучшее время на одно событие (мкс): сборка embed и сериализация для отправки"""
+    def run():
+        for member in members:
+            builder(member).to_dict()
+    best = min(timeit.repeat(run, repeat=repeat, number=number))
+    return best / (number * len(members)) * 1e6
+
+def main():
+    members = [make_member(i) for i in range(100)]
+
+    # Оба способа должны давать одинаковый payload
+    for member in members[:3]:
+        assert legacy_welcome_embed(member).to_dict() == template_welcome_embed(member).to_dict()
+
+    legacy = bench(legacy_welcome_embed, members, repeat=5, number=200)
+    template = bench(template_welcome_embed, members, repeat=5, number=200)
+
+    print(f"Прежняя сборка:  {legacy:7.2f} мкс/событие")
+    print(f"Шаблон:          {template:7.2f} мкс/событие")
+    print(f"Ускорение:       {legacy / template:7.2f}x")
+
+if __name__ == "__main__":
+    main()
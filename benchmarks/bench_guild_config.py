@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк конфигурации серверов
+Собирает снимок с сотнями серверов-партнёров и измеряет память на один сервер
+(тексты наследуются от основного сервера или у каждого свои), время сборки снимка
+и время поиска конфигурации по ID сервера, которое платит каждое событие
+
+Запуск из корня проекта: python benchmarks/bench_guild_config.py
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_store import ConfigSnapshot, merge_guilds
+
+GUILD_COUNTS = (10, 100, 1000)
+LOOKUPS = 1_000_000
+FIRST_PARTNER_ID = 10**17
+
+def partner_overrides(count, distinct_texts):
+    """Файл конфигурации с count серверами-партнёрами: свои каналы, при distinct_texts - и свои тексты"""
+    guilds = {}
+    for index in range(count):
+        guild_id = FIRST_PARTNER_ID + index
+        overrides = {
+            'welcome': {'channel_id': guild_id + 1},
+            'support': {'channel_id': guild_id + 2, 'role_id': guild_id + 3},
+        }
+        if distinct_texts:
+            overrides['welcome']['description'] = f'Добро пожаловать на сервер №{index}!'
+            overrides['support']['title'] = f'Поддержка сервера №{index}'
+        guilds[str(guild_id)] = overrides
+    return {'guilds': guilds}
+
+def measure_memory(count, distinct_texts):
+    """Байт на сервер-партнёра в собранном снимке (за вычетом снимка только с основным сервером)"""
+    tracemalloc.start()
+    baseline_start = tracemalloc.get_traced_memory()[0]
+    baseline = ConfigSnapshot(1, *merge_guilds({}))
+    baseline_size = tracemalloc.get_traced_memory()[0] - baseline_start
+
+    primary_id, guilds = merge_guilds(partner_overrides(count, distinct_texts))
+    start = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    snapshot = ConfigSnapshot(2, primary_id, guilds)
+    build = time.perf_counter() - started
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    del baseline, snapshot
+    return (size - baseline_size) / count, build
+
+def measure_lookup(count):
+    """Среднее время snapshot.guild(ID) для настроенных и чужих серверов"""
+    primary_id, guilds = merge_guilds(partner_overrides(count, False))
+    snapshot = ConfigSnapshot(1, primary_id, guilds)
+    ids = list(snapshot.guilds) + [FIRST_PARTNER_ID * 3 + index for index in range(count)]
+    sequence = [random.choice(ids) for _ in range(LOOKUPS)]
+
+    guild = snapshot.guild
+    started = time.perf_counter()
+    for guild_id in sequence:
+        guild(guild_id)
+    return (time.perf_counter() - started) / LOOKUPS
+
+def main():
+    random.seed(1)
+    print('Серверов  | тексты общие: байт/сервер, сборка | тексты свои: байт/сервер, сборка | поиск')
+    for count in GUILD_COUNTS:
+        shared, shared_build = measure_memory(count, False)
+        distinct, distinct_build = measure_memory(count, True)
+        lookup = measure_lookup(count)
+        print(
+            f'{count:>8}  | {shared:>10.0f} Б, {shared_build * 1000:>7.1f} мс'
+            f'       | {distinct:>10.0f} Б, {distinct_build * 1000:>7.1f} мс'
+            f'      | {lookup * 1e9:>5.0f} нс'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Проверка таймеров каналов активности при перезагрузке конфигурации
+Канал убирается и сразу добавляется обратно, пока его старые таймеры ещё в куче:
+после срабатывания всех событий у канала должен остаться ровно один цикл реакций
+и одна проверка тишины. Затем у канала меняется время тишины, и взведённая
+проверка должна сработать по новому сроку
+
+Запуск из корня проекта: python benchmarks/check_activity_channels.py
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_activity
+from chat_activity import ChatActivitySystem, IDLE_CHECK, RANDOM_REACTION
+
+CHANNEL_ID = 1000
+
+class FakeBot:
+    """Минимальная замена бота: каналов нет, сообщения никуда не отправляются"""
+
+    user = SimpleNamespace(id=0)
+
+    def get_channel(self, channel_id):
+        return None
+
+    def add_listener(self, func, name):
+        pass
+
+    def remove_listener(self, func, name):
+        pass
+
+def live_timers(system, kind):
+    """События кучи указанного типа, которые не будут отброшены при срабатывании"""
+    return [
+        entry for entry in system._heap
+        if entry[2] == kind and entry[3] in system.channels and system.channels[entry[3]].generation == entry[4]
+    ]
+
+async def main():
+    # Таймеры срабатывают через доли секунды, случайные реакции никуда не отправляются
+    chat_activity.random.randint = lambda low, high: 0.01
+    settings = {'channel_id': CHANNEL_ID, 'inactivity_timeout': 10}
+    system = ChatActivitySystem(FakeBot(), [settings])
+    errors = []
+
+    system.update_channels([])
+    system.update_channels([settings])
+    # Несколько циклов реакций: каждый сработавший таймер ставит следующий
+    await asyncio.sleep(0.2)
+    # Старая проверка тишины ещё ждёт своего срока в куче, но будет отброшена
+    reactions = [entry for entry in system._heap if entry[2] == RANDOM_REACTION]
+    idle_checks = live_timers(system, IDLE_CHECK)
+    print(f'После удаления и возврата канала: таймеров реакций {len(reactions)}, проверок тишины {len(idle_checks)}')
+    if len(reactions) != 1 or len(idle_checks) != 1:
+        errors.append('у канала больше одной пары таймеров')
+
+    state = system.channels[CHANNEL_ID]
+    old_due = live_timers(system, IDLE_CHECK)[0][0]
+    system.update_channels([dict(settings, inactivity_timeout=1)])
+    new_due = live_timers(system, IDLE_CHECK)[0][0]
+    print(f'Смена времени тишины 10 -> 1 мин: проверка через {new_due - state.last_activity:.0f} с '
+          f'(была через {old_due - state.last_activity:.0f} с)')
+    if len(live_timers(system, IDLE_CHECK)) != 1 or round(new_due - state.last_activity) != 60:
+        errors.append('проверка тишины не перевзведена на новое время')
+
+    system.stop()
+    for error in errors:
+        print(f'ОШИБКА: {error}')
+    if errors:
+        return 1
+    print('OK: у канала одна пара таймеров')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
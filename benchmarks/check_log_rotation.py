@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Проверка ротации логов
+Пишет поток пронумерованных записей с маленьким max_bytes (десятки ротаций по размеру
+за один период) и проверяет, что после очистки остались backup_count самых новых
+файлов: вместе с текущим файлом они содержат непрерывный хвост записей до последней
+
+Запуск из корня проекта: python benchmarks/check_log_rotation.py
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import setup_logging
+
+RECORDS = 400
+MAX_BYTES = 2000
+BACKUP_COUNT = 3
+
+def main():
+    directory = tempfile.mkdtemp(prefix='limonericx-logs-')
+    path = os.path.join(directory, 'bot.log')
+    pipeline = setup_logging(path=path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, sampling={}, console=False)
+    logger = logging.getLogger('rotation_check')
+    for index in range(RECORDS):
+        logger.info(f'message {index}')
+    pipeline.stop()
+
+    files = sorted(name for name in os.listdir(directory) if name.startswith('bot.log'))
+    numbers = []
+    for name in files:
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            numbers.extend(int(json.loads(line)['msg'].split()[1]) for line in f if 'rotation_check' in line)
+    numbers.sort()
+
+    print(f'Файлы: {", ".join(files)}')
+    print(f'Записи: {numbers[0]}..{numbers[-1]} ({len(numbers)} из {RECORDS})')
+    backups = len(files) - 1
+    contiguous = numbers == list(range(numbers[0], RECORDS))
+    if backups != BACKUP_COUNT or not contiguous:
+        print('ОШИБКА: сохранились не самые новые файлы')
+        return 1
+    print('OK: сохранены самые новые файлы')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
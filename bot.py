@@ -7,29 +7,59 @@ import discord
 from discord.ext import commands
 import logging
 import asyncio
-from support_system import setup_support_system
-from admin_applications import setup_minecraft_admin_applications, setup_discord_admin_applications
-from chat_activity import setup_chat_activity
+import time
+from support_system import (
+    setup_support_system,
+    SupportTicketView,
+    TicketControlView,
+    get_ticket_pipeline,
+    delete_ticket_channel
+)
+from admin_applications import (
+    setup_minecraft_admin_applications,
+    setup_discord_admin_applications,
+    MinecraftAdminApplicationView,
+    DiscordAdminApplicationView,
+    ApplicationReviewView,
+    send_applications_page
+)
+from chat_activity import setup_chat_activity, update_chat_activity
+from welcome_batcher import WelcomeBatcher
+from outbound import OutboundScheduler, Priority, schedule, post
+from panel_registry import get_panel_registry
+from startup import StartupPipeline
+from timer_service import get_timer_service
+from dm_queue import get_dm_queue
+from metrics import Histogram, REGISTRY
+from metrics_endpoint import get_metrics_server, rest_trace_config
+from event_router import get_event_router
+from profiling import get_profiler
+from config_store import get_config, describe_changes
+from state_backend import get_state_backend, SharedTokenBucket
+from sharding import owns_guild
+from embed_templates import guild_icon_url
 from config import (
     DISCORD_TOKEN,
-    LIMONERICX_SERVER_ID,
-    WELCOME_CHANNEL_ID,
-    WELCOME_COLOR,
-    GOODBYE_COLOR,
-    WELCOME_TITLE,
-    WELCOME_DESCRIPTION,
-    WELCOME_FIELDS,
-    GOODBYE_TITLE,
-    GOODBYE_DESCRIPTION,
-    WELCOME_BUTTON_ENABLED,
-    WELCOME_BUTTON_LABEL,
-    WELCOME_BUTTON_URL,
     BOT_COMMAND_PREFIX,
-    BOT_ACTIVITY_NAME
+    BOT_ACTIVITY_NAME,
+    PROFILE_DEFAULT_SECONDS,
+    SHARD_COUNT,
+    SHARD_IDS,
+    SHARD_IDENTIFY_CONCURRENCY
 )
 
 logger = logging.getLogger(__name__)
 
+MEMBER_EVENTS = REGISTRY.counter('limonericx_member_events_total', 'Заходы и выходы участников', ('event',))
+WELCOME_MESSAGES = REGISTRY.counter('limonericx_welcome_messages_total', 'Отправленные приветствия и прощания', ('kind',))
+
+# Panels published from a config section; they are refreshed when that section changes
+PANEL_SETUPS = {
+    'support': setup_support_system,
+    'minecraft_admin': setup_minecraft_admin_applications,
+    'discord_admin': setup_discord_admin_applications,
+}
+
 class DiscordWelcomeBot:
     """Discord bot class for handling welcome and goodbye messages"""
     
@@ -41,15 +71,175 @@ class DiscordWelcomeBot:
         intents.message_content = True  # Required for message content access
         intents.guilds = True  # Required for guild events
         
-        # Initialize bot
-        self.bot = commands.Bot(
+        # Initialize bot (the activity status is sent with every IDENTIFY)
+        options = dict(
             command_prefix=BOT_COMMAND_PREFIX,
             intents=intents,
-            help_command=None
+            help_command=None,
+            activity=discord.Game(name=BOT_ACTIVITY_NAME),
+            http_trace=rest_trace_config()  # REST request counters, 429s and latency for /metrics
+        )
+        if SHARD_COUNT:
+            # This process runs SHARD_IDS (all shards if not set) of SHARD_COUNT gateway shards
+            self.bot = commands.AutoShardedBot(shard_count=SHARD_COUNT, shard_ids=SHARD_IDS or None, **options)
+        else:
+            self.bot = commands.Bot(**options)
+        self.bot.setup_hook = self._setup_hook
+        
+        # State shared by all bot processes (rate limits, panel registry)
+        self.state = get_state_backend(self.bot)
+        if self.state.shared:
+            self.bot.before_identify_hook = self._before_identify
+        
+        # Shared prioritized queue for outbound requests of all subsystems
+        self.outbound = OutboundScheduler(backend=self.state)
+        self.bot.outbound = self.outbound
+        
+        # Time from receiving a message to its commands being processed
+        self.message_latency = Histogram()
+        self.bot.message_latency = self.message_latency
+        
+        # Message handlers are looked up by channel/guild, unrelated messages skip them
+        self.router = get_event_router(self.bot)
+        
+        # Reloadable settings: handlers read the current snapshot at the start of each event
+        self.config = get_config(self.bot)
+        self.config.subscribe(self._apply_config)
+        welcome = self.config.snapshot.primary['welcome']
+        
+        # Coalesce welcome messages during join bursts (keyed by guild, window and size from its config)
+        self.welcome_batcher = WelcomeBatcher(
+            self._send_welcome,
+            window=welcome['batch_window'],
+            max_size=welcome['batch_max_size'],
+            settings=self._welcome_batching
         )
+        self.bot.welcome_batcher = self.welcome_batcher
+        
+        self._welcome_views = {}  # welcome section hash -> link button view
+        
+        # Durable deferred actions (ticket channel deletion and so on)
+        self.timers = get_timer_service(self.bot)
+        self.timers.register('delete_channel', delete_ticket_channel)
+        
+        # Durable, paced direct messages (application decisions)
+        self.dm_queue = get_dm_queue(self.bot)
+        
+        # Independent subsystems are set up concurrently, once per process
+        self.startup = StartupPipeline()
+        self._stopping = None  # shutdown task: stop_bot runs once however many times it is called
+        self.startup.add('support', setup_support_system)
+        self.startup.add('minecraft_admin', setup_minecraft_admin_applications)
+        self.startup.add('discord_admin', setup_discord_admin_applications)
+        self.startup.add('chat_activity', setup_chat_activity)
+        self.startup.add('timers', self.timers.start)
+        self.startup.add('dm_queue', self.dm_queue.start)
+        self.startup.add('config_watch', self.config.start)
+        
+        # Prometheus endpoint served from the bot's own event loop
+        self.metrics_server = get_metrics_server(self.bot)
+        if self.metrics_server is not None:
+            self.startup.add('metrics', self.metrics_server.start)
         
         # Set up event handlers
         self._setup_events()
+        self._setup_commands()
+    
+    def _setup_commands(self):
+        """Set up admin commands"""
+        
+        @self.bot.command(name='handlers')
+        @commands.has_permissions(administrator=True)
+        async def handlers_command(ctx):
+            """Метрики обработчиков событий"""
+            stats = self.router.stats()
+            lines = [f"Без обработчиков: {stats['unrouted']}"]
+            for name, handler in sorted(stats['handlers'].items()):
+                lines.append(
+                    f"`{name}` вызовов {handler['calls']}, ошибок {handler['errors']}, "
+                    f"p50 {handler['p50'] * 1000:.2f} мс, p99 {handler['p99'] * 1000:.2f} мс"
+                )
+            latency = self.message_latency.snapshot()
+            lines.append(f"on_message: p50 {latency['p50'] * 1000:.2f} мс, p99 {latency['p99'] * 1000:.2f} мс")
+            await ctx.send('\n'.join(lines)[:2000])
+        
+        @self.bot.command(name='applications')
+        @commands.has_permissions(manage_messages=True)
+        async def applications_command(ctx, *filters):
+            """Заявки: !applications [pending|reviewing|accepted|rejected|all] [minecraft|discord] [@участник]"""
+            await send_applications_page(ctx, filters)
+        
+        @self.bot.command(name='config')
+        @commands.has_permissions(administrator=True)
+        async def config_command(ctx, action=None):
+            """Конфигурация: !config - текущая версия, !config reload - перечитать файл"""
+            if action == 'reload':
+                try:
+                    snapshot, changed = await self.config.reload()
+                except (OSError, ValueError) as e:
+                    await ctx.send(f"❌ Конфигурация не применена: {e}")
+                    return
+                if not changed:
+                    await ctx.send(f"Конфигурация не изменилась (версия {snapshot.version})")
+                    return
+                await ctx.send(f"✅ Конфигурация версии {snapshot.version}, изменены разделы: {describe_changes(changed)}"[:2000])
+                return
+            
+            snapshot = self.config.snapshot
+            guild = snapshot.guild(ctx.guild.id) if ctx.guild else None
+            guild = guild or snapshot.primary
+            lines = [
+                f"Версия {snapshot.version}, загружена <t:{int(snapshot.loaded_at)}:R>, файл `{self.config.path}`",
+                f"Серверов: {len(snapshot.guilds)}, разделы сервера {guild.guild_id}:"
+            ]
+            lines.extend(f"`{name}` {digest[:12]}" for name, digest in guild.hashes.items())
+            await ctx.send('\n'.join(lines))
+        
+        @self.bot.command(name='profile')
+        @commands.has_permissions(administrator=True)
+        async def profile_command(ctx, *args):
+            """Профилирование: !profile <обработчики...> [секунд] | !profile stop | !profile"""
+            profiler = get_profiler(self.bot)
+            
+            if not args:
+                if profiler.active:
+                    session = profiler.session
+                    left = session.started_at + session.duration - time.time()
+                    status = f"Идёт профилирование: {', '.join(session.targets)}, осталось {left:.0f} с"
+                else:
+                    status = "Профилирование выключено"
+                await ctx.send(f"{status}\nОбработчики: {', '.join(f'`{name}`' for name in profiler.targets)}")
+                return
+            
+            if args[0] == 'stop':
+                if await profiler.stop() is None:
+                    await ctx.send("Профилирование не запущено")
+                return
+            
+            names = [arg for arg in args if not arg.replace('.', '', 1).isdigit()]
+            duration = next((float(arg) for arg in args if arg.replace('.', '', 1).isdigit()), PROFILE_DEFAULT_SECONDS)
+            
+            async def report(result):
+                profile_path, summary_path, summary = result
+                text = f"```\n{summary[:1800]}\n```Профиль: `{profile_path}`, сводка: `{summary_path}`"
+                await schedule(self.bot, Priority.STAFF, ('send', ctx.channel.id), lambda: ctx.send(text))
+            
+            try:
+                session = profiler.start(names, duration, on_finish=report)
+            except ValueError as e:
+                await ctx.send(f"❌ {e}")
+                return
+            await ctx.send(f"🔬 Профилирование {', '.join(session.targets)} на {session.duration:.0f} с")
+    
+    async def _setup_hook(self):
+        """Runs once after login, before connecting to the gateway"""
+        # Panel views are persistent, so buttons keep working before panels are checked
+        self.bot.add_view(SupportTicketView())
+        self.bot.add_view(TicketControlView())
+        self.bot.add_view(MinecraftAdminApplicationView())
+        self.bot.add_view(DiscordAdminApplicationView())
+        # Review buttons of application cards: the card is resolved by message ID in the store
+        self.bot.add_view(ApplicationReviewView())
     
     def _setup_events(self):
         """Set up bot event handlers"""
@@ -59,117 +249,66 @@ class DiscordWelcomeBot:
             """Event triggered when bot is ready and connected"""
             logger.info(f'{self.bot.user} подключился к Discord!')
             logger.info(f'Bot ID: {self.bot.user.id}')
+            if self.bot.shard_count:
+                logger.info(f'Шарды процесса: {self.bot.shard_ids} из {self.bot.shard_count}')
             
-            # Set bot activity status
-            activity = discord.Game(name=BOT_ACTIVITY_NAME)
-            await self.bot.change_presence(activity=activity)
-            
-            # Log server information
-            guild = self.bot.get_guild(LIMONERICX_SERVER_ID)
-            if guild:
-                logger.info(f'Подключен к серверу: {guild.name} (ID: {guild.id})')
-                logger.info(f'Количество участников: {guild.member_count}')
-            else:
-                logger.warning(f'Не удалось найти сервер с ID: {LIMONERICX_SERVER_ID}')
-            
-            # Check if welcome channel exists
-            channel = self.bot.get_channel(WELCOME_CHANNEL_ID)
-            if channel:
-                logger.info(f'Канал приветствия найден: {channel.name} (ID: {channel.id})')
-            else:
-                logger.error(f'Канал приветствия не найден с ID: {WELCOME_CHANNEL_ID}')
+            config = self.config.snapshot
             
-            # Setup support ticket system
-            try:
-                await setup_support_system(self.bot)
-                logger.info('Система тикетов технической поддержки настроена')
-            except Exception as e:
-                logger.error(f'Ошибка настройки системы поддержки: {e}')
-            
-            # Setup admin application systems
-            try:
-                await setup_minecraft_admin_applications(self.bot)
-                logger.info('Система заявок в администрацию Minecraft настроена')
-            except Exception as e:
-                logger.error(f'Ошибка настройки системы заявок в администрацию Minecraft: {e}')
-            
-            try:
-                await setup_discord_admin_applications(self.bot)
-                logger.info('Система заявок в администрацию Discord настроена')
-            except Exception as e:
-                logger.error(f'Ошибка настройки системы заявок в администрацию Discord: {e}')
+            # Log server information for every configured guild served by this process
+            for guild_id, guild_config in config.guilds.items():
+                if not owns_guild(self.bot, guild_id):
+                    continue
+                guild = self.bot.get_guild(guild_id)
+                if guild:
+                    logger.info(f'Подключен к серверу: {guild.name} (ID: {guild.id})')
+                    logger.info(f'Количество участников: {guild.member_count}')
+                else:
+                    logger.warning(f"Не удалось найти сервер с ID: {guild_id}")
+                    continue
+                
+                # Check if welcome channel exists
+                channel_id = guild_config['welcome']['channel_id']
+                if channel_id is None:
+                    continue
+                channel = self.bot.get_channel(channel_id)
+                if channel:
+                    logger.info(f'Канал приветствия найден: {channel.name} (ID: {channel.id})')
+                else:
+                    logger.error(f"Канал приветствия не найден с ID: {channel_id}")
             
-            # Setup chat activity system
-            try:
-                await setup_chat_activity(self.bot)
-                logger.info('Система активности в чате настроена')
-            except Exception as e:
-                logger.error(f'Ошибка настройки системы активности в чате: {e}')
+            # Setup subsystems once; reconnects skip this step
+            await self.startup.run(self.bot)
         
         @self.bot.event
         async def on_message(message):
             """Event triggered when a message is sent"""
-            # Обрабатываем сообщения через систему активности
-            if hasattr(self.bot, 'activity_system'):
-                await self.bot.activity_system.respond_to_message(message)
+            received = time.perf_counter()
+            
+            # Обработчики каналов и серверов (система активности и т.д.)
+            await self.router.dispatch('message', message)
             
             # Обрабатываем команды
             await self.bot.process_commands(message)
+            self.message_latency.observe(time.perf_counter() - received)
 
         @self.bot.event
         async def on_member_join(member):
             """Event triggered when a member joins the server"""
             try:
-                # Check if the member joined the correct server
-                if member.guild.id != LIMONERICX_SERVER_ID:
+                # Only configured guilds are greeted (one dict lookup per event)
+                config = self.config.snapshot.guild(member.guild.id)
+                if config is None:
                     return
                 
+                MEMBER_EVENTS.labels('join').inc()
                 logger.info(f'Новый участник присоединился: {member.name} (ID: {member.id})')
                 
-                # Get the welcome channel
-                channel = self.bot.get_channel(WELCOME_CHANNEL_ID)
-                if not channel:
-                    logger.error(f'Канал приветствия не найден: {WELCOME_CHANNEL_ID}')
-                    return
-                
-                # Create beautiful welcome embed with green sidebar
-                embed = discord.Embed(
-                    title=WELCOME_TITLE,
-                    description=f"{WELCOME_DESCRIPTION}\n\n{member.mention}",
-                    color=WELCOME_COLOR
-                )
-                
-                # Add fields with information
-                for field in WELCOME_FIELDS:
-                    embed.add_field(
-                        name=field["name"],
-                        value=field["value"],
-                        inline=field["inline"]
-                    )
-                
-                # Add user avatar as thumbnail
-                embed.set_thumbnail(url=member.display_avatar.url)
-                
-                # Add footer with server info
-                embed.set_footer(
-                    text=f"Участник #{member.guild.member_count} • Добро пожаловать!",
-                    icon_url=member.guild.icon.url if member.guild.icon else None
-                )
-                
-                # Send embed message (with button only if enabled and URL provided)
-                if WELCOME_BUTTON_ENABLED and WELCOME_BUTTON_URL:
-                    view = discord.ui.View(timeout=None)
-                    button = discord.ui.Button(
-                        label=WELCOME_BUTTON_LABEL,
-                        url=WELCOME_BUTTON_URL,
-                        style=discord.ButtonStyle.link
-                    )
-                    view.add_item(button)
-                    await channel.send(embed=embed, view=view)
+                if config['welcome']['batch_enabled']:
+                    # A join in a quiet period is greeted at once; joins within the window
+                    # after a send are batched. Errors of an immediate send land below
+                    await self.welcome_batcher.add(member.guild.id, member)
                 else:
-                    await channel.send(embed=embed)
-                
-                logger.info(f'Отправлено приветствие для {member.name}')
+                    await self._send_welcome([member])
                 
             except discord.Forbidden as e:
                 logger.error(f'Нет разрешения для отправки сообщения: {e}')
@@ -182,45 +321,52 @@ class DiscordWelcomeBot:
         async def on_member_remove(member):
             """Event triggered when a member leaves the server"""
             try:
-                # Check if the member left the correct server
-                if member.guild.id != LIMONERICX_SERVER_ID:
+                # Only configured guilds are handled (one dict lookup per event)
+                config = self.config.snapshot.guild(member.guild.id)
+                if config is None:
                     return
                 
+                MEMBER_EVENTS.labels('leave').inc()
                 logger.info(f'Участник покинул сервер: {member.name} (ID: {member.id})')
                 
                 # Get the welcome channel
-                channel = self.bot.get_channel(WELCOME_CHANNEL_ID)
+                channel_id = config['welcome']['channel_id']
+                channel = self.bot.get_channel(channel_id) if channel_id is not None else None
                 if not channel:
-                    logger.error(f'Канал приветствия не найден: {WELCOME_CHANNEL_ID}')
+                    logger.error(f"Канал приветствия не найден: {config['welcome']['channel_id']}")
                     return
                 
                 # Create beautiful goodbye embed with orange sidebar
-                embed = discord.Embed(
-                    title=GOODBYE_TITLE,
-                    description=f"{member.mention}\n\n{GOODBYE_DESCRIPTION}",
-                    color=GOODBYE_COLOR
+                embed = config.templates['goodbye'].render(
+                    description=f"{member.mention}\n\n{config['goodbye']['description']}",
+                    thumbnail_url=member.display_avatar.url,
+                    footer_text=f"До свидания! • Участников осталось: {member.guild.member_count}",
+                    footer_icon_url=guild_icon_url(member.guild)
                 )
                 
-                # Add user avatar as thumbnail
-                embed.set_thumbnail(url=member.display_avatar.url)
-                
-                # Add footer with server info
-                embed.set_footer(
-                    text=f"До свидания! • Участников осталось: {member.guild.member_count}",
-                    icon_url=member.guild.icon.url if member.guild.icon else None
-                )
+                async def send_goodbye():
+                    await channel.send(embed=embed)
+                    WELCOME_MESSAGES.labels('goodbye').inc()
+                    logger.info(f'Отправлено прощание для {member.name}')
                 
-                # Send beautiful embed message
-                await channel.send(embed=embed)
-                logger.info(f'Отправлено прощание для {member.name}')
+                # The handler does not wait for the paced send; send errors are logged by post()
+                post(self.bot, Priority.WELCOME, ('send', channel.id), send_goodbye)
                 
-            except discord.Forbidden as e:
-                logger.error(f'Нет разрешения для отправки сообщения: {e}')
-            except discord.HTTPException as e:
-                logger.error(f'Ошибка HTTP при отправке прощания: {e}')
             except Exception as e:
                 logger.error(f'Неожиданная ошибка при прощании: {e}')
         
+        @self.bot.event
+        async def on_raw_message_delete(payload):
+            """Forget a panel whose message was deleted so it is reposted on next setup"""
+            name = get_panel_registry(self.bot).forget_message(payload.message_id)
+            if name:
+                logger.warning(f'Сообщение панели {name} было удалено')
+        
+        @self.bot.event
+        async def on_guild_channel_delete(channel):
+            """Free the ticket category slot and close the ticket of a deleted channel"""
+            await get_ticket_pipeline(self.bot).channel_deleted(channel)
+        
         @self.bot.event
         async def on_error(event, *args, **kwargs):
             """Global error handler for bot events"""
@@ -239,6 +385,121 @@ class DiscordWelcomeBot:
             except discord.HTTPException:
                 logger.error('Не удалось отправить сообщение об ошибке')
     
+    def _build_welcome_embed(self, config, member):
+        """Build the welcome embed for a single member"""
+        # Only the member-specific slots are filled, the rest is precompiled
+        return config.templates['welcome'].render(
+            description=f"{config['welcome']['description']}\n\n{member.mention}",
+            thumbnail_url=member.display_avatar.url,
+            footer_text=f"Участник #{member.guild.member_count} • Добро пожаловать!",
+            footer_icon_url=guild_icon_url(member.guild)
+        )
+    
+    def _build_batch_welcome_embed(self, config, members):
+        """Build one combined welcome embed for several members"""
+        guild = members[-1].guild
+        mentions = ", ".join(member.mention for member in members)
+        
+        return config.templates['welcome'].render(
+            description=f"{config['welcome']['description']}\n\n{mentions}",
+            footer_text=f"Новых участников: {len(members)} • Всего: {guild.member_count} • Добро пожаловать!",
+            footer_icon_url=guild_icon_url(guild)
+        )
+    
+    def _build_welcome_view(self, config):
+        """Return the link button view, or None if the button is disabled"""
+        welcome = config['welcome']
+        if not (welcome['button_enabled'] and welcome['button_url']):
+            return None
+        
+        # A link-only view has no callbacks, so one instance per welcome section is reused
+        # for every welcome of every guild sharing that section
+        digest = config.hashes['welcome']
+        view = self._welcome_views.get(digest)
+        if view is None:
+            view = discord.ui.View(timeout=None)
+            button = discord.ui.Button(
+                label=welcome['button_label'],
+                url=welcome['button_url'],
+                style=discord.ButtonStyle.link
+            )
+            view.add_item(button)
+            self._welcome_views[digest] = view
+        return view
+    
+    async def _send_welcome(self, members):
+        """Send a welcome message for one member or a combined one for a batch"""
+        config = self.config.snapshot.guild(members[0].guild.id)
+        if config is None:
+            return
+        
+        # Get the welcome channel
+        channel_id = config['welcome']['channel_id']
+        channel = self.bot.get_channel(channel_id) if channel_id is not None else None
+        if not channel:
+            logger.error(f"Канал приветствия не найден: {config['welcome']['channel_id']}")
+            return
+        
+        # A single join keeps the usual format
+        if len(members) == 1:
+            embed = self._build_welcome_embed(config, members[0])
+        else:
+            embed = self._build_batch_welcome_embed(config, members)
+        
+        # Send embed message (with button only if enabled and URL provided)
+        view = self._build_welcome_view(config)
+        if view:
+            send = lambda: channel.send(embed=embed, view=view)
+        else:
+            send = lambda: channel.send(embed=embed)
+        await schedule(self.bot, Priority.WELCOME, ('send', channel.id), send)
+        WELCOME_MESSAGES.labels('welcome').inc()
+        
+        names = ", ".join(member.name for member in members)
+        logger.info(f'Отправлено приветствие для {names}')
+    
+    def _welcome_batching(self, guild_id):
+        """Batching window and size of a guild, read from the current snapshot"""
+        config = self.config.snapshot.guild(guild_id)
+        if config is None:
+            return self.welcome_batcher.window, self.welcome_batcher.max_size
+        welcome = config['welcome']
+        return welcome['batch_window'], welcome['batch_max_size']
+    
+    async def _apply_config(self, old, new, changed):
+        """Apply a new config snapshot: only panels of guilds whose own section changed are refreshed"""
+        guilds_by_section = {}
+        for guild_id, section in changed:
+            guilds_by_section.setdefault(section, []).append(guild_id)
+        
+        # Views of removed or edited welcome sections are rebuilt on the next welcome
+        live = {guild.hashes['welcome'] for guild in new.guilds.values()}
+        for digest in [digest for digest in self._welcome_views if digest not in live]:
+            del self._welcome_views[digest]
+        
+        # Before the first on_ready panels and activity channels are set up by the startup pipeline
+        if not self.bot.is_ready():
+            return
+        for section, guild_ids in guilds_by_section.items():
+            setup = PANEL_SETUPS.get(section)
+            if setup is None:
+                continue
+            # Per-guild errors are already logged by the setup; other sections still apply
+            try:
+                await setup(self.bot, guild_ids)
+            except Exception as e:
+                logger.error(f'Панели раздела {section} обновлены не полностью: {e}')
+        
+        if 'activity' in guilds_by_section:
+            await update_chat_activity(self.bot)
+    
+    async def _before_identify(self, shard_id, *, initial=False):
+        """IDENTIFY of all processes goes through one shared bucket per max_concurrency slot"""
+        slot = (shard_id or 0) % SHARD_IDENTIFY_CONCURRENCY
+        bucket = SharedTokenBucket(self.state, f'identify:{slot}', rate=1 / 5, capacity=1)
+        while not bucket.try_acquire():
+            await asyncio.sleep(bucket.delay())
+    
     async def start_bot(self):
         """Start the Discord bot"""
         try:
@@ -270,7 +531,25 @@ class DiscordWelcomeBot:
         self.bot.add_command(command)
     
     async def stop_bot(self):
-        """Gracefully stop the bot"""
+        """Gracefully stop the bot; repeated and concurrent calls wait for the same shutdown"""
+        if self._stopping is None:
+            self._stopping = asyncio.create_task(self._stop())
+        await asyncio.shield(self._stopping)
+    
+    async def _stop(self):
+        """Flush pending work, stop background workers and close the state database"""
         logger.info('Остановка бота...')
+        await self.welcome_batcher.flush_all()
+        if getattr(self.bot, 'activity_system', None) is not None:
+            self.bot.activity_system.stop()
+        if getattr(self.bot, 'handler_profiler', None) is not None:
+            await self.bot.handler_profiler.stop()
+        await self.config.stop()
+        await self.timers.stop()
+        await self.dm_queue.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.outbound.close()
         if not self.bot.is_closed():
             await self.bot.close()
+        self.state.close()
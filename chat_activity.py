@@ -4,19 +4,31 @@
 """
 
 import discord
-from discord.ext import commands, tasks
 import logging
 import asyncio
 import random
-from datetime import datetime, timedelta
+import heapq
+import itertools
+import time
+from collections import deque
+from outbound import Priority, schedule
+from background import BackgroundTasks
+from event_router import get_event_router
+from llm_replies import get_reply_engine, ACTIVITY
+from metrics import REGISTRY
+from config_store import get_config
+from sharding import owns_guild
+from config import INACTIVITY_TIMEOUT, ACTIVITY_CHANNELS
 
 logger = logging.getLogger('chat_activity')
 
-# ID канала для поддержки активности
-ACTIVITY_CHANNEL_ID = 1375820312155000873  # Основной чат канал
+# Текст модели и готовые фразы отправляются без пингов: даже если в тексте окажется
+# @everyone или упоминание роли, уведомлений не будет
+NO_MENTIONS = discord.AllowedMentions.none()
 
-# Время бездействия после которого бот начинает общаться (в минутах)
-INACTIVITY_TIMEOUT = 30  
+# Метрики: сработавшие таймеры кучи и отправленные ботом сообщения и реакции
+ACTIVITY_EVENTS = REGISTRY.counter('limonericx_activity_events_total', 'Сработавшие таймеры активности', ('kind',))
+ACTIVITY_SENT = REGISTRY.counter('limonericx_activity_sent_total', 'Сообщения и реакции системы активности', ('kind',))
 
 # Сообщения для поддержания активности
 ACTIVITY_MESSAGES = [
@@ -56,88 +68,330 @@ RESPONSE_MESSAGES = [
     "Это здорово!"
 ]
 
+# Сколько последних сообщений пользователей помнить на канал для случайных реакций
+RECENT_MESSAGES_LIMIT = 5
+
+# Сколько отложенных ответов и реакций может ждать одновременно; лишние пропускаются
+MAX_PENDING_REPLIES = 20
+
 # Эмодзи для реакций
 REACTION_EMOJIS = ['👍', '😊', '🔥', '💪', '👌', '❤️', '😄', '🎉', '⭐', '✨', '💯', '👏']
 
+class RecentMessage:
+    """Компактная запись о недавнем сообщении пользователя"""
+    
+    __slots__ = ('message_id', 'author_id', 'has_reactions')
+    
+    def __init__(self, message_id, author_id):
+        self.message_id = message_id
+        self.author_id = author_id
+        self.has_reactions = False
+
+class ActivityChannel:
+    """Настройки и состояние одного канала активности"""
+    
+    DEFAULTS = {
+        "inactivity_timeout": INACTIVITY_TIMEOUT,  # минуты тишины до сообщения бота
+        "activity_messages": ACTIVITY_MESSAGES,
+        "response_messages": RESPONSE_MESSAGES,
+        "response_chance": 0.15,          # шанс ответить на сообщение
+        "reply_reaction_chance": 0.25,    # шанс поставить реакцию вместо ответа
+        "reaction_chance": 0.3,           # шанс случайной реакции за цикл
+        "reaction_interval": (10, 30),    # минуты между циклами случайных реакций
+    }
+    
+    __slots__ = (
+        'channel_id', 'inactivity_timeout', 'activity_messages', 'response_messages',
+        'response_chance', 'reply_reaction_chance', 'reaction_chance', 'reaction_interval',
+        'last_activity', 'last_from_bot', 'idle_armed', 'recent', 'generation'
+    )
+    
+    def __init__(self, settings):
+        options = dict(self.DEFAULTS, **settings)
+        self.channel_id = options['channel_id']
+        self.inactivity_timeout = options['inactivity_timeout'] * 60
+        self.activity_messages = tuple(options['activity_messages'])
+        self.response_messages = tuple(options['response_messages'])
+        self.response_chance = options['response_chance']
+        self.reply_reaction_chance = options['reply_reaction_chance']
+        self.reaction_chance = options['reaction_chance']
+        self.reaction_interval = tuple(options['reaction_interval'])
+        
+        self.last_activity = time.monotonic()  # время последнего сообщения (time.monotonic)
+        self.last_from_bot = None  # последнее сообщение от бота (None - неизвестно)
+        self.idle_armed = False  # есть ли в куче проверка тишины этого канала
+        self.recent = deque(maxlen=RECENT_MESSAGES_LIMIT)
+        self.generation = 0  # поколение таймеров: события кучи с другим поколением отбрасываются
+    
+    def find_recent(self, message_id):
+        for record in self.recent:
+            if record.message_id == message_id:
+                return record
+        return None
+
+# Типы событий в куче таймеров
+IDLE_CHECK = 0
+RANDOM_REACTION = 1
+
 class ChatActivitySystem:
-    def __init__(self, bot):
+    """
+    Активность во многих каналах с одной кучей таймеров: один цикл спит до ближайшего
+    события, поэтому пробуждения зависят от числа наступивших событий, а не каналов
+    """
+    
+    def __init__(self, bot, channels=None):
         self.bot = bot
-        self.last_activity = {}  # Отслеживание последней активности по каналам
+        self.channels = {}  # ID канала -> ActivityChannel
+        self._heap = []  # (время срабатывания, порядковый номер, тип события, ID канала, поколение)
+        self._sequence = itertools.count()
+        self._generations = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Ответы, реакции и сообщения активности выполняются в фоне и не задерживают on_message
+        self.background = BackgroundTasks('chat_activity', MAX_PENDING_REPLIES)
+        # Тексты сообщений: LLM по контексту канала или готовые фразы
+        self.reply_engine = get_reply_engine(bot)
+        
+        for settings in (ACTIVITY_CHANNELS if channels is None else channels):
+            self.channels[settings['channel_id']] = ActivityChannel(settings)
+        
+        self.bot.add_listener(self._on_raw_reaction_add, 'on_raw_reaction_add')
+        self.bot.add_listener(self._on_raw_message_delete, 'on_raw_message_delete')
+        
+        # Сообщения приходят только из своих каналов, остальные отсеивает маршрутизатор
+        self._routes = {}  # ID канала -> имя обработчика в маршрутизаторе
+        for channel_id in self.channels:
+            self._register_route(channel_id)
         self.setup_activity_tasks()
     
+    def _register_route(self, channel_id):
+        router = get_event_router(self.bot)
+        self._routes[channel_id] = router.register(
+            'message', self.respond_to_message, channel_id=channel_id, name=f'chat_activity@{channel_id}'
+        )
+    
+    @property
+    def last_activity(self):
+        """ID канала -> время последнего сообщения"""
+        return {channel_id: state.last_activity for channel_id, state in self.channels.items()}
+    
     def setup_activity_tasks(self):
-        """Настройка задач для поддержания активности"""
-        self.check_activity.start()
-        self.random_reactions.start()
+        """Начальные таймеры всех каналов и запуск общего цикла"""
+        now = time.monotonic()
+        for state in self.channels.values():
+            self._start_channel(state, now)
+        
+        self._task = asyncio.create_task(self._run())
+    
+    def _start_channel(self, state, now):
+        """Начальные таймеры канала"""
+        self._seed_activity(state)
+        # Первые случайные реакции - через 1-5 минут после запуска
+        self._arm(state, now + random.randint(60, 300))
+    
+    def _arm(self, state, reaction_due):
+        """
+        Новое поколение таймеров канала: проверка тишины и цикл реакций. Таймеры прежних
+        поколений (убранного и снова добавленного канала) отбрасываются при срабатывании
+        """
+        state.generation = next(self._generations)
+        self._push(state.last_activity + state.inactivity_timeout, IDLE_CHECK, state)
+        state.idle_armed = True
+        self._push(reaction_due, RANDOM_REACTION, state)
+    
+    def update_channels(self, channels):
+        """
+        Новый набор каналов без перезапуска цикла: новые каналы получают таймеры и обработчик,
+        у оставшихся меняются только настройки (при новом времени тишины таймеры перевзводятся),
+        таймеры убранных каналов отбрасываются при срабатывании
+        """
+        router = get_event_router(self.bot)
+        settings = {channel['channel_id']: channel for channel in channels}
+        
+        for channel_id in [channel_id for channel_id in self.channels if channel_id not in settings]:
+            del self.channels[channel_id]
+            router.unregister(self._routes.pop(channel_id))
+            logger.info(f'Канал активности убран: {channel_id}')
+        
+        now = time.monotonic()
+        for channel_id, channel_settings in settings.items():
+            old = self.channels.get(channel_id)
+            state = ActivityChannel(channel_settings)
+            self.channels[channel_id] = state
+            if old is not None:
+                # Время активности и взведённые таймеры переходят к новым настройкам
+                state.last_activity = old.last_activity
+                state.last_from_bot = old.last_from_bot
+                state.idle_armed = old.idle_armed
+                state.recent = old.recent
+                state.generation = old.generation
+                if state.inactivity_timeout != old.inactivity_timeout:
+                    # Взведённая проверка рассчитана на старое время тишины
+                    low, high = state.reaction_interval
+                    self._arm(state, now + random.randint(low, high) * 60)
+                continue
+            self._register_route(channel_id)
+            self._start_channel(state, now)
+            logger.info(f'Канал активности добавлен: {channel_id}')
+    
+    def _seed_activity(self, state):
+        """Начальное время активности по ID последнего сообщения канала (без запросов к API)"""
+        channel = self.bot.get_channel(state.channel_id)
+        last_message_id = getattr(channel, 'last_message_id', None)
+        if last_message_id:
+            age = (discord.utils.utcnow() - discord.utils.snowflake_time(last_message_id)).total_seconds()
+            state.last_activity = time.monotonic() - max(0.0, age)
     
-    @tasks.loop(minutes=5)  # Проверяем каждые 5 минут
-    async def check_activity(self):
-        """Проверка активности и отправка сообщений при необходимости"""
+    def _push(self, due, kind, state):
+        """Добавление события канала в кучу; будим цикл, если оно раньше ближайшего"""
+        if not self._heap or due < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (due, next(self._sequence), kind, state.channel_id, state.generation))
+    
+    async def _run(self):
+        """Общий цикл: обрабатываем наступившие события и спим до следующего"""
+        while True:
+            try:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, kind, channel_id, generation = heapq.heappop(self._heap)
+                    state = self.channels.get(channel_id)
+                    if state is None or state.generation != generation:
+                        continue  # канал убран из настроек или его таймеры перевзведены
+                    if kind == IDLE_CHECK:
+                        ACTIVITY_EVENTS.labels('idle_check').inc()
+                        self._on_idle_check(state, now)
+                    else:
+                        ACTIVITY_EVENTS.labels('random_reaction').inc()
+                        self._on_random_reaction(state, now)
+                
+                timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка в цикле активности: {e}')
+                await asyncio.sleep(1)
+    
+    def record_activity(self, message):
+        """Учёт сообщения в канале активности: обновляем время и при необходимости взводим таймер"""
+        state = self.channels.get(message.channel.id)
+        if state is None:
+            return None
+        
+        state.last_activity = time.monotonic()
+        state.last_from_bot = message.author == self.bot.user
+        
+        # Взведённая проверка сама перевзведётся на остаток времени, когда сработает
+        if not state.idle_armed:
+            state.idle_armed = True
+            self._push(state.last_activity + state.inactivity_timeout, IDLE_CHECK, state)
+        
+        # Кольцевой буфер для случайных реакций: память не растёт с трафиком
+        if message.author != self.bot.user:
+            state.recent.append(RecentMessage(message.id, message.author.id))
+        return state
+    
+    async def _on_raw_reaction_add(self, payload):
+        """Сообщения с реакциями больше не выбираются для случайной реакции"""
+        state = self.channels.get(payload.channel_id)
+        record = state.find_recent(payload.message_id) if state else None
+        if record is not None:
+            record.has_reactions = True
+    
+    async def _on_raw_message_delete(self, payload):
+        state = self.channels.get(payload.channel_id)
+        record = state.find_recent(payload.message_id) if state else None
+        if record is not None:
+            state.recent.remove(record)
+    
+    def _on_idle_check(self, state, now):
+        """Проверка тишины в канале"""
+        deadline = state.last_activity + state.inactivity_timeout
+        if now < deadline:
+            # За это время были сообщения - ждём остаток
+            self._push(deadline, IDLE_CHECK, state)
+            return
+        
+        # Если последнее сообщение от бота, не отправляем новое: проверку взведёт следующий человек
+        state.idle_armed = False
+        if state.last_from_bot:
+            return
+        
+        self.background.spawn(self.check_activity(state))
+    
+    async def check_activity(self, state):
+        """Отправка сообщения в замолчавший канал"""
         try:
-            channel = self.bot.get_channel(ACTIVITY_CHANNEL_ID)
+            channel = self.bot.get_channel(state.channel_id)
             if not channel:
                 return
             
-            # Получаем последнее сообщение в канале
-            try:
+            # После запуска автор последнего сообщения неизвестен - проверяем один раз
+            if state.last_from_bot is None:
                 messages = [message async for message in channel.history(limit=1)]
-                if not messages:
-                    return
-                
-                last_message = messages[0]
-                
-                # Если последнее сообщение от бота, не отправляем новое
-                if last_message.author == self.bot.user:
+                if messages and messages[0].author == self.bot.user:
+                    state.last_from_bot = True
                     return
-                
-                # Проверяем время последнего сообщения
-                time_since_last = datetime.now(last_message.created_at.tzinfo) - last_message.created_at
-                
-                # Если прошло больше времени бездействия, отправляем сообщение
-                if time_since_last > timedelta(minutes=INACTIVITY_TIMEOUT):
-                    message = random.choice(ACTIVITY_MESSAGES)
-                    await channel.send(message)
-                    logger.info(f'Отправлено сообщение активности в канал: {message}')
-                    
-            except Exception as e:
-                logger.error(f'Ошибка при проверке истории сообщений: {e}')
+            
+            message = await self.reply_engine.generate(channel.id, state.activity_messages, ACTIVITY)
+            if message is None:
+                return
+            sent = await schedule(self.bot, Priority.ACTIVITY, ('send', channel.id), lambda: channel.send(message, allowed_mentions=NO_MENTIONS))
+            if sent:
+                ACTIVITY_SENT.labels('prompt').inc()
+                logger.info(f'Отправлено сообщение активности в канал: {message}')
                 
         except Exception as e:
             logger.error(f'Ошибка в проверке активности: {e}')
     
-    @tasks.loop(minutes=random.randint(10, 30))  # Случайные интервалы
-    async def random_reactions(self):
+    def _on_random_reaction(self, state, now):
+        """Цикл случайных реакций канала: попытка реакции и следующий срок"""
+        low, high = state.reaction_interval
+        self._push(now + random.randint(low, high) * 60, RANDOM_REACTION, state)
+        self.background.spawn(self.random_reactions(state))
+    
+    async def random_reactions(self, state):
         """Случайные реакции на сообщения"""
         try:
-            channel = self.bot.get_channel(ACTIVITY_CHANNEL_ID)
+            channel = self.bot.get_channel(state.channel_id)
             if not channel:
                 return
             
-            # Получаем последние несколько сообщений
-            messages = []
-            async for message in channel.history(limit=5):
-                if message.author != self.bot.user and not message.reactions:
-                    messages.append(message)
+            # Последние сообщения берутся из буфера в памяти, без запроса истории
+            candidates = [record for record in state.recent if not record.has_reactions]
             
-            if messages:
+            if candidates:
                 # Выбираем случайное сообщение для реакции
-                message = random.choice(messages)
+                record = random.choice(candidates)
                 emoji = random.choice(REACTION_EMOJIS)
                 
                 # Добавляем реакцию с небольшой вероятностью
-                if random.random() < 0.3:  # 30% шанс
-                    await message.add_reaction(emoji)
+                if random.random() < state.reaction_chance:
+                    record.has_reactions = True
+                    message = channel.get_partial_message(record.message_id)
+                    await schedule(self.bot, Priority.ACTIVITY, ('reaction', channel.id), lambda: message.add_reaction(emoji))
+                    ACTIVITY_SENT.labels('random_reaction').inc()
                     logger.info(f'Добавлена реакция {emoji} к сообщению')
                     
         except Exception as e:
             logger.error(f'Ошибка при добавлении реакций: {e}')
     
     async def respond_to_message(self, message):
-        """Ответ на сообщение пользователя"""
+        """
+        Ответ на сообщение пользователя. Здесь только решение; задержка и отправка
+        уходят в фоновую задачу, поэтому обработка команд не ждёт ответа
+        """
         try:
-            # Проверяем канал
-            if message.channel.id != ACTIVITY_CHANNEL_ID:
+            # Проверяем канал и учитываем сообщение (время берём из потока событий, а не из истории)
+            state = self.record_activity(message)
+            if state is None:
                 return
+            self.reply_engine.observe(message)
             
             # Не отвечаем на свои сообщения
             if message.author == self.bot.user:
@@ -147,52 +401,98 @@ class ChatActivitySystem:
             if message.content.startswith('!'):
                 return
             
-            # Случайный шанс ответить (15%)
-            if random.random() < 0.15:
-                response = random.choice(RESPONSE_MESSAGES)
-                
-                # Добавляем небольшую задержку для естественности
-                await asyncio.sleep(random.randint(2, 8))
-                await message.reply(response)
-                logger.info(f'Ответ на сообщение: {response}')
+            # Случайный шанс ответить
+            if random.random() < state.response_chance:
+                self.background.spawn(self._reply(message, state))
             
-            # Случайный шанс добавить реакцию (25%)
-            elif random.random() < 0.25:
+            # Случайный шанс добавить реакцию
+            elif random.random() < state.reply_reaction_chance:
                 emoji = random.choice(REACTION_EMOJIS)
-                await message.add_reaction(emoji)
-                logger.info(f'Добавлена реакция {emoji}')
+                self.background.spawn(self._react(message, emoji))
                 
         except Exception as e:
             logger.error(f'Ошибка при ответе на сообщение: {e}')
     
-    @check_activity.before_loop
-    async def before_check_activity(self):
-        """Ожидание готовности бота"""
-        await self.bot.wait_until_ready()
+    async def _reply(self, message, state):
+        """Отложенный ответ на сообщение"""
+        try:
+            # Добавляем небольшую задержку для естественности
+            await asyncio.sleep(random.randint(2, 8))
+            response = await self.reply_engine.generate(message.channel.id, state.response_messages)
+            if response is None:
+                return  # Ответ канала уже готовится по более свежему контексту
+            sent = await schedule(self.bot, Priority.ACTIVITY, ('send', message.channel.id), lambda: message.reply(response, allowed_mentions=NO_MENTIONS))
+            if sent:
+                ACTIVITY_SENT.labels('reply').inc()
+                logger.info(f'Ответ на сообщение: {response}')
+        except Exception as e:
+            logger.error(f'Ошибка при ответе на сообщение: {e}')
+    
+    async def _react(self, message, emoji):
+        """Реакция на сообщение"""
+        try:
+            await schedule(self.bot, Priority.ACTIVITY, ('reaction', message.channel.id), lambda: message.add_reaction(emoji))
+            ACTIVITY_SENT.labels('reaction').inc()
+            logger.info(f'Добавлена реакция {emoji}')
+        except Exception as e:
+            logger.error(f'Ошибка при добавлении реакции: {e}')
     
-    @random_reactions.before_loop
-    async def before_random_reactions(self):
-        """Ожидание готовности бота"""
-        await self.bot.wait_until_ready()
-        # Добавляем случайную задержку при запуске
-        await asyncio.sleep(random.randint(60, 300))  # 1-5 минут
+    def stop(self):
+        """Остановка общего цикла"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._heap.clear()
+        self.background.cancel()
+        self.bot.remove_listener(self._on_raw_reaction_add, 'on_raw_reaction_add')
+        router = get_event_router(self.bot)
+        for name in self._routes.values():
+            router.unregister(name)
+        self._routes.clear()
+        self.bot.remove_listener(self._on_raw_message_delete, 'on_raw_message_delete')
+
+def configured_channels(bot):
+    """Каналы активности серверов этого процесса из текущей конфигурации"""
+    snapshot = get_config(bot).snapshot
+    return [
+        channel
+        for guild_id, guild in snapshot.guilds.items() if owns_guild(bot, guild_id)
+        for channel in guild['activity']['channels']
+    ]
 
 async def setup_chat_activity(bot):
     """Настройка системы активности в чате"""
     try:
-        # Создаем систему активности
-        activity_system = ChatActivitySystem(bot)
+        # Повторная настройка перезапустила бы фоновые задачи
+        if getattr(bot, 'activity_system', None) is not None:
+            return bot.activity_system
+        
+        # Создаем систему активности с каналами всех настроенных серверов
+        activity_system = ChatActivitySystem(bot, configured_channels(bot))
         
         # Сохраняем ссылку на систему активности в боте
         bot.activity_system = activity_system
         
-        # Находим канал и отправляем уведомление
-        channel = bot.get_channel(ACTIVITY_CHANNEL_ID)
-        if channel:
-            logger.info(f'Система активности настроена для канала: {channel.name}')
-        else:
-            logger.error(f'Канал активности не найден с ID: {ACTIVITY_CHANNEL_ID}')
+        # Проверяем каналы
+        for channel_id in activity_system.channels:
+            channel = bot.get_channel(channel_id)
+            if channel:
+                logger.info(f'Система активности настроена для канала: {channel.name}')
+            else:
+                logger.error(f'Канал активности не найден с ID: {channel_id}')
+        
+        return activity_system
             
     except Exception as e:
         logger.error(f'Ошибка настройки системы активности: {e}')
-        raise
\ No newline at end of file
+        raise
+
+async def update_chat_activity(bot):
+    """Применение изменённых каналов активности из конфигурации"""
+    activity_system = getattr(bot, 'activity_system', None)
+    if activity_system is None:
+        return
+    try:
+        activity_system.update_channels(configured_channels(bot))
+    except Exception as e:
+        logger.error(f'Ошибка обновления каналов активности: {e}')
@@ -13,6 +13,11 @@ WELCOME_CHANNEL_ID = 1385303735281914011
 SUPPORT_CHANNEL_ID = 1375826419158089751
 SUPPORT_ROLE_ID = 1376222106760773836  # Роль техподдержки
 TICKETS_CATEGORY_ID = None  # Категория для тикетов (будет создана автоматически)
+TICKET_CATEGORY_NAME = "🎫 Тикеты поддержки"  # Дополнительные категории получают номер: "... 2", "... 3"
+TICKET_CATEGORY_CHANNEL_LIMIT = 50  # Ограничение Discord на количество каналов в категории
+TICKET_DELETE_DELAY = 24 * 60 * 60  # Через сколько секунд после закрытия удаляется канал тикета
+MAX_OPEN_TICKETS_PER_USER = 2  # Сколько открытых тикетов может быть у одного пользователя
+TICKET_RESERVATION_GRACE = 600  # Через сколько секунд тикет без канала (процесс упал при создании) освобождает место
 
 # Admin Application Channels
 MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID = 1375818535141376030  # Канал для подачи заявок в Minecraft администрацию
@@ -20,6 +25,27 @@ MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID = 1375873913321689098    # Канал ку
 DISCORD_ADMIN_APPLICATION_CHANNEL_ID = 1375818773994537001    # Канал для подачи заявок в Discord администрацию
 DISCORD_ADMIN_RESPONSES_CHANNEL_ID = 1375850180007563264      # Канал куда отправляются заявки в Discord администрацию
 
+# Local Data Storage
+DATA_DIR = os.getenv("BOT_DATA_DIR", "data")
+PANEL_REGISTRY_PATH = os.path.join(DATA_DIR, "panels.json")  # ID и хэши опубликованных панелей
+TIMERS_DB_PATH = os.path.join(DATA_DIR, "timers.sqlite3")  # Отложенные действия (удаление каналов и т.п.)
+TICKETS_DB_PATH = os.path.join(DATA_DIR, "tickets.sqlite3")  # Тикеты поддержки и их состояние
+APPLICATIONS_DB_PATH = os.path.join(DATA_DIR, "applications.sqlite3")  # Заявки в администрацию
+DM_DB_PATH = os.path.join(DATA_DIR, "dm_outbox.sqlite3")  # Очередь личных сообщений и недоставленные
+
+# Reloadable Configuration (каналы, тексты и категории ниже можно переопределить в файле без перезапуска)
+CONFIG_PATH = os.getenv("BOT_CONFIG_PATH", os.path.join(DATA_DIR, "config.json"))
+CONFIG_WATCH_INTERVAL = 5.0  # Как часто проверять изменение файла, секунд (0 - только командой !config reload)
+
+# Timer Service (постоянный планировщик отложенных действий)
+TIMER_BATCH_SIZE = 50      # Сколько наступивших действий выполнять за один проход
+TIMER_MAX_ATTEMPTS = 5     # После стольких ошибок действие отбрасывается
+
+# DM Queue (личные сообщения о решениях по заявкам)
+DM_MAX_CONCURRENCY = 2     # Одновременно доставляемых сообщений
+DM_BATCH_SIZE = 20         # Сообщений за один проход цикла
+DM_MAX_ATTEMPTS = 5        # После стольких временных ошибок сообщение считается недоставленным
+
 # Embed Colors (hex colors)
 WELCOME_COLOR = 0x00ff00  # Зеленый цвет для приветствия
 GOODBYE_COLOR = 0xff8c00   # Оранжевый цвет для прощания
@@ -46,6 +72,11 @@ WELCOME_BUTTON_ENABLED = True
 WELCOME_BUTTON_LABEL = "📖 Информация для новичков"
 WELCOME_BUTTON_URL = "https://discord.com/channels/1375772175373566012/1375772176107700266"
 
+# Объединение приветствий при массовых заходах (рейды, волны ботов)
+WELCOME_BATCH_ENABLED = True
+WELCOME_BATCH_WINDOW = 3.0     # Сколько секунд собирать заходы в одно сообщение
+WELCOME_BATCH_MAX_SIZE = 10    # Максимум участников в одном объединённом приветствии
+
 GOODBYE_TITLE = "👋 Пользователь покинул сервер"
 GOODBYE_DESCRIPTION = "Жаль, что ты ушёл! Надеемся увидеть тебя снова."
 
@@ -132,6 +163,103 @@ DISCORD_ADMIN_FIELDS = [
 ]
 
 DISCORD_ADMIN_BUTTON_LABEL = "📝 Подать заявку"
+APPLICATIONS_PAGE_SIZE = 10  # Заявок на одной странице команды !applications
+
+# Chat Activity (каналы основного сервера; тексты и шансы по умолчанию - в chat_activity.py)
+ACTIVITY_CHANNEL_ID = 1375820312155000873  # Основной чат канал
+INACTIVITY_TIMEOUT = 30  # Время бездействия, после которого бот начинает общаться (в минутах)
+# Необязательные ключи канала берут значения из ActivityChannel.DEFAULTS
+ACTIVITY_CHANNELS = [
+    {
+        "channel_id": ACTIVITY_CHANNEL_ID,
+        "inactivity_timeout": INACTIVITY_TIMEOUT,  # минуты
+    },
+]
+
+# Outbound Scheduler (общая очередь исходящих запросов)
+# Лимиты маршрутов: тип запроса -> (токенов в секунду, максимальный запас) на канал
+OUTBOUND_ROUTE_LIMITS = {
+    "send": (1.0, 5),              # ~5 сообщений за 5 секунд в один канал
+    "reaction": (4.0, 1),          # 1 реакция за 0.25 секунды в один канал
+    "edit": (1.0, 5),              # Правки сообщений
+    "channel_edit": (2 / 600, 2),  # Переименования канала: 2 за 10 минут
+    "dm": (2.0, 5),                # Личные сообщения: один bucket на всего бота
+    "default": (1.0, 5)
+}
+OUTBOUND_SHARED_ROUTES = ("dm",)  # Маршруты на весь бот: при нескольких процессах bucket общий
+OUTBOUND_MAX_QUEUE = 200        # Выше этой глубины очереди запросы активности отбрасываются
+OUTBOUND_MAX_CONCURRENCY = 8    # Максимум одновременных запросов к Discord
+OUTBOUND_ACTIVITY_MAX_AGE = 30.0  # Сколько секунд запрос активности может ждать в очереди
+
+# Admission Control (ограничение частоты кнопок и форм на пользователя)
+# Действие -> (токенов в секунду, максимальный запас) на одного пользователя
+ADMISSION_LIMITS = {
+    "ticket:open": (1 / 10, 3),           # Кнопка "Создать тикет" и выбор категории
+    "ticket:submit": (1 / 60, 2),         # Отправка формы тикета
+    "ticket:manage": (1.0, 5),            # Кнопки сотрудников в тикете
+    "application:open": (1 / 10, 3),      # Кнопка "Подать заявку"
+    "application:submit": (1 / 300, 1),   # Отправка заявки: одна за 5 минут
+    "application:review": (1.0, 5),       # Кнопки рассмотрения заявки
+    "default": (1 / 5, 3)
+}
+ADMISSION_MAX_ENTRIES = 10000    # Сколько пар (пользователь, действие) держать в памяти
+ADMISSION_TTL = 3600             # Через сколько секунд простоя запись вытесняется
+ADMISSION_DEDUPE_WINDOW = 600    # В течение скольких секунд одинаковая форма считается повтором
+
+# LLM Replies (контекстные ответы в чате через OpenAI-совместимый API; без ключа - готовые фразы)
+LLM_API_KEY = os.getenv("OPENAI_API_KEY")
+LLM_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None - api.openai.com; для стенда - локальная заглушка
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_MAX_CONCURRENCY = 4      # Одновременных запросов к API
+LLM_TIMEOUT = 8.0            # Секунд на ответ (включая ожидание слота), дальше - готовая фраза
+LLM_MAX_TOKENS = 120
+LLM_CONTEXT_MESSAGES = 8     # Сколько последних сообщений канала передавать в запрос
+LLM_COALESCE_WINDOW = 3.0    # Запросы одного канала в этом окне объединяются в один
+LLM_CACHE_SIZE = 512         # Ответов в кэше
+LLM_CACHE_TTL = 600          # Секунд жизни ответа в кэше
+LLM_SYSTEM_PROMPT = (
+    "Ты дружелюбный участник чата Minecraft-сервера Limonericx. Отвечай по-русски, "
+    "коротко (одно-два предложения), по теме разговора, без ссылок и упоминаний."
+)
+
+# Logging (запись в отдельном потоке, JSON-строки, ротация по размеру и времени)
+LOG_PATH = os.getenv("BOT_LOG_PATH", "bot.log")
+LOG_LEVEL = os.getenv("BOT_LOG_LEVEL", "INFO")
+LOG_JSON = True                   # False - обычный текстовый формат в файле
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Ротация при превышении размера...
+LOG_ROTATE_WHEN = "midnight"      # ...и раз в сутки
+LOG_BACKUP_COUNT = 14             # Сколько старых файлов хранить
+LOG_QUEUE_SIZE = 10000            # Выше этого записи отбрасываются, а не блокируют бота
+LOG_SAMPLING = {                  # Логгер -> доля сохраняемых записей INFO и ниже
+    "chat_activity": 0.1,
+}
+
+# Metrics (Prometheus-эндпоинт GET /metrics в цикле событий бота, только локальный интерфейс)
+METRICS_ENABLED = os.getenv("BOT_METRICS", "1") == "1"
+METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "9108"))  # 0 - любой свободный порт
+
+# Profiling (cProfile для выбранных обработчиков по команде !profile)
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")  # Файлы .prof и сводки
+PROFILE_DEFAULT_SECONDS = 60   # Длительность сеанса по умолчанию
+PROFILE_MAX_SECONDS = 600      # Больше профилировать нельзя, даже если забыли остановить
+PROFILE_TOP_N = 15             # Строк в сводке
+
+# Sharding (несколько процессов, каждый со своими шардами шлюза; без BOT_SHARD_COUNT - один обычный бот)
+SHARD_COUNT = int(os.getenv("BOT_SHARD_COUNT", "0"))  # Всего шардов (0 - без шардирования)
+SHARD_IDS = [int(shard) for shard in os.getenv("BOT_SHARD_IDS", "").split(",") if shard.strip()]  # Шарды процесса (пусто - все)
+SHARD_PROCESSES = int(os.getenv("BOT_SHARD_PROCESSES", "1"))  # Больше 1 - main.py запускает супервизор процессов
+SHARD_WORKER_ID = os.getenv("BOT_WORKER_ID")  # Номер процесса, задаётся супервизором
+SHARD_IDENTIFY_CONCURRENCY = 1     # max_concurrency из GET /gateway/bot: сколько IDENTIFY за 5 секунд
+SHARD_RESTART_DELAY = 5.0          # Пауза перед перезапуском упавшего процесса, секунд...
+SHARD_RESTART_MAX_DELAY = 300.0    # ...удваивается при частых падениях до этого предела
+SHARD_STABLE_AFTER = 600.0         # Процесс, проработавший столько секунд, снова перезапускается быстро
+
+# Shared State (лимиты, панели и общие счётчики процессов; local - только память процесса)
+STATE_BACKEND = os.getenv("BOT_STATE_BACKEND", "sqlite" if SHARD_WORKER_ID is not None else "local")
+STATE_DB_PATH = os.path.join(DATA_DIR, "state.sqlite3")
+STATE_LEASE_SECONDS = 120.0  # На сколько процесс забирает отложенное действие или ЛС на выполнение
+STATE_LOCK_TIMEOUT = 0.05    # Сколько секунд лимит частоты ждёт блокировку общей базы, потом - локальный bucket
 
 # Bot Settings
 BOT_COMMAND_PREFIX = "!"
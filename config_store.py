@@ -0,0 +1,497 @@
+"""
+Перезагружаемая конфигурация серверов
+Каналы, тексты embed, кнопки и категории тикетов собираются в неизменяемый снимок с номером
+версии: значения по умолчанию из config.py, поверх них - переопределения из файла данных.
+Кроме основного сервера в файле можно описать серверы-партнёры: каждый получает свою
+конфигурацию (GuildConfig), поиск по ID сервера - одно обращение к словарю. Одинаковые разделы
+разных серверов хранятся и собираются в шаблоны один раз.
+Новый снимок подменяет старый одним присваиванием (по команде !config reload или при изменении
+файла), обработчики берут текущий снимок в начале события, а панели обновляются только если
+изменился их раздел. Перезапуск и повторное подключение к шлюзу не нужны
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from types import MappingProxyType
+from embed_templates import TEMPLATE_SECTIONS, build_template
+from config import (
+    CONFIG_PATH,
+    CONFIG_WATCH_INTERVAL,
+    LIMONERICX_SERVER_ID,
+    WELCOME_CHANNEL_ID,
+    WELCOME_COLOR,
+    WELCOME_TITLE,
+    WELCOME_DESCRIPTION,
+    WELCOME_FIELDS,
+    WELCOME_BUTTON_ENABLED,
+    WELCOME_BUTTON_LABEL,
+    WELCOME_BUTTON_URL,
+    WELCOME_BATCH_ENABLED,
+    WELCOME_BATCH_WINDOW,
+    WELCOME_BATCH_MAX_SIZE,
+    GOODBYE_COLOR,
+    GOODBYE_TITLE,
+    GOODBYE_DESCRIPTION,
+    SUPPORT_CHANNEL_ID,
+    SUPPORT_ROLE_ID,
+    SUPPORT_EMBED_COLOR,
+    SUPPORT_TITLE,
+    SUPPORT_DESCRIPTION,
+    SUPPORT_FIELDS,
+    SUPPORT_BUTTON_LABEL,
+    TICKET_CATEGORIES,
+    MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID,
+    MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID,
+    MINECRAFT_ADMIN_EMBED_COLOR,
+    MINECRAFT_ADMIN_TITLE,
+    MINECRAFT_ADMIN_DESCRIPTION,
+    MINECRAFT_ADMIN_FIELDS,
+    MINECRAFT_ADMIN_BUTTON_LABEL,
+    DISCORD_ADMIN_APPLICATION_CHANNEL_ID,
+    DISCORD_ADMIN_RESPONSES_CHANNEL_ID,
+    DISCORD_ADMIN_EMBED_COLOR,
+    DISCORD_ADMIN_TITLE,
+    DISCORD_ADMIN_DESCRIPTION,
+    DISCORD_ADMIN_FIELDS,
+    DISCORD_ADMIN_BUTTON_LABEL,
+    ACTIVITY_CHANNELS
+)
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Discord на количество полей embed и вариантов в выпадающем списке
+MAX_EMBED_FIELDS = 25
+MAX_SELECT_OPTIONS = 25
+
+# Обязательные ключи элементов списков в разделах
+REQUIRED_ITEM_KEYS = {
+    'fields': {'name', 'value', 'inline'},
+    'categories': {'label', 'value', 'emoji'},
+    'channels': {'channel_id'},
+}
+
+# Типы значений в элементах списков (ключи, которых здесь нет, не проверяются)
+ITEM_TYPES = {
+    'fields': {'name': str, 'value': str, 'inline': bool},
+    'categories': {'label': str, 'value': str, 'emoji': str, 'description': str},
+    'channels': {'channel_id': int, 'inactivity_timeout': (int, float)},
+}
+
+# Ограничения Discord на длину текста: параметр раздела или "список.ключ" элемента -> символов
+MAX_TEXT_LENGTH = {
+    'title': 256,
+    'description': 4096,
+    'footer': 2048,
+    'button_label': 80,
+    'fields.name': 256,
+    'fields.value': 1024,
+    'categories.label': 100,
+    'categories.value': 100,
+    'categories.description': 100,
+}
+
+# Цвет embed - 24-битный RGB
+MAX_COLOR = 0xFFFFFF
+
+def default_sections():
+    """Разделы конфигурации со значениями из config.py"""
+    return {
+        'server': {
+            'guild_id': LIMONERICX_SERVER_ID,
+        },
+        'welcome': {
+            'channel_id': WELCOME_CHANNEL_ID,
+            'title': WELCOME_TITLE,
+            'description': WELCOME_DESCRIPTION,
+            'color': WELCOME_COLOR,
+            'fields': WELCOME_FIELDS,
+            'button_enabled': WELCOME_BUTTON_ENABLED,
+            'button_label': WELCOME_BUTTON_LABEL,
+            'button_url': WELCOME_BUTTON_URL,
+            'batch_enabled': WELCOME_BATCH_ENABLED,
+            'batch_window': WELCOME_BATCH_WINDOW,
+            'batch_max_size': WELCOME_BATCH_MAX_SIZE,
+        },
+        'goodbye': {
+            'title': GOODBYE_TITLE,
+            'description': GOODBYE_DESCRIPTION,
+            'color': GOODBYE_COLOR,
+        },
+        'support': {
+            'channel_id': SUPPORT_CHANNEL_ID,
+            'role_id': SUPPORT_ROLE_ID,
+            'title': SUPPORT_TITLE,
+            'description': SUPPORT_DESCRIPTION,
+            'color': SUPPORT_EMBED_COLOR,
+            'fields': SUPPORT_FIELDS,
+            'footer': "Команда поддержки Limonericx • Мы всегда готовы помочь!",
+            'button_label': SUPPORT_BUTTON_LABEL,
+            'categories': TICKET_CATEGORIES,
+        },
+        'minecraft_admin': {
+            'application_channel_id': MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID,
+            'responses_channel_id': MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID,
+            'title': MINECRAFT_ADMIN_TITLE,
+            'description': MINECRAFT_ADMIN_DESCRIPTION,
+            'color': MINECRAFT_ADMIN_EMBED_COLOR,
+            'fields': MINECRAFT_ADMIN_FIELDS,
+            'footer': "Администрация Limonericx • Присоединяйтесь к нашей команде!",
+            'button_label': MINECRAFT_ADMIN_BUTTON_LABEL,
+        },
+        'discord_admin': {
+            'application_channel_id': DISCORD_ADMIN_APPLICATION_CHANNEL_ID,
+            'responses_channel_id': DISCORD_ADMIN_RESPONSES_CHANNEL_ID,
+            'title': DISCORD_ADMIN_TITLE,
+            'description': DISCORD_ADMIN_DESCRIPTION,
+            'color': DISCORD_ADMIN_EMBED_COLOR,
+            'fields': DISCORD_ADMIN_FIELDS,
+            'footer': "Администрация Discord Limonericx • Помогите нам модерировать сервер!",
+            'button_label': DISCORD_ADMIN_BUTTON_LABEL,
+        },
+        'activity': {
+            'channels': ACTIVITY_CHANNELS,
+        },
+    }
+
+def partner_defaults(primary, guild_id):
+    """Значения по умолчанию сервера-партнёра: тексты основного сервера без его каналов и ролей"""
+    sections = {
+        name: {key: None if key.endswith('_id') else value for key, value in section.items()}
+        for name, section in primary.items()
+    }
+    sections['server']['guild_id'] = guild_id
+    sections['activity']['channels'] = []
+    return sections
+
+def _is_instance(value, types):
+    """isinstance, в котором bool не считается числом"""
+    if isinstance(value, bool) and bool not in (types if isinstance(types, tuple) else (types,)):
+        return False
+    return isinstance(value, types)
+
+def _check_length(where, key, value):
+    limit = MAX_TEXT_LENGTH.get(key)
+    if limit is not None and len(value) > limit:
+        raise ValueError(f'{where}: длиннее {limit} символов')
+
+def _check_items(where, value):
+    """Проверка элементов списка раздела: обязательные ключи, типы и длина текста"""
+    list_key = where.rpartition('.')[2]
+    keys = REQUIRED_ITEM_KEYS.get(list_key, set())
+    types = ITEM_TYPES.get(list_key, {})
+    for index, item in enumerate(value):
+        if not isinstance(item, dict) or not keys <= set(item):
+            raise ValueError(f'{where}[{index}]: ожидаются ключи {", ".join(sorted(keys))}')
+        for key, item_value in item.items():
+            if key in types and not _is_instance(item_value, types[key]):
+                raise ValueError(f'{where}[{index}].{key}: неверный тип значения {item_value!r}')
+            if isinstance(item_value, str):
+                _check_length(f'{where}[{index}].{key}', f'{list_key}.{key}', item_value)
+
+def _check_value(where, default, value):
+    """Проверка типа переопределения по значению по умолчанию; возвращает нормализованное значение"""
+    key = where.rpartition('.')[2]
+    if key == 'color':
+        if isinstance(value, str):
+            try:
+                value = int(value.lstrip('#').removeprefix('0x'), 16)  # "#00ff00" и "0x00ff00"
+            except ValueError:
+                raise ValueError(f'{where}: ожидается цвет, получено {value!r}')
+        if not _is_instance(value, int) or not 0 <= value <= MAX_COLOR:
+            raise ValueError(f'{where}: ожидается цвет от 0 до 0xFFFFFF, получено {value!r}')
+        return value
+
+    if isinstance(default, bool):
+        valid = isinstance(value, bool)
+    elif isinstance(default, int) or (default is None and where.endswith('_id')):
+        valid = (isinstance(value, int) and not isinstance(value, bool)) or (default is None and value is None)
+    elif isinstance(default, float):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif isinstance(default, str):
+        valid = isinstance(value, str)
+        if valid:
+            _check_length(where, key, value)
+    elif isinstance(default, list):
+        if not isinstance(value, list):
+            raise ValueError(f'{where}: ожидается список')
+        _check_items(where, value)
+        return value
+    else:
+        valid = True
+
+    if not valid:
+        raise ValueError(f'{where}: неверный тип значения {value!r}')
+    return value
+
+def merge_sections(defaults, overrides):
+    """Значения по умолчанию с переопределениями одного сервера; ValueError при ошибке"""
+    if not isinstance(overrides, dict):
+        raise ValueError('Конфигурация сервера должна быть объектом с разделами')
+
+    sections = {name: dict(section) for name, section in defaults.items()}
+    for name, section in overrides.items():
+        if name not in sections:
+            raise ValueError(f'Неизвестный раздел {name}')
+        if not isinstance(section, dict):
+            raise ValueError(f'Раздел {name} должен быть объектом')
+        for key, value in section.items():
+            if key not in sections[name]:
+                raise ValueError(f'Неизвестный параметр {name}.{key}')
+            sections[name][key] = _check_value(f'{name}.{key}', defaults[name][key], value)
+
+    # Ограничения Discord проверяются до замены снимка, а не при отправке
+    for name, section in sections.items():
+        if len(section.get('fields', ())) > MAX_EMBED_FIELDS:
+            raise ValueError(f'{name}.fields: больше {MAX_EMBED_FIELDS} полей')
+    categories = sections['support']['categories']
+    if not 1 <= len(categories) <= MAX_SELECT_OPTIONS:
+        raise ValueError(f'support.categories: нужно от 1 до {MAX_SELECT_OPTIONS} категорий')
+    if len({category['value'] for category in categories}) != len(categories):
+        raise ValueError('support.categories: значения value повторяются')
+    return sections
+
+def merge_guilds(overrides):
+    """
+    Конфигурации всех серверов из содержимого файла: разделы верхнего уровня - основной
+    сервер, объект guilds - серверы-партнёры по ID. Возвращает ID сервера -> разделы
+    """
+    if not isinstance(overrides, dict):
+        raise ValueError('Файл конфигурации должен содержать объект с разделами')
+    overrides = dict(overrides)
+    partners = overrides.pop('guilds', {})
+    if not isinstance(partners, dict):
+        raise ValueError('guilds: ожидается объект "ID сервера": {разделы}')
+
+    primary = merge_sections(default_sections(), overrides)
+    primary_id = primary['server']['guild_id']
+    guilds = {primary_id: primary}
+    for key, guild_overrides in partners.items():
+        try:
+            guild_id = int(key)
+        except ValueError:
+            raise ValueError(f'guilds: {key!r} не является ID сервера')
+        if guild_id in guilds:
+            raise ValueError(f'guilds: сервер {guild_id} описан дважды')
+        try:
+            guilds[guild_id] = merge_sections(partner_defaults(primary, guild_id), guild_overrides)
+        except ValueError as e:
+            raise ValueError(f'guilds.{guild_id}: {e}')
+    return primary_id, guilds
+
+def section_hashes(sections):
+    """Хэш содержимого каждого раздела - по нему видно, какие разделы изменились"""
+    return {
+        name: hashlib.sha256(json.dumps(section, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        for name, section in sections.items()
+    }
+
+def changed_sections(old, new):
+    """Пары (ID сервера, раздел), которые отличаются в двух наборах хэшей (включая новые и убранные серверы)"""
+    changed = []
+    for guild_id in dict.fromkeys([*new, *old]):
+        old_hashes = old.get(guild_id, {})
+        new_hashes = new.get(guild_id, {})
+        for name in dict.fromkeys([*new_hashes, *old_hashes]):
+            if old_hashes.get(name) != new_hashes.get(name):
+                changed.append((guild_id, name))
+    return changed
+
+def _freeze(value, memo):
+    """Неизменяемая копия значения; memo - уже замороженные списки и словари по id оригинала"""
+    if not isinstance(value, (dict, list)):
+        return value
+    frozen = memo.get(id(value))
+    if frozen is None:
+        if isinstance(value, dict):
+            frozen = MappingProxyType({key: _freeze(item, memo) for key, item in value.items()})
+        else:
+            frozen = tuple(_freeze(item, memo) for item in value)
+        memo[id(value)] = frozen
+    return frozen
+
+def _template_key(section):
+    """Всё, от чего зависит шаблон раздела: каналы и подписи кнопок на него не влияют"""
+    return (section['title'], section['description'], section['color'],
+            id(section.get('fields', ())), section.get('footer'))
+
+class GuildConfig:
+    """Конфигурация одного сервера: разделы, их хэши и собранные шаблоны embed"""
+
+    __slots__ = ('guild_id', 'primary', 'sections', 'hashes', 'templates')
+
+    def __init__(self, guild_id, primary, sections, hashes, templates):
+        self.guild_id = guild_id
+        self.primary = primary
+        self.sections = sections
+        self.hashes = hashes
+        self.templates = templates
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def panel_name(self, section):
+        """Имя панели раздела в реестре панелей (у основного сервера - прежнее, без ID)"""
+        return section if self.primary else f'{section}@{self.guild_id}'
+
+class ConfigSnapshot:
+    """Неизменяемый снимок конфигурации всех серверов"""
+
+    __slots__ = ('version', 'loaded_at', 'primary', 'guilds', 'hashes')
+
+    def __init__(self, version, primary_id, guilds, hashes=None):
+        self.version = version
+        self.loaded_at = time.time()
+        if hashes is None:
+            hashes = {guild_id: section_hashes(sections) for guild_id, sections in guilds.items()}
+
+        # Серверы-партнёры обычно наследуют тексты основного: одинаковые разделы и списки
+        # замораживаются один раз на снимок, а шаблон собирается один раз на набор текстов
+        # (списки полей уже общие, поэтому в ключе шаблона достаточно их id)
+        memo = {}
+        frozen = {}
+        templates = {}
+        configs = {}
+        for guild_id, sections in guilds.items():
+            guild_hashes = hashes[guild_id]
+            guild_sections = {}
+            guild_templates = {}
+            for name, section in sections.items():
+                key = (name, guild_hashes[name])
+                if key not in frozen:
+                    frozen[key] = _freeze(section, memo)
+                guild_sections[name] = frozen[key]
+                if name in TEMPLATE_SECTIONS:
+                    template_key = _template_key(frozen[key])
+                    if template_key not in templates:
+                        templates[template_key] = build_template(frozen[key])
+                    guild_templates[name] = templates[template_key]
+            configs[guild_id] = GuildConfig(
+                guild_id,
+                guild_id == primary_id,
+                MappingProxyType(guild_sections),
+                MappingProxyType(guild_hashes),
+                MappingProxyType(guild_templates)
+            )
+
+        self.guilds = MappingProxyType(configs)
+        self.hashes = MappingProxyType(hashes)
+        self.primary = configs[primary_id]
+
+    def guild(self, guild_id):
+        """Конфигурация сервера или None, если бот на нём не настроен"""
+        return self.guilds.get(guild_id)
+
+class ConfigStore:
+    """Текущий снимок конфигурации, его перезагрузка и слежение за файлом"""
+
+    def __init__(self, path=CONFIG_PATH, watch_interval=CONFIG_WATCH_INTERVAL):
+        self.path = path
+        self.watch_interval = watch_interval
+        self._listeners = []
+        self._task = None
+        self._lock = asyncio.Lock()
+        self._mtime = self._stat()
+
+        try:
+            primary_id, guilds = self._read()
+        except (OSError, ValueError) as e:
+            logger.error(f'Ошибка в файле конфигурации {self.path}, используются значения по умолчанию: {e}')
+            primary_id, guilds = merge_guilds({})
+        self.snapshot = ConfigSnapshot(1, primary_id, guilds)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        """Серверы и разделы из файла поверх значений по умолчанию (файла нет - только основной сервер)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+        except FileNotFoundError:
+            overrides = {}
+        return merge_guilds(overrides)
+
+    def _build(self, old):
+        """Новый снимок и изменения относительно old (снимок None, если изменений нет)"""
+        primary_id, guilds = self._read()
+        hashes = {guild_id: section_hashes(sections) for guild_id, sections in guilds.items()}
+        changed = changed_sections(old.hashes, hashes)
+        if not changed:
+            return None, changed
+        return ConfigSnapshot(old.version + 1, primary_id, guilds, hashes), changed
+
+    def subscribe(self, callback):
+        """callback(old, new, changed) - корутина, вызываемая после замены снимка"""
+        self._listeners.append(callback)
+
+    async def reload(self):
+        """
+        Перечитывание файла. Если разделы изменились, снимок заменяется новой версией.
+        Возвращает (текущий снимок, список изменённых пар (ID сервера, раздел)); ошибка в файле - ValueError
+        """
+        async with self._lock:
+            self._mtime = self._stat()
+            # С сотнями серверов разбор, хэши и сборка снимка заметны - они идут вне цикла событий
+            old = self.snapshot
+            snapshot, changed = await asyncio.to_thread(self._build, old)
+            if not changed:
+                return old, changed
+            self.snapshot = snapshot
+            logger.info(f'Конфигурация обновлена до версии {snapshot.version}: {len(snapshot.guilds)} серверов, '
+                        f'изменены разделы: {describe_changes(changed)}')
+
+            # Подписчики применяют версии по порядку: следующая перезагрузка ждёт их
+            for callback in self._listeners:
+                try:
+                    await callback(old, snapshot, changed)
+                except Exception as e:
+                    logger.error(f'Ошибка применения конфигурации: {e}')
+            return snapshot, changed
+
+    async def start(self, bot):
+        """Запуск слежения за файлом (повторный вызов ничего не делает)"""
+        if self.watch_interval and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        """Проверка времени изменения файла; сам файл читается только после изменения"""
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self._stat() == self._mtime:
+                continue
+            try:
+                await self.reload()
+            except (OSError, ValueError) as e:
+                logger.error(f'Конфигурация из {self.path} не применена: {e}')
+            except Exception as e:
+                # Слежение за файлом не должно останавливаться из-за неожиданной ошибки
+                logger.error(f'Неожиданная ошибка перезагрузки конфигурации {self.path}: {e!r}')
+
+def describe_changes(changed):
+    """Список изменений для логов и ответа команды: раздел@ID сервера"""
+    return ', '.join(f'{name}@{guild_id}' for guild_id, name in changed)
+
+def get_config(bot):
+    """Хранилище конфигурации бота (создаётся при первом обращении)"""
+    store = getattr(bot, 'config_store', None)
+    if store is None:
+        store = ConfigStore()
+        bot.config_store = store
+    return store
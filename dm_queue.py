@@ -0,0 +1,288 @@
+"""
+Очередь личных сообщений (уведомления о решениях по заявкам и т.п.)
+Сообщения записываются в SQLite и доставляются одним циклом: не больше
+DM_MAX_CONCURRENCY одновременно, через общий bucket маршрута 'dm' планировщика
+исходящих запросов. Временные ошибки повторяются с экспоненциальной задержкой,
+окончательные (закрытые ЛС, неизвестный пользователь) остаются в базе как failed.
+Пачка забирается на время аренды, поэтому очередь могут разбирать несколько процессов бота
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import discord
+from outbound import Priority, schedule
+from config import DM_DB_PATH, DM_MAX_CONCURRENCY, DM_BATCH_SIZE, DM_MAX_ATTEMPTS, STATE_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Статусы сообщения
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Все личные сообщения делят один bucket: Discord ограничивает открытие ЛС на бота, а не на канал
+DM_ROUTE = ('dm', 0)
+
+# Коды ошибок Discord, при которых повтор бесполезен
+CANNOT_MESSAGE_USER = 50007
+UNKNOWN_USER = 10013
+
+class DMQueue:
+    """Постоянная очередь личных сообщений с одним циклом доставки"""
+
+    # Максимальная пауза цикла
+    MAX_SLEEP = 300.0
+    # Задержка повтора после ошибки: RETRY_BASE * 2^попытка, не больше RETRY_MAX
+    RETRY_BASE = 10.0
+    RETRY_MAX = 1800.0
+
+    def __init__(self, path=DM_DB_PATH, max_concurrency=DM_MAX_CONCURRENCY, batch_size=DM_BATCH_SIZE,
+                 max_attempts=DM_MAX_ATTEMPTS, lease=STATE_LEASE_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._next_due = None
+        self._in_flight = 0
+        self._bot = None
+
+        # Метрики
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS dm_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                key TEXT UNIQUE,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS dm_outbox_due ON dm_outbox (status, next_at)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS dm_outbox_user ON dm_outbox (user_id, created_at)')
+
+    def enqueue(self, user_id, kind, content=None, embed=None, key=None):
+        """
+        Постановка личного сообщения в очередь. embed - discord.Embed или его dict.
+        Повтор с тем же key (например, двойное нажатие кнопки) ничего не добавляет
+        """
+        if isinstance(embed, discord.Embed):
+            embed = embed.to_dict()
+        payload = json.dumps({'content': content, 'embed': embed}, ensure_ascii=False)
+        now = time.time()
+        cursor = self._db.execute(
+            '''
+            INSERT OR IGNORE INTO dm_outbox (user_id, kind, payload, key, status, next_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (user_id, kind, payload, key, PENDING, now, now)
+        )
+        if cursor.rowcount and (self._next_due is None or now < self._next_due):
+            self._next_due = now
+            self._wakeup.set()
+        return cursor.rowcount > 0
+
+    def due(self, now=None):
+        """Сообщения, которые ждут отправки прямо сейчас (включая отправляемые)"""
+        now = time.time() if now is None else now
+        row = self._db.execute(
+            'SELECT COUNT(*) FROM dm_outbox WHERE status = ? AND next_at <= ?', (PENDING, now)
+        ).fetchone()
+        return row[0] + self._in_flight
+
+    def failures(self, limit=20):
+        """Последние недоставленные сообщения: (ID пользователя, вид, ошибка, время)"""
+        return self._db.execute(
+            'SELECT user_id, kind, last_error, finished_at FROM dm_outbox WHERE status = ? '
+            'ORDER BY finished_at DESC LIMIT ?',
+            (FAILED, limit)
+        ).fetchall()
+
+    def stats(self):
+        counts = dict(self._db.execute('SELECT status, COUNT(*) FROM dm_outbox GROUP BY status').fetchall())
+        return {
+            'pending': counts.get(PENDING, 0),
+            'sent_total': counts.get(SENT, 0),
+            'failed_total': counts.get(FAILED, 0),
+            'in_flight': self._in_flight,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+        }
+
+    async def start(self, bot):
+        """Запуск цикла доставки (повторный вызов ничего не делает)"""
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f'Очередь личных сообщений запущена, ожидает: {self.stats()["pending"]}')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._db.close()
+
+    def _refresh_next_due(self):
+        row = self._db.execute('SELECT MIN(next_at) FROM dm_outbox WHERE status = ?', (PENDING,)).fetchone()
+        self._next_due = row[0]
+
+    async def _run(self):
+        """Основной цикл: спим до ближайшего срока, затем доставляем пачку"""
+        while True:
+            try:
+                self._refresh_next_due()
+                now = time.time()
+
+                if self._next_due is not None and self._next_due <= now:
+                    await self._process_batch(now)
+                    continue
+
+                timeout = self.MAX_SLEEP if self._next_due is None else min(self.MAX_SLEEP, self._next_due - now)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка в цикле личных сообщений: {e}')
+                await asyncio.sleep(5)
+
+    async def _process_batch(self, now):
+        """Доставка одной пачки; результаты записываются одной транзакцией"""
+        # Пачка забирается одним UPDATE (срок переносится на время аренды): другой процесс
+        # не отправит те же сообщения, а после падения процесса они уйдут по окончании аренды
+        rows = self._db.execute(
+            '''
+            UPDATE dm_outbox SET next_at = ? WHERE id IN (
+                SELECT id FROM dm_outbox WHERE status = ? AND next_at <= ? ORDER BY next_at LIMIT ?
+            )
+            RETURNING id, user_id, kind, payload, attempts
+            ''',
+            (now + self.lease, PENDING, now, self.batch_size)
+        ).fetchall()
+
+        # Пачка ждёт общий bucket ЛС и может идти дольше аренды: аренда продлевается, пока
+        # пачка не доставлена, иначе другой процесс заберёт те же сообщения и отправит их повторно
+        renewal = asyncio.create_task(self._renew_lease([row[0] for row in rows]))
+        try:
+            results = await asyncio.gather(
+                *(self._deliver(user_id, payload) for _, user_id, _, payload, _ in rows),
+                return_exceptions=True
+            )
+        finally:
+            renewal.cancel()
+
+        finished_at = time.time()
+        sent = []
+        failed = []
+        retry = []
+        for (message_id, user_id, kind, _, attempts), result in zip(rows, results):
+            if not isinstance(result, Exception):
+                self.sent += 1
+                sent.append((SENT, finished_at, message_id))
+                continue
+
+            attempts += 1
+            reason = self._describe(result)
+            if self._is_permanent(result) or attempts >= self.max_attempts:
+                self.failed += 1
+                logger.warning(f'Личное сообщение {kind} пользователю {user_id} не доставлено: {reason}')
+                failed.append((FAILED, attempts, reason, finished_at, message_id))
+            else:
+                self.retried += 1
+                delay = min(self.RETRY_MAX, self.RETRY_BASE * 2 ** (attempts - 1))
+                logger.warning(f'Ошибка личного сообщения {kind} пользователю {user_id}, повтор через {delay:.0f} с: {reason}')
+                retry.append((attempts, reason, finished_at + delay, message_id))
+
+        self._db.execute('BEGIN')
+        try:
+            self._db.executemany('UPDATE dm_outbox SET status = ?, finished_at = ? WHERE id = ?', sent)
+            self._db.executemany(
+                'UPDATE dm_outbox SET status = ?, attempts = ?, last_error = ?, finished_at = ? WHERE id = ?', failed
+            )
+            self._db.executemany('UPDATE dm_outbox SET attempts = ?, last_error = ?, next_at = ? WHERE id = ?', retry)
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    async def _renew_lease(self, message_ids):
+        """Продление аренды пачки каждую треть срока"""
+        placeholders = ', '.join('?' for _ in message_ids)
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                self._db.execute(
+                    f'UPDATE dm_outbox SET next_at = ? WHERE status = ? AND id IN ({placeholders})',
+                    (time.time() + self.lease, PENDING, *message_ids)
+                )
+            except sqlite3.Error as e:
+                logger.error(f'Не удалось продлить аренду личных сообщений: {e}')
+
+    @staticmethod
+    def _is_permanent(error):
+        """Закрытые ЛС и неизвестный пользователь не исправятся повтором"""
+        return isinstance(error, (discord.Forbidden, discord.NotFound))
+
+    @staticmethod
+    def _describe(error):
+        if isinstance(error, discord.HTTPException):
+            if error.code == CANNOT_MESSAGE_USER:
+                return 'dms_closed'
+            if error.code == UNKNOWN_USER:
+                return 'unknown_user'
+            return f'http_{error.status}:{error.code}'
+        return repr(error)
+
+    async def _deliver(self, user_id, payload):
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                data = json.loads(payload)
+                embed = discord.Embed.from_dict(data['embed']) if data.get('embed') else None
+                user = self._bot.get_user(user_id) or await self._bot.fetch_user(user_id)
+                await schedule(
+                    self._bot,
+                    Priority.WELCOME,
+                    DM_ROUTE,
+                    lambda: user.send(content=data.get('content'), embed=embed)
+                )
+            finally:
+                self._in_flight -= 1
+
+def get_dm_queue(bot):
+    """Общая очередь личных сообщений бота (создаётся при первом обращении)"""
+    queue = getattr(bot, 'dm_queue', None)
+    if queue is None:
+        queue = DMQueue()
+        bot.dm_queue = queue
+    return queue
@@ -0,0 +1,80 @@
+"""
+Предкомпилированные шаблоны embed-сообщений
+Блоки из снимка конфигурации один раз собираются в неизменяемую основу, а на каждое событие
+подставляются только изменяемые части: упоминание, аватар, счётчик в подвале
+"""
+
+from types import MappingProxyType
+import discord
+
+class EmbedTemplate:
+    """Неизменяемая основа embed-сообщения с заполняемыми слотами"""
+
+    __slots__ = ('title', 'description', 'color', 'fields', 'footer_text', '_base', '_fields')
+
+    def __init__(self, title, description, color, fields=(), footer_text=None):
+        self.title = title
+        self.description = description
+        self.color = color
+        # Поля замораживаются, чтобы случайное изменение не испортило шаблон
+        self.fields = tuple(
+            MappingProxyType({
+                'name': str(field["name"]),
+                'value': str(field["value"]),
+                'inline': field["inline"]
+            })
+            for field in fields
+        )
+        self.footer_text = footer_text
+
+        # Готовая основа payload: на событие копируется только верхний уровень
+        self._base = MappingProxyType({
+            'type': 'rich',
+            'title': title,
+            'description': description,
+            'color': color,
+            'flags': 0,
+        })
+        self._fields = tuple((field['name'], field['value'], field['inline']) for field in self.fields)
+
+    def render(self, description=None, thumbnail_url=None, footer_text=None, footer_icon_url=None):
+        """Создание готового embed с подставленными слотами"""
+        data = dict(self._base)
+        if description is not None:
+            data['description'] = description
+
+        # Каждому embed нужна своя копия полей: discord.py изменяет их на месте
+        data['fields'] = [{'name': name, 'value': value, 'inline': inline} for name, value, inline in self._fields]
+
+        if thumbnail_url is not None:
+            data['thumbnail'] = {'url': thumbnail_url}
+
+        text = self.footer_text if footer_text is None else footer_text
+        if text is not None:
+            footer = {'text': text}
+            if footer_icon_url is not None:
+                footer['icon_url'] = footer_icon_url
+            data['footer'] = footer
+
+        # Обычный discord.Embed: его можно свободно менять, to_dict всегда собирает payload заново
+        return discord.Embed.from_dict(data)
+
+# Разделы конфигурации, из которых собираются шаблоны
+TEMPLATE_SECTIONS = ('welcome', 'goodbye', 'support', 'minecraft_admin', 'discord_admin')
+
+def build_template(section):
+    """
+    Шаблон для раздела снимка конфигурации (config_store).
+    Собирается один раз на версию раздела, а не на каждое событие
+    """
+    return EmbedTemplate(
+        title=section['title'],
+        description=section['description'],
+        color=section['color'],
+        fields=section.get('fields', ()),
+        footer_text=section.get('footer')
+    )
+
+def guild_icon_url(guild):
+    """URL иконки сервера или None"""
+    return guild.icon.url if guild.icon else None
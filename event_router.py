@@ -0,0 +1,146 @@
+"""
+Маршрутизатор событий по таблице обработчиков
+Обработчики регистрируются на тип события и канал, сервер или все события сразу.
+Событие без обработчиков отсеивается несколькими поисками в словаре, а каждый
+обработчик ведёт счётчик вызовов и гистограмму задержек
+"""
+
+import logging
+import time
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+class HandlerStats:
+    """Метрики одного обработчика"""
+
+    __slots__ = ('calls', 'errors', 'latency')
+
+    def __init__(self):
+        self.calls = Counter()
+        self.errors = Counter()
+        self.latency = Histogram()
+
+    def snapshot(self):
+        return dict(self.latency.snapshot(), calls=self.calls.value, errors=self.errors.value)
+
+class _Route:
+    """Зарегистрированный обработчик"""
+
+    __slots__ = ('name', 'handler', 'stats')
+
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self.stats = HandlerStats()
+
+class EventRouter:
+    """Таблица (событие, область, ID) -> обработчики"""
+
+    # Области регистрации
+    CHANNEL = 'channel'
+    GUILD = 'guild'
+    ANY = 'any'
+
+    def __init__(self):
+        self._table = {}   # (событие, область, ID или None) -> список _Route
+        self._routes = {}  # имя обработчика -> _Route
+        self.unrouted = Counter()
+
+    def register(self, event, handler, channel_id=None, guild_id=None, name=None):
+        """
+        Регистрация async handler(obj) на событие. Без channel_id и guild_id обработчик
+        получает все события этого типа. Возвращает имя обработчика для stats() и unregister()
+        """
+        if channel_id is not None:
+            key = (event, self.CHANNEL, channel_id)
+        elif guild_id is not None:
+            key = (event, self.GUILD, guild_id)
+        else:
+            key = (event, self.ANY, None)
+
+        if name is None:
+            name = f'{event}:{getattr(handler, "__qualname__", repr(handler))}'
+            if key[2] is not None:
+                name = f'{name}@{key[2]}'
+
+        route = self._routes.get(name)
+        if route is None:
+            route = self._routes[name] = _Route(name, handler)
+        else:
+            route.handler = handler
+
+        routes = self._table.setdefault(key, [])
+        if route not in routes:
+            routes.append(route)
+        return name
+
+    def unregister(self, name):
+        """Удаление обработчика из всех таблиц"""
+        route = self._routes.pop(name, None)
+        if route is None:
+            return
+        for key in [key for key, routes in self._table.items() if route in routes]:
+            self._table[key].remove(route)
+            if not self._table[key]:
+                del self._table[key]
+
+    def _lookup(self, event, channel_id, guild_id):
+        table = self._table
+        routes = table.get((event, self.CHANNEL, channel_id))
+        by_guild = table.get((event, self.GUILD, guild_id))
+        by_any = table.get((event, self.ANY, None))
+        if by_guild is None and by_any is None:
+            return routes
+        return [*(routes or ()), *(by_guild or ()), *(by_any or ())]
+
+    async def dispatch(self, event, obj, channel_id=None, guild_id=None):
+        """
+        Вызов обработчиков события по порядку. channel_id и guild_id по умолчанию берутся
+        из obj.channel и obj.guild. Ошибка одного обработчика не мешает остальным
+        """
+        if channel_id is None:
+            channel = getattr(obj, 'channel', None)
+            channel_id = getattr(channel, 'id', None)
+        if guild_id is None:
+            guild = getattr(obj, 'guild', None)
+            guild_id = getattr(guild, 'id', None)
+
+        routes = self._lookup(event, channel_id, guild_id)
+        if not routes:
+            self.unrouted.inc()
+            return 0
+
+        for route in routes:
+            started = time.perf_counter()
+            try:
+                await route.handler(obj)
+            except Exception as e:
+                route.stats.errors.inc()
+                logger.error(f'Ошибка обработчика {route.name}: {e}')
+            finally:
+                route.stats.calls.inc()
+                route.stats.latency.observe(time.perf_counter() - started)
+        return len(routes)
+
+    def handlers(self):
+        """Имена зарегистрированных обработчиков"""
+        return list(self._routes)
+
+    def stats(self, name=None):
+        """Метрики обработчика по имени или всех обработчиков"""
+        if name is not None:
+            route = self._routes.get(name)
+            return route.stats.snapshot() if route else None
+        return {
+            'unrouted': self.unrouted.value,
+            'handlers': {route_name: route.stats.snapshot() for route_name, route in self._routes.items()},
+        }
+
+def get_event_router(bot):
+    """Общий маршрутизатор событий бота (создаётся при первом обращении)"""
+    router = getattr(bot, 'event_router', None)
+    if router is None:
+        router = EventRouter()
+        bot.event_router = router
+    return router
@@ -0,0 +1,232 @@
+"""
+Контекстные ответы в чате через OpenAI-совместимый API
+Необязательный движок для системы активности: по последним сообщениям канала
+просит модель написать короткий ответ. Число одновременных запросов ограничено,
+по таймауту или ошибке используется готовая фраза, одинаковые запросы берутся
+из кэша, а запросы одного канала в коротком окне объединяются в один.
+Без пакета openai или ключа API движок просто выбирает готовые фразы
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from metrics import Counter, Histogram
+from config import (
+    LLM_API_KEY,
+    LLM_BASE_URL,
+    LLM_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT,
+    LLM_MAX_TOKENS,
+    LLM_CONTEXT_MESSAGES,
+    LLM_COALESCE_WINDOW,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_TTL,
+    LLM_SYSTEM_PROMPT
+)
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+# Виды запросов
+REPLY = 'reply'        # ответ на сообщение пользователя
+ACTIVITY = 'activity'  # сообщение в замолчавший канал
+
+PROMPTS = {
+    REPLY: "Последние сообщения чата:\n{context}\n\nНапиши короткий ответ на последнее сообщение.",
+    ACTIVITY: "В чате давно тихо. Последние сообщения:\n{context}\n\nНапиши короткое сообщение, чтобы оживить разговор.",
+}
+
+# Ограничение длины одного сообщения в контексте
+MAX_CONTEXT_MESSAGE_LENGTH = 300
+
+# Упоминания пользователей, ролей, каналов и @everyone/@here: в контекст модели они не попадают,
+# чтобы сообщение чата не могло подсказать модели пинг
+MENTION_PATTERN = re.compile(r'<(?:@[!&]?|#)\d+>|@(?:everyone|here)')
+
+def strip_mentions(text):
+    """Текст без синтаксиса упоминаний"""
+    return MENTION_PATTERN.sub('', text)
+
+class ReplyEngine:
+    """Генерация ответов с лимитом параллельности, таймаутом, кэшем и объединением запросов"""
+
+    def __init__(self, client=None, model=LLM_MODEL, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_tokens=LLM_MAX_TOKENS, context_messages=LLM_CONTEXT_MESSAGES,
+                 coalesce_window=LLM_COALESCE_WINDOW, cache_size=LLM_CACHE_SIZE, cache_ttl=LLM_CACHE_TTL,
+                 system_prompt=LLM_SYSTEM_PROMPT):
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.context_messages = context_messages
+        self.coalesce_window = coalesce_window
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.system_prompt = system_prompt
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._context = {}         # ID канала -> deque((автор, текст))
+        self._pending = set()      # (ID канала, вид) - запросы в окне объединения
+        self._cache = OrderedDict()  # ключ запроса -> (текст, срок годности)
+
+        # Метрики
+        self.requests = Counter()
+        self.calls = Counter()
+        self.cache_hits = Counter()
+        self.coalesced = Counter()
+        self.timeouts = Counter()
+        self.errors = Counter()
+        self.fallbacks = Counter()
+        self.tokens = Counter()
+        self.latency = Histogram()
+
+    @property
+    def enabled(self):
+        return self.client is not None
+
+    def observe(self, message):
+        """Учёт сообщения канала в контексте будущих запросов"""
+        if not self.enabled:
+            return
+        text = ' '.join(strip_mentions(message.content).split())[:MAX_CONTEXT_MESSAGE_LENGTH]
+        if not text:
+            return
+        context = self._context.get(message.channel.id)
+        if context is None:
+            context = self._context[message.channel.id] = deque(maxlen=self.context_messages)
+        context.append((strip_mentions(message.author.display_name), text))
+
+    def _prompt(self, channel_id, kind):
+        lines = [f'{author}: {text}' for author, text in self._context.get(channel_id, ())]
+        return PROMPTS[kind].format(context='\n'.join(lines) or '(сообщений нет)')
+
+    @staticmethod
+    def cache_key(kind, prompt):
+        """Ключ кэша по нормализованному запросу: регистр и пробелы не важны"""
+        normalized = ' '.join(prompt.split()).casefold()
+        return hashlib.blake2b(f'{kind}\x1f{normalized}'.encode('utf-8'), digest_size=16).digest()
+
+    def _cached(self, key, now):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        text, expires_at = entry
+        if expires_at <= now:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _remember(self, key, text, now):
+        self._cache[key] = (text, now + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def generate(self, channel_id, fallback, kind=REPLY):
+        """
+        Текст для канала. None - запрос объединён с уже ожидающим запросом этого канала,
+        отвечать не нужно. При выключенном движке, таймауте или ошибке - фраза из fallback
+        """
+        self.requests.inc()
+        if not self.enabled:
+            return random.choice(fallback)
+
+        # Первый запрос канала ждёт окно, чтобы собрать контекст; остальные присоединяются к нему
+        pending_key = (channel_id, kind)
+        if pending_key in self._pending:
+            self.coalesced.inc()
+            return None
+        self._pending.add(pending_key)
+        try:
+            await asyncio.sleep(self.coalesce_window)
+        finally:
+            self._pending.discard(pending_key)
+
+        prompt = self._prompt(channel_id, kind)
+        key = self.cache_key(kind, prompt)
+        text = self._cached(key, time.monotonic())
+        if text is not None:
+            self.cache_hits.inc()
+            return text
+
+        started = time.perf_counter()
+        try:
+            # Таймаут покрывает и ожидание свободного слота
+            text = await asyncio.wait_for(self._complete(prompt), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts.inc()
+            logger.warning(f'LLM не ответила за {self.timeout} с, используется готовая фраза')
+        except Exception as e:
+            self.errors.inc()
+            logger.error(f'Ошибка запроса к LLM: {e}')
+        else:
+            self.latency.observe(time.perf_counter() - started)
+            if text:
+                self._remember(key, text, time.monotonic())
+                return text
+
+        self.fallbacks.inc()
+        return random.choice(fallback)
+
+    async def _complete(self, prompt):
+        async with self._slots:
+            self.calls.inc()
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {'role': 'system', 'content': self.system_prompt},
+                    {'role': 'user', 'content': prompt},
+                ],
+                max_tokens=self.max_tokens,
+                temperature=0.8
+            )
+
+        usage = getattr(response, 'usage', None)
+        if usage is not None and usage.total_tokens:
+            self.tokens.inc(usage.total_tokens)
+        content = response.choices[0].message.content if response.choices else None
+        return content.strip()[:2000] if content else None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'requests': self.requests.value,
+            'calls': self.calls.value,
+            'cache_hits': self.cache_hits.value,
+            'coalesced': self.coalesced.value,
+            'timeouts': self.timeouts.value,
+            'errors': self.errors.value,
+            'fallbacks': self.fallbacks.value,
+            'tokens': self.tokens.value,
+            'cache_size': len(self._cache),
+            'latency': self.latency.snapshot(),
+        }
+
+def make_client(api_key=LLM_API_KEY, base_url=LLM_BASE_URL, timeout=LLM_TIMEOUT):
+    """Клиент OpenAI или None, если пакет не установлен или ключ не задан"""
+    if not api_key:
+        return None
+    if AsyncOpenAI is None:
+        logger.warning('Задан ключ LLM, но пакет openai не установлен - используются готовые фразы')
+        return None
+    # Повторы выключены: время ответа ограничивает сам движок
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+def get_reply_engine(bot):
+    """Общий движок ответов бота (создаётся при первом обращении)"""
+    engine = getattr(bot, 'reply_engine', None)
+    if engine is None:
+        engine = ReplyEngine(make_client())
+        bot.reply_engine = engine
+        logger.info(f'Движок ответов: {"LLM " + engine.model if engine.enabled else "готовые фразы"}')
+    return engine
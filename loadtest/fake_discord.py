@@ -0,0 +1,657 @@
+"""
+Локальная замена Discord REST API и gateway для нагрузочного тестирования
+Поднимает aiohttp-сервер, к которому подключается discord.py вместо discord.com:
+отвечает на REST-запросы бота, ведёт gateway-сессию и позволяет скриптам
+отправлять боту события (заходы, выходы, сообщения, взаимодействия)
+"""
+
+import asyncio
+import json
+import re
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from aiohttp import web, WSMsgType
+
+DISCORD_EPOCH = 1420070400000
+
+# Шаблоны путей REST API: (метод, регулярное выражение, имя маршрута для статистики)
+_ROUTES = []
+
+def route(method, pattern, name):
+    """Регистрация обработчика REST-маршрута"""
+    regex = re.compile('^/api/v\\d+' + pattern + '$')
+    def decorator(func):
+        _ROUTES.append((method, regex, name, func))
+        return func
+    return decorator
+
+def json_response(data, status=200, headers=None):
+    """JSON-ответ с точным Content-Type: discord.py не разбирает 'application/json; charset=...'"""
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json'
+    return web.Response(body=json.dumps(data).encode('utf-8'), status=status, headers=headers)
+
+def iso_now():
+    return datetime.now(timezone.utc).isoformat()
+
+class FakeDiscord:
+    """Фейковый Discord: один сервер, набор каналов, учёт всех REST-запросов"""
+
+    CATEGORY_CHANNEL_LIMIT = 50
+
+    def __init__(self, guild_id, guild_name='Limonericx (fake)', channels=None, role_ids=(),
+                 member_count=50, emulate_rate_limits=False):
+        self._counter = 0
+        self.guild_id = guild_id
+        self.guild_name = guild_name
+        self.emulate_rate_limits = emulate_rate_limits
+
+        self.bot_user = self.make_user(self.snowflake(), 'limonericx-bot', bot=True)
+        self.application_id = int(self.bot_user['id'])
+
+        # Каналы: ID -> payload канала
+        self.channels = {}
+        for channel_id, name in (channels or {}).items():
+            self.channels[channel_id] = self.make_channel(channel_id, name)
+
+        # Роли: @everyone (ID сервера) и дополнительные
+        self.roles = [self.make_role(guild_id, '@everyone', position=0)]
+        for index, role_id in enumerate(role_ids, start=1):
+            self.roles.append(self.make_role(role_id, f'role-{index}', position=index))
+
+        # Участники: бот и заданное количество пользователей
+        self.members = {int(self.bot_user['id']): self.make_member(self.bot_user)}
+        for index in range(member_count):
+            user = self.make_user(self.snowflake(), f'user{index}')
+            self.members[int(user['id'])] = self.make_member(user)
+
+        self.messages = defaultdict(dict)   # ID канала -> {ID сообщения: payload}
+        self.dm_channels = {}               # ID пользователя -> payload DM-канала
+        self.dm_owners = {}                 # ID DM-канала -> ID пользователя
+        self.closed_dms = set()             # ID пользователей, закрывших личные сообщения
+
+        # Ответы на взаимодействия: ID взаимодействия -> (payload, время получения)
+        self.interaction_callbacks = {}
+        self.interaction_messages = {}      # ID взаимодействия -> сообщение-ответ бота
+        self._callback_waiters = defaultdict(list)
+
+        # Статистика
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.last_request_at = 0.0
+        self._send_windows = defaultdict(deque)
+        self._global_window = deque()
+        self.global_rate_limited = 0
+
+        # Gateway
+        self._sockets = []
+        self._sequence = 0
+        self._identified = asyncio.Event()
+
+        self._runner = None
+        self.base_url = None
+
+    # ------------------------------------------------------------------
+    # Построение payload'ов
+
+    def snowflake(self):
+        self._counter += 1
+        timestamp = int(time.time() * 1000) - DISCORD_EPOCH
+        return (timestamp << 22) | (self._counter & 0x3FFFFF)
+
+    def make_user(self, user_id, username, bot=False):
+        return {
+            'id': str(user_id),
+            'username': username,
+            'discriminator': '0',
+            'global_name': username,
+            'avatar': None,
+            'bot': bot,
+            'public_flags': 0,
+        }
+
+    def make_member(self, user, role_ids=()):
+        return {
+            'user': user,
+            'roles': [str(role_id) for role_id in role_ids],
+            'joined_at': iso_now(),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+            'nick': None,
+            'avatar': None,
+        }
+
+    def make_role(self, role_id, name, position):
+        return {
+            'id': str(role_id),
+            'name': name,
+            'permissions': '8' if position else '0',
+            'position': position,
+            'color': 0,
+            'hoist': False,
+            'managed': False,
+            'mentionable': True,
+            'flags': 0,
+        }
+
+    def make_channel(self, channel_id, name, channel_type=0, parent_id=None, overwrites=None, topic=None):
+        return {
+            'id': str(channel_id),
+            'type': channel_type,
+            'guild_id': str(self.guild_id),
+            'name': name,
+            'position': len(self.channels),
+            'permission_overwrites': overwrites or [],
+            'parent_id': str(parent_id) if parent_id else None,
+            'topic': topic,
+            'nsfw': False,
+            'last_message_id': None,
+            'rate_limit_per_user': 0,
+        }
+
+    def make_message(self, channel_id, author, content='', embeds=None, components=None, message_id=None,
+                     flags=0, interaction_id=None):
+        payload = {
+            'id': str(message_id or self.snowflake()),
+            'channel_id': str(channel_id),
+            'author': author,
+            'content': content or '',
+            'timestamp': iso_now(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': embeds or [],
+            'components': components or [],
+            'reactions': [],
+            'pinned': False,
+            'type': 0,
+            'flags': flags,
+        }
+        if interaction_id is not None:
+            payload['interaction_metadata'] = {'id': str(interaction_id), 'type': 3, 'user': author}
+        return payload
+
+    def guild_payload(self):
+        return {
+            'id': str(self.guild_id),
+            'name': self.guild_name,
+            'icon': None,
+            'owner_id': self.bot_user['id'],
+            'member_count': len(self.members),
+            'large': False,
+            'unavailable': False,
+            'features': [],
+            'roles': self.roles,
+            'emojis': [],
+            'stickers': [],
+            'channels': list(self.channels.values()),
+            'threads': [],
+            'members': list(self.members.values()),
+            'presences': [],
+            'voice_states': [],
+            'joined_at': iso_now(),
+            'premium_tier': 0,
+            'preferred_locale': 'ru',
+            'verification_level': 0,
+            'default_message_notifications': 0,
+            'explicit_content_filter': 0,
+            'mfa_level': 0,
+            'nsfw_level': 0,
+            'system_channel_flags': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Жизненный цикл сервера
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запуск сервера; возвращает базовый URL"""
+        app = web.Application(client_max_size=8 * 1024 * 1024)
+        app.router.add_route('GET', '/gateway', self._gateway)
+        app.router.add_route('*', '/{tail:.*}', self._rest)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://{host}:{port}'
+        return self.base_url
+
+    async def stop(self):
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.rate_limited = 0
+        self.global_rate_limited = 0
+
+    # ------------------------------------------------------------------
+    # Gateway
+
+    async def _gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self._sockets.append(ws)
+
+        await ws.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}, 's': None, 't': None}))
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                op = payload.get('op')
+
+                if op == 1:
+                    await ws.send_str(json.dumps({'op': 11, 'd': None, 's': None, 't': None}))
+                elif op == 2:
+                    await self._send_dispatch(ws, 'READY', {
+                        'v': 10,
+                        'user': self.bot_user,
+                        'guilds': [{'id': str(self.guild_id), 'unavailable': True}],
+                        'session_id': 'fake-session',
+                        'resume_gateway_url': self.base_url.replace('http', 'ws', 1) + '/gateway',
+                        'application': {'id': str(self.application_id), 'flags': 0},
+                        'private_channels': [],
+                        'relationships': [],
+                    })
+                    await self._send_dispatch(ws, 'GUILD_CREATE', self.guild_payload())
+                    self._identified.set()
+                elif op == 6:
+                    await self._send_dispatch(ws, 'RESUMED', {})
+                elif op == 8:
+                    await self._send_dispatch(ws, 'GUILD_MEMBERS_CHUNK', {
+                        'guild_id': str(self.guild_id),
+                        'members': list(self.members.values()),
+                        'chunk_index': 0,
+                        'chunk_count': 1,
+                        'nonce': payload['d'].get('nonce'),
+                    })
+        finally:
+            if ws in self._sockets:
+                self._sockets.remove(ws)
+        return ws
+
+    async def _send_dispatch(self, ws, event, data):
+        self._sequence += 1
+        await ws.send_str(json.dumps({'op': 0, 't': event, 's': self._sequence, 'd': data}))
+
+    @property
+    def sequence(self):
+        """Номер последнего отправленного события шлюза"""
+        return self._sequence
+
+    async def dispatch(self, event, data):
+        """Отправка события всем подключённым клиентам"""
+        for ws in list(self._sockets):
+            await self._send_dispatch(ws, event, data)
+
+    async def wait_identified(self, timeout=30.0):
+        await asyncio.wait_for(self._identified.wait(), timeout)
+
+    # ------------------------------------------------------------------
+    # Сценарные события
+
+    def new_user(self, name=None):
+        """Создание пользователя, которого ещё нет на сервере"""
+        user_id = self.snowflake()
+        return self.make_user(user_id, name or f'user{user_id % 100000}')
+
+    async def member_join(self, user, role_ids=()):
+        member = self.make_member(user, role_ids)
+        self.members[int(user['id'])] = member
+        await self.dispatch('GUILD_MEMBER_ADD', dict(member, guild_id=str(self.guild_id)))
+        return member
+
+    async def member_remove(self, user):
+        self.members.pop(int(user['id']), None)
+        await self.dispatch('GUILD_MEMBER_REMOVE', {'guild_id': str(self.guild_id), 'user': user})
+
+    async def message_create(self, channel_id, user, content):
+        message = self.make_message(channel_id, user, content)
+        self.messages[channel_id][int(message['id'])] = message
+        member = self.members.get(int(user['id'])) or self.make_member(user)
+        data = dict(message, guild_id=str(self.guild_id), member={k: v for k, v in member.items() if k != 'user'})
+        await self.dispatch('MESSAGE_CREATE', data)
+        return message
+
+    def _interaction_base(self, interaction_type, channel_id, member, data, message=None):
+        interaction_id = self.snowflake()
+        payload = {
+            'id': str(interaction_id),
+            'application_id': str(self.application_id),
+            'type': interaction_type,
+            'data': data,
+            'guild_id': str(self.guild_id),
+            'channel_id': str(channel_id),
+            'channel': {'id': str(channel_id), 'type': 0},
+            'member': dict(member, permissions='8'),
+            'token': f'token-{interaction_id}',
+            'version': 1,
+            'app_permissions': '8',
+            'locale': 'ru',
+            'guild_locale': 'ru',
+            'attachment_size_limit': 8 * 1024 * 1024,
+            'entitlements': [],
+            'authorizing_integration_owners': {'0': str(self.guild_id)},
+            'context': 0,
+        }
+        if message is not None:
+            payload['message'] = message
+        return interaction_id, payload
+
+    async def click(self, channel_id, member, message, custom_id, component_type=2, values=None):
+        """Нажатие кнопки или выбор в меню на сообщении; возвращает ID взаимодействия"""
+        data = {'custom_id': custom_id, 'component_type': component_type}
+        if values is not None:
+            data['values'] = values
+        interaction_id, payload = self._interaction_base(3, channel_id, member, data, message)
+        await self.dispatch('INTERACTION_CREATE', payload)
+        return interaction_id
+
+    async def submit_modal(self, channel_id, member, modal, values):
+        """Отправка модального окна: values - значения полей по порядку"""
+        values = list(values)
+
+        def fill(component):
+            if component.get('type') == 4:
+                return {'type': 4, 'custom_id': component['custom_id'], 'value': values.pop(0) if values else ''}
+            result = {'type': component['type']}
+            if 'components' in component:
+                result['components'] = [fill(child) for child in component['components']]
+            if 'component' in component:
+                result['component'] = fill(component['component'])
+            return result
+
+        data = {
+            'custom_id': modal['custom_id'],
+            'components': [fill(component) for component in modal.get('components', [])],
+        }
+        interaction_id, payload = self._interaction_base(5, channel_id, member, data)
+        await self.dispatch('INTERACTION_CREATE', payload)
+        return interaction_id
+
+    async def wait_callback(self, interaction_id, timeout=10.0):
+        """Ожидание ответа бота на взаимодействие: (payload, время получения)"""
+        if interaction_id in self.interaction_callbacks:
+            return self.interaction_callbacks[interaction_id]
+        future = asyncio.get_running_loop().create_future()
+        self._callback_waiters[interaction_id].append(future)
+        return await asyncio.wait_for(future, timeout)
+
+    def channel_messages(self, channel_id):
+        return list(self.messages[channel_id].values())
+
+    # ------------------------------------------------------------------
+    # REST
+
+    async def _rest(self, request):
+        self.last_request_at = time.monotonic()
+        path = request.path
+
+        for method, regex, name, func in _ROUTES:
+            if method != request.method:
+                continue
+            match = regex.match(path)
+            if match:
+                self.calls[f'{method} {name}'] += 1
+                limited = self._check_rate_limit(name, match)
+                if limited is not None:
+                    return limited
+                body = await self._read_body(request)
+                return await func(self, request, body, *match.groups())
+
+        self.calls[f'{request.method} {path} (unknown)'] += 1
+        return json_response({})
+
+    async def _read_body(self, request):
+        if not request.can_read_body:
+            return {}
+        if request.content_type.startswith('multipart/'):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == 'payload_json':
+                    return json.loads(await part.text())
+            return {}
+        try:
+            return await request.json()
+        except ValueError:
+            return {}
+
+    GLOBAL_LIMIT = 50  # запросов в секунду на бота
+
+    def _check_global_rate_limit(self):
+        """Эмуляция глобального лимита Discord: 50 запросов в секунду"""
+        now = time.monotonic()
+        window = self._global_window
+        while window and now - window[0] > 1.0:
+            window.popleft()
+        if len(window) < self.GLOBAL_LIMIT:
+            window.append(now)
+            return None
+
+        self.rate_limited += 1
+        self.global_rate_limited += 1
+        retry_after = round(1.0 - (now - window[0]), 3)
+        return json_response(
+            {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': True},
+            status=429,
+            headers={'Retry-After': str(retry_after), 'X-RateLimit-Global': 'true', 'X-RateLimit-Scope': 'global'}
+        )
+
+    def _check_rate_limit(self, name, match):
+        """Эмуляция лимитов Discord: глобальный и 5 сообщений за 5 секунд в один канал"""
+        if not self.emulate_rate_limits:
+            return None
+        # Ответы на взаимодействия и их follow-up в глобальный лимит не входят
+        if not name.startswith(('/interactions/', '/webhooks/')):
+            limited = self._check_global_rate_limit()
+            if limited is not None:
+                return limited
+        if name != '/channels/{id}/messages':
+            return None
+
+        window = self._send_windows[match.group(1)]
+        now = time.monotonic()
+        while window and now - window[0] > 5.0:
+            window.popleft()
+        if len(window) < 5:
+            window.append(now)
+            return None
+
+        self.rate_limited += 1
+        retry_after = round(5.0 - (now - window[0]), 3)
+        return json_response(
+            {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': False},
+            status=429,
+            headers={
+                'Retry-After': str(retry_after),
+                'X-RateLimit-Limit': '5',
+                'X-RateLimit-Remaining': '0',
+                'X-RateLimit-Reset-After': str(retry_after),
+                'X-RateLimit-Bucket': f'fake-{match.group(1)}',
+                'X-RateLimit-Scope': 'user',
+            }
+        )
+
+    @route('GET', '/users/@me', '/users/@me')
+    async def _get_me(self, request, body):
+        return json_response(self.bot_user)
+
+    @route('GET', '/oauth2/applications/@me', '/oauth2/applications/@me')
+    async def _get_application(self, request, body):
+        return json_response({
+            'id': str(self.application_id),
+            'name': 'limonericx-bot',
+            'description': '',
+            'icon': None,
+            'bot_public': False,
+            'bot_require_code_grant': False,
+            'owner': self.bot_user,
+            'verify_key': '0' * 64,
+            'flags': 0,
+        })
+
+    @route('GET', '/gateway(?:/bot)?', '/gateway')
+    async def _get_gateway(self, request, body):
+        return json_response({
+            'url': self.base_url.replace('http', 'ws', 1) + '/gateway',
+            'shards': 1,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1},
+        })
+
+    @route('POST', '/channels/(\\d+)/messages', '/channels/{id}/messages')
+    async def _create_message(self, request, body, channel_id):
+        channel_id = int(channel_id)
+        if self.dm_owners.get(channel_id) in self.closed_dms:
+            return json_response({'message': 'Cannot send messages to this user', 'code': 50007}, status=403)
+        embeds = body.get('embeds') or []
+        message = self.make_message(channel_id, self.bot_user, body.get('content'), embeds, body.get('components'))
+        self.messages[channel_id][int(message['id'])] = message
+        # Как и настоящий Discord, сообщения бота приходят ему же через шлюз
+        if channel_id in self.channels:
+            await self.dispatch('MESSAGE_CREATE', dict(message, guild_id=str(self.guild_id)))
+        return json_response(message)
+
+    @route('GET', '/channels/(\\d+)/messages', '/channels/{id}/messages')
+    async def _get_messages(self, request, body, channel_id):
+        limit = int(request.query.get('limit', 50))
+        messages = list(self.messages[int(channel_id)].values())[::-1][:limit]
+        return json_response(messages)
+
+    @route('GET', '/channels/(\\d+)/messages/(\\d+)', '/channels/{id}/messages/{id}')
+    async def _get_message(self, request, body, channel_id, message_id):
+        message = self.messages[int(channel_id)].get(int(message_id))
+        if message is None:
+            return json_response({'message': 'Unknown Message', 'code': 10008}, status=404)
+        return json_response(message)
+
+    @route('PATCH', '/channels/(\\d+)/messages/(\\d+)', '/channels/{id}/messages/{id}')
+    async def _edit_message(self, request, body, channel_id, message_id):
+        message = self.messages[int(channel_id)].get(int(message_id))
+        if message is None:
+            return json_response({'message': 'Unknown Message', 'code': 10008}, status=404)
+        for key in ('content', 'embeds', 'components'):
+            if key in body:
+                message[key] = body[key]
+        message['edited_timestamp'] = iso_now()
+        return json_response(message)
+
+    @route('DELETE', '/channels/(\\d+)/messages/(\\d+)', '/channels/{id}/messages/{id}')
+    async def _delete_message(self, request, body, channel_id, message_id):
+        self.messages[int(channel_id)].pop(int(message_id), None)
+        return web.Response(status=204)
+
+    @route('PUT', '/channels/(\\d+)/messages/(\\d+)/reactions/([^/]+)/@me', '/channels/{id}/messages/{id}/reactions/{emoji}/@me')
+    async def _add_reaction(self, request, body, channel_id, message_id, emoji):
+        return web.Response(status=204)
+
+    @route('POST', '/guilds/(\\d+)/channels', '/guilds/{id}/channels')
+    async def _create_channel(self, request, body, guild_id):
+        parent_id = body.get('parent_id')
+        if parent_id is not None:
+            # Ограничение Discord: не больше 50 каналов в категории
+            children = sum(1 for channel in self.channels.values() if channel.get('parent_id') == str(parent_id))
+            if children >= self.CATEGORY_CHANNEL_LIMIT:
+                return json_response({
+                    'message': 'Invalid Form Body',
+                    'code': 50035,
+                    'errors': {'parent_id': {'_errors': [{
+                        'code': 'CHANNEL_PARENT_MAX_CHANNELS',
+                        'message': 'Maximum number of channels in category reached (50)'
+                    }]}}
+                }, status=400)
+
+        channel_id = self.snowflake()
+        channel = self.make_channel(
+            channel_id,
+            body.get('name', 'channel'),
+            channel_type=body.get('type', 0),
+            parent_id=body.get('parent_id'),
+            overwrites=body.get('permission_overwrites'),
+            topic=body.get('topic')
+        )
+        self.channels[channel_id] = channel
+        await self.dispatch('CHANNEL_CREATE', channel)
+        return json_response(channel)
+
+    @route('PATCH', '/channels/(\\d+)', '/channels/{id}')
+    async def _edit_channel(self, request, body, channel_id):
+        channel = self.channels.get(int(channel_id))
+        if channel is None:
+            return json_response({'message': 'Unknown Channel', 'code': 10003}, status=404)
+        for key in ('name', 'topic', 'parent_id', 'permission_overwrites', 'position'):
+            if key in body:
+                channel[key] = body[key]
+        await self.dispatch('CHANNEL_UPDATE', channel)
+        return json_response(channel)
+
+    @route('DELETE', '/channels/(\\d+)', '/channels/{id}')
+    async def _delete_channel(self, request, body, channel_id):
+        channel = self.channels.pop(int(channel_id), None)
+        if channel is None:
+            return json_response({'message': 'Unknown Channel', 'code': 10003}, status=404)
+        await self.dispatch('CHANNEL_DELETE', channel)
+        return json_response(channel)
+
+    @route('POST', '/users/@me/channels', '/users/@me/channels')
+    async def _create_dm(self, request, body):
+        user_id = int(body['recipient_id'])
+        channel = self.dm_channels.get(user_id)
+        if channel is None:
+            member = self.members.get(user_id)
+            recipient = member['user'] if member else self.make_user(user_id, f'user{user_id % 100000}')
+            channel = {'id': str(self.snowflake()), 'type': 1, 'recipients': [recipient], 'last_message_id': None}
+            self.dm_channels[user_id] = channel
+            self.dm_owners[int(channel['id'])] = user_id
+        return json_response(channel)
+
+    @route('POST', '/interactions/(\\d+)/([^/]+)/callback', '/interactions/{id}/{token}/callback')
+    async def _interaction_callback(self, request, body, interaction_id, token):
+        interaction_id = int(interaction_id)
+        received_at = time.monotonic()
+        callback_type = body.get('type')
+        data = body.get('data') or {}
+        response = {
+            'interaction': {
+                'id': str(interaction_id),
+                'type': 3,
+                'response_message_loading': callback_type == 5,
+                'response_message_ephemeral': bool(data.get('flags', 0) & 64),
+            }
+        }
+        if callback_type in (4, 5):
+            message = self.make_message(0, self.bot_user, data.get('content'), data.get('embeds'),
+                                        data.get('components'), flags=data.get('flags', 0),
+                                        interaction_id=interaction_id)
+            self.interaction_messages[interaction_id] = message
+            response['interaction']['response_message_id'] = message['id']
+            response['resource'] = {'type': callback_type, 'message': message}
+        elif callback_type is not None:
+            response['resource'] = {'type': callback_type}
+
+        self.interaction_callbacks[interaction_id] = (body, received_at)
+        for future in self._callback_waiters.pop(interaction_id, []):
+            if not future.done():
+                future.set_result((body, received_at))
+        return json_response(response)
+
+    @route('POST', '/webhooks/(\\d+)/([^/]+)', '/webhooks/{id}/{token}')
+    async def _followup(self, request, body, application_id, token):
+        message = self.make_message(0, self.bot_user, body.get('content'), body.get('embeds'), body.get('components'),
+                                    flags=body.get('flags', 0))
+        return json_response(message)
+
+    @route('PATCH', '/webhooks/(\\d+)/([^/]+)/messages/([^/]+)', '/webhooks/{id}/{token}/messages/{id}')
+    async def _edit_followup(self, request, body, application_id, token, message_id):
+        message = self.make_message(0, self.bot_user, body.get('content'), body.get('embeds'), body.get('components'))
+        return json_response(message)
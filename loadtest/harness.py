@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный стенд для DiscordWelcomeBot
+Запускает бота против локального фейкового Discord (без сети), прогоняет сценарии
+с потоками заходов, выходов, сообщений, тикетов, заявок и спама кнопками и выводит пропускную
+способность, p50/p99 задержки обработчиков и количество REST-запросов
+
+Запуск из корня проекта:
+    python -m loadtest.harness
+    python -m loadtest.harness --scenario joins --count 500 --rate-limits
+    python -m loadtest.harness --scenario tickets --count 50 --json
+    python -m loadtest.harness --scenario replies --count 50 --rate 10 --llm-delay 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# Данные бота (реестр панелей и т.п.) пишутся во временный каталог, а не в рабочий
+os.environ.setdefault('BOT_DATA_DIR', tempfile.mkdtemp(prefix='limonericx-loadtest-'))
+# Эндпоинт метрик - на свободном порту, чтобы не конфликтовать с запущенным ботом
+os.environ.setdefault('BOT_METRICS_PORT', '0')
+
+import aiohttp
+import yarl
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+
+from loadtest.fake_discord import FakeDiscord
+from loadtest.llm_stub import StubLLM
+from config import (
+    LIMONERICX_SERVER_ID,
+    WELCOME_CHANNEL_ID,
+    SUPPORT_CHANNEL_ID,
+    SUPPORT_ROLE_ID,
+    MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID,
+    MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID,
+    DISCORD_ADMIN_APPLICATION_CHANNEL_ID,
+    DISCORD_ADMIN_RESPONSES_CHANNEL_ID,
+    TICKET_CATEGORIES,
+    ACTIVITY_CHANNEL_ID
+)
+
+logger = logging.getLogger('loadtest')
+
+SCENARIOS = ('joins', 'leaves', 'messages', 'replies', 'tickets', 'applications', 'spam')
+
+def percentile(samples, q):
+    """Точный перцентиль по выборке"""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[max(0, min(98, int(q * 100) - 1))]
+
+class HandlerTimer:
+    """Замер времени выполнения обработчиков событий бота"""
+
+    def __init__(self, bot):
+        self.samples = defaultdict(list)
+        self.in_flight = 0
+        original = bot._run_event
+
+        async def timed(coro, event_name, *args, **kwargs):
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                await original(coro, event_name, *args, **kwargs)
+            finally:
+                self.samples[event_name].append(time.perf_counter() - started)
+                self.in_flight -= 1
+
+        bot._run_event = timed
+
+    def reset(self):
+        self.samples.clear()
+
+class LoadHarness:
+    """Бот, подключённый к фейковому Discord, и сценарии нагрузки"""
+
+    def __init__(self, emulate_rate_limits=False, llm_delay=None):
+        channels = {
+            WELCOME_CHANNEL_ID: 'welcome',
+            SUPPORT_CHANNEL_ID: 'support',
+            MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID: 'minecraft-apply',
+            MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID: 'minecraft-responses',
+            DISCORD_ADMIN_APPLICATION_CHANNEL_ID: 'discord-apply',
+            DISCORD_ADMIN_RESPONSES_CHANNEL_ID: 'discord-responses',
+            ACTIVITY_CHANNEL_ID: 'chat',
+        }
+        self.fake = FakeDiscord(
+            LIMONERICX_SERVER_ID,
+            channels=channels,
+            role_ids=(SUPPORT_ROLE_ID,),
+            emulate_rate_limits=emulate_rate_limits
+        )
+        # Заглушка LLM для движка ответов (None - готовые фразы)
+        self.llm = StubLLM(delay=llm_delay) if llm_delay is not None else None
+        self.welcome_bot = None
+        self.timer = None
+        self.staff = []
+        self._bot_task = None
+        self.failed_actions = 0
+        self._joined = []
+
+    async def start(self):
+        """Запуск фейкового Discord и подключение к нему бота"""
+        base_url = await self.fake.start()
+        Route.BASE = f'{base_url}/api/v10'
+        DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(base_url.replace('http', 'ws', 1) + '/gateway')
+
+        # Импорт после подмены адресов, чтобы ничего не ушло в настоящий Discord
+        from bot import DiscordWelcomeBot
+        self.welcome_bot = DiscordWelcomeBot()
+        self.timer = HandlerTimer(self.welcome_bot.bot)
+
+        if self.llm is not None:
+            from llm_replies import ReplyEngine
+            await self.llm.start()
+            self.welcome_bot.bot.reply_engine = ReplyEngine(self.llm.client())
+
+        self._bot_task = asyncio.create_task(self.welcome_bot.start_bot())
+        await self.fake.wait_identified()
+        await self.welcome_bot.bot.wait_until_ready()
+        await self.welcome_bot.startup.run(self.welcome_bot.bot)
+
+        await self.drain()
+
+    async def _staff_member(self, index):
+        """
+        Сотрудник поддержки для index-го действия: каждый обрабатывает по два тикета
+        или заявки, как живая смена, а не один человек, нажимающий сотни кнопок в секунду
+        """
+        slot = index // 2
+        while len(self.staff) <= slot:
+            self.staff.append(None)
+        if self.staff[slot] is None:
+            user = self.fake.new_user(f'staff{slot}')
+            self.staff[slot] = await self.fake.member_join(user, role_ids=(SUPPORT_ROLE_ID,))
+        return self.staff[slot]
+
+    async def stop(self):
+        await self.welcome_bot.stop_bot()
+        if self._bot_task is not None:
+            try:
+                await asyncio.wait_for(self._bot_task, 10)
+            except (asyncio.TimeoutError, Exception):
+                pass
+        await self.fake.stop()
+        if self.llm is not None:
+            await self.llm.stop()
+
+    def _is_idle(self):
+        bot = self.welcome_bot
+        # Бот ещё не получил все отправленные события шлюза
+        ws = bot.bot.ws
+        if ws is None or (ws.sequence or 0) < self.fake.sequence:
+            return False
+        if self.timer.in_flight:
+            return False
+        if bot.welcome_batcher.pending_count:
+            return False
+        if bot.outbound.depth or bot.outbound.metrics()['in_flight']:
+            return False
+        # Отложенные ответы системы активности
+        activity = getattr(bot.bot, 'activity_system', None)
+        if activity is not None and activity.background.in_flight:
+            return False
+        # Личные сообщения, которые пора отправить
+        if bot.dm_queue.due():
+            return False
+        return time.monotonic() - self.fake.last_request_at > 0.2
+
+    async def drain(self, timeout=60.0):
+        """Ожидание, пока бот обработает все события и закончит запросы"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._is_idle():
+                return True
+            await asyncio.sleep(0.05)
+        logger.warning('Бот не успел обработать нагрузку за отведённое время')
+        return False
+
+    async def _paced(self, count, rate, action):
+        """Запуск count действий; rate - действий в секунду (0 - всё сразу)"""
+        tasks = []
+        for index in range(count):
+            tasks.append(asyncio.create_task(action(index)))
+            if rate:
+                await asyncio.sleep(1.0 / rate)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.failed_actions += 1
+                logger.warning(f'Действие сценария не удалось: {result!r}')
+        return results
+
+    # ------------------------------------------------------------------
+    # Сценарии
+
+    async def scenario_joins(self, count, rate):
+        self._joined = [self.fake.new_user() for _ in range(count)]
+        async def join(index):
+            await self.fake.member_join(self._joined[index])
+        await self._paced(count, rate, join)
+        return {}
+
+    async def prepare_leaves(self, count):
+        # Уходить могут только участники, которых бот уже видел
+        while len(self._joined) < count:
+            user = self.fake.new_user()
+            await self.fake.member_join(user)
+            self._joined.append(user)
+        await self.drain()
+
+    async def scenario_leaves(self, count, rate):
+        users = self._joined[:count]
+        async def leave(index):
+            await self.fake.member_remove(users[index])
+        await self._paced(count, rate, leave)
+        return {}
+
+    async def scenario_messages(self, count, rate):
+        members = [member for member in self.fake.members.values() if not member['user'].get('bot')]
+        async def message(index):
+            member = random.choice(members)
+            await self.fake.message_create(ACTIVITY_CHANNEL_ID, member['user'], f'сообщение {index}')
+        await self._paced(count, rate, message)
+        return {}
+
+    async def scenario_replies(self, count, rate):
+        """Сообщения в чат, на каждое из которых бот решает ответить (через LLM, если включена)"""
+        activity = self.welcome_bot.bot.activity_system
+        state = activity.channels[ACTIVITY_CHANNEL_ID]
+        members = [member for member in self.fake.members.values() if not member['user'].get('bot')]
+        engine_before = activity.reply_engine.stats()
+        if self.llm is not None:
+            self.llm.reset_stats()
+
+        async def message(index):
+            member = random.choice(members)
+            await self.fake.message_create(ACTIVITY_CHANNEL_ID, member['user'], f'вопрос {index % 10}')
+
+        chance = state.response_chance
+        state.response_chance = 1.0
+        try:
+            await self._paced(count, rate, message)
+            await self.drain()
+        finally:
+            state.response_chance = chance
+
+        engine = activity.reply_engine.stats()
+        llm = {name: engine[name] - engine_before[name] for name in
+               ('requests', 'calls', 'cache_hits', 'coalesced', 'timeouts', 'errors', 'fallbacks', 'tokens')}
+        llm['latency_p99_ms'] = engine['latency']['p99'] * 1000
+        if self.llm is not None:
+            llm['stub'] = self.llm.stats()
+        return {'llm': llm}
+
+    async def _ack(self, interaction_id, sent_at, acks):
+        """Ожидание ответа бота и учёт задержки подтверждения"""
+        payload, received_at = await self.fake.wait_callback(interaction_id)
+        acks.append(received_at - sent_at)
+        return payload
+
+    def _panel_message(self, channel_id):
+        messages = self.fake.channel_messages(channel_id)
+        return messages[-1] if messages else self.fake.make_message(channel_id, self.fake.bot_user)
+
+    async def scenario_tickets(self, count, rate):
+        acks = []
+        panel = self._panel_message(SUPPORT_CHANNEL_ID)
+
+        async def ticket(index):
+            user = self.fake.new_user()
+            member = await self.fake.member_join(user)
+
+            # Кнопка "Создать тикет" -> меню категорий
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.click(SUPPORT_CHANNEL_ID, member, panel, 'support:create_ticket')
+            response = await self._ack(interaction_id, sent_at, acks)
+            select_message = self.fake.interaction_messages[interaction_id]
+            select = response['data']['components'][0]['components'][0]
+
+            # Выбор категории -> модальное окно
+            category = random.choice(TICKET_CATEGORIES)['value']
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.click(
+                SUPPORT_CHANNEL_ID, member, select_message, select['custom_id'], component_type=3, values=[category]
+            )
+            modal = (await self._ack(interaction_id, sent_at, acks))['data']
+
+            # Отправка формы -> создание тикета
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.submit_modal(
+                SUPPORT_CHANNEL_ID, member, modal, [f'Steve{index}', 'Пропали вещи после рестарта', '']
+            )
+            await self._ack(interaction_id, sent_at, acks)
+
+            # Сотрудник берёт тикет в работу и закрывает его
+            card = await self._wait_for(lambda: self._ticket_card(interaction_id))
+            staff = await self._staff_member(index)
+            for custom_id in ('ticket:take', 'ticket:close'):
+                sent_at = time.monotonic()
+                action_id = await self.fake.click(int(card['channel_id']), staff, card, custom_id)
+                await self._ack(action_id, sent_at, acks)
+
+        await self._paced(count, rate, ticket)
+        return {'ack': acks}
+
+    def _ticket_card(self, ticket_id):
+        """Карточка тикета с кнопками в канале, созданном для формы ticket_id"""
+        for channel_id, channel in list(self.fake.channels.items()):
+            if channel['name'].endswith(str(ticket_id)):
+                for message in self.fake.channel_messages(channel_id):
+                    if message.get('components'):
+                        return message
+        return None
+
+    async def _wait_for(self, probe, timeout=30.0):
+        """Ожидание, пока probe() вернёт значение"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            result = probe()
+            if result is not None:
+                return result
+            await asyncio.sleep(0.02)
+        raise asyncio.TimeoutError()
+
+    async def scenario_applications(self, count, rate):
+        acks = []
+        panel = self._panel_message(MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID)
+
+        dm_before = self.welcome_bot.dm_queue.stats()
+
+        async def application(index):
+            user = self.fake.new_user()
+            member = await self.fake.member_join(user)
+            if index % 5 == 4:
+                # Часть заявителей закрыла личные сообщения
+                self.fake.closed_dms.add(int(user['id']))
+
+            # Кнопка "Подать заявку" -> модальное окно
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.click(
+                MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID, member, panel, 'applications:minecraft'
+            )
+            modal = (await self._ack(interaction_id, sent_at, acks))['data']
+
+            # Отправка формы -> заявка в канал рассмотрения
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.submit_modal(
+                MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID, member, modal,
+                [f'Alex{index}', 'Давно играю на сервере и хочу помогать', '18', 'Модерировал другой сервер']
+            )
+            await self._ack(interaction_id, sent_at, acks)
+
+        await self._paced(count, rate, application)
+        await self.drain()
+
+        # Сотрудник принимает все поданные заявки
+        review_messages = [
+            message for message in self.fake.channel_messages(MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID)
+            if message.get('components')
+        ]
+
+        async def review(index):
+            message = review_messages[index]
+            accept = message['components'][0]['components'][0]
+            staff = await self._staff_member(index)
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.click(
+                MINECRAFT_ADMIN_RESPONSES_CHANNEL_ID, staff, message, accept['custom_id']
+            )
+            await self._ack(interaction_id, sent_at, acks)
+
+        await self._paced(len(review_messages), rate, review)
+        await self.drain()
+
+        dm = self.welcome_bot.dm_queue.stats()
+        return {'ack': acks, 'dm': {name: dm[name] - dm_before[name] for name in ('sent', 'failed', 'retried')}}
+
+    async def scenario_spam(self, count, rate):
+        """Один пользователь жмёт кнопку заявки и отправляет одну и ту же форму count раз"""
+        acks = []
+        panel = self._panel_message(MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID)
+        member = await self.fake.member_join(self.fake.new_user('spammer'))
+
+        async def spam(index):
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.click(
+                MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID, member, panel, 'applications:minecraft'
+            )
+            response = await self._ack(interaction_id, sent_at, acks)
+            if response['type'] != 9:
+                return  # Бот отказал: модальное окно не открылось
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.submit_modal(
+                MINECRAFT_ADMIN_APPLICATION_CHANNEL_ID, member, response['data'],
+                ['Spammer', 'Возьмите меня', '20', '']
+            )
+            await self._ack(interaction_id, sent_at, acks)
+
+        await self._paced(count, rate, spam)
+        return {'ack': acks}
+
+    def _admission_rejected(self):
+        admission = getattr(self.welcome_bot.bot, 'admission', None)
+        return sum(admission.stats()['rejected'].values()) if admission else 0
+
+    async def _scrape_metrics(self):
+        """Запрос GET /metrics к эндпоинту бота: размер ответа, число рядов и время"""
+        server = self.welcome_bot.metrics_server
+        if server is None:
+            return None
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'http://{server.host}:{server.port}/metrics') as response:
+                body = await response.text()
+        return {
+            'bytes': len(body),
+            'series': sum(1 for line in body.splitlines() if line and not line.startswith('#')),
+            'scrape_ms': (time.perf_counter() - started) * 1000,
+        }
+
+    async def run_scenario(self, name, count, rate):
+        """Прогон одного сценария и сбор отчёта"""
+        prepare = getattr(self, f'prepare_{name}', None)
+        if prepare is not None:
+            await prepare(count)
+
+        self.fake.reset_stats()
+        self.timer.reset()
+        self.failed_actions = 0
+        rejected_before = self._admission_rejected()
+
+        started = time.perf_counter()
+        extra = await getattr(self, f'scenario_{name}')(count, rate)
+        await self.drain()
+        elapsed = time.perf_counter() - started
+
+        handlers = {}
+        for event_name, samples in self.timer.samples.items():
+            handlers[event_name] = {
+                'count': len(samples),
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+            }
+
+        report = {
+            'scenario': name,
+            'events': count,
+            'elapsed_s': elapsed,
+            'throughput_per_s': count / elapsed if elapsed else 0.0,
+            'handlers': handlers,
+            'rest_calls': sum(self.fake.calls.values()),
+            'rest_by_route': dict(self.fake.calls.most_common()),
+            'rate_limited_429': self.fake.rate_limited,
+            'failed_actions': self.failed_actions,
+            'admission_rejected': self._admission_rejected() - rejected_before,
+        }
+        for key in ('llm', 'dm'):
+            if key in extra:
+                report[key] = extra[key]
+        report['global_rate_limited_429'] = self.fake.global_rate_limited
+        metrics = await self._scrape_metrics()
+        if metrics is not None:
+            report['metrics'] = metrics
+        acks = extra.get('ack')
+        if acks:
+            report['interaction_ack'] = {
+                'count': len(acks),
+                'p50_ms': percentile(acks, 0.50) * 1000,
+                'p99_ms': percentile(acks, 0.99) * 1000,
+            }
+        return report
+
+def print_report(report):
+    print(f"\n=== {report['scenario']}: {report['events']} событий за {report['elapsed_s']:.2f} с "
+          f"({report['throughput_per_s']:.1f}/с)")
+    for event_name, stats in sorted(report['handlers'].items()):
+        print(f"  {event_name:<28} n={stats['count']:<6} p50={stats['p50_ms']:8.2f} мс  p99={stats['p99_ms']:8.2f} мс")
+    if 'interaction_ack' in report:
+        ack = report['interaction_ack']
+        print(f"  {'ответ на взаимодействие':<28} n={ack['count']:<6} p50={ack['p50_ms']:8.2f} мс  p99={ack['p99_ms']:8.2f} мс")
+    print(f"  REST-запросов: {report['rest_calls']} (429: {report['rate_limited_429']}, "
+          f"глобальных: {report['global_rate_limited_429']})")
+    if 'dm' in report:
+        print(f"  личные сообщения: {json.dumps(report['dm'], ensure_ascii=False)}")
+    if report['failed_actions']:
+        print(f"  неудачных действий: {report['failed_actions']}")
+    if report['admission_rejected']:
+        print(f"  отклонено контролем допуска: {report['admission_rejected']}")
+    if 'metrics' in report:
+        metrics = report['metrics']
+        print(f"  /metrics: {metrics['series']} рядов, {metrics['bytes']} байт за {metrics['scrape_ms']:.2f} мс")
+    if 'llm' in report:
+        print(f"  движок ответов: {json.dumps(report['llm'], ensure_ascii=False)}")
+    for route_name, calls in report['rest_by_route'].items():
+        print(f"    {calls:>6}  {route_name}")
+
+async def main(args):
+    harness = LoadHarness(emulate_rate_limits=args.rate_limits, llm_delay=args.llm_delay)
+    await harness.start()
+    reports = []
+    try:
+        for name in args.scenario or SCENARIOS:
+            report = await harness.run_scenario(name, args.count, args.rate)
+            reports.append(report)
+            if not args.json:
+                print_report(report)
+    finally:
+        await harness.stop()
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный стенд бота против локального фейкового Discord')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='сценарий (можно несколько раз)')
+    parser.add_argument('--count', type=int, default=100, help='количество событий в сценарии')
+    parser.add_argument('--rate', type=float, default=0.0, help='событий в секунду (0 - всё сразу)')
+    parser.add_argument('--rate-limits', action='store_true', help='эмулировать лимит 5 сообщений / 5 с на канал')
+    parser.add_argument('--llm-delay', type=float, default=None,
+                        help='включить ответы через локальную заглушку LLM с этой задержкой, с')
+    parser.add_argument('--json', action='store_true', help='вывести отчёт в JSON')
+    parser.add_argument('-v', '--verbose', action='store_true', help='показывать логи бота')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+    asyncio.run(main(args))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка OpenAI-совместимого API для нагрузочного тестирования
+Отвечает на POST /v1/chat/completions с настраиваемой задержкой и считает запросы,
+токены и пиковое число одновременных запросов - стоимость и задержку движка ответов
+можно измерить без сети
+
+Запуск отдельно: python -m loadtest.llm_stub --port 8089 --delay 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from aiohttp import web
+
+class StubLLM:
+    """Заглушка /v1/chat/completions со статистикой"""
+
+    def __init__(self, delay=0.2, reply='Звучит интересно! А что было дальше?', fail_every=0):
+        self.delay = delay
+        self.reply = reply
+        self.fail_every = fail_every  # каждый N-й запрос отвечает 500 (0 - никогда)
+
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._runner = None
+        self.base_url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запуск сервера; возвращает базовый URL API (с /v1)"""
+        app = web.Application()
+        app.router.add_route('POST', '/v1/chat/completions', self._completions)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://{host}:{port}/v1'
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def client(self):
+        """Клиент openai, направленный на заглушку"""
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key='stub', base_url=self.base_url, max_retries=0)
+
+    def reset_stats(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.peak_in_flight = self.in_flight
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'peak_in_flight': self.peak_in_flight,
+        }
+
+    async def _completions(self, request):
+        body = await request.json()
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_every and self.requests % self.fail_every == 0:
+                return web.json_response({'error': {'message': 'stub failure', 'type': 'server_error'}}, status=500)
+
+            # Грубая оценка токенов: ~4 символа на токен
+            prompt_tokens = sum(len(message.get('content') or '') for message in body.get('messages', ())) // 4 + 1
+            completion_tokens = len(self.reply) // 4 + 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+            return web.json_response({
+                'id': f'chatcmpl-stub-{self.requests}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': self.reply},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens,
+                },
+            })
+        finally:
+            self.in_flight -= 1
+
+async def main(args):
+    stub = StubLLM(delay=args.delay, fail_every=args.fail_every)
+    base_url = await stub.start(port=args.port)
+    print(f'Заглушка LLM: {base_url} (OPENAI_BASE_URL={base_url} OPENAI_API_KEY=stub)')
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(json.dumps(stub.stats()))
+    finally:
+        await stub.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Заглушка OpenAI-совместимого API')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay', type=float, default=0.2, help='задержка ответа в секундах')
+    parser.add_argument('--fail-every', type=int, default=0, help='каждый N-й запрос завершается ошибкой')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,203 @@
+"""
+Неблокирующее логирование
+Обработчики событий только кладут запись в очередь (QueueHandler), а файл и консоль
+пишет отдельный поток (QueueListener). Файл - JSON по строке на запись с ротацией
+по размеру и по времени. Болтливые логгеры можно прореживать до постановки в очередь
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+from datetime import datetime, timezone
+from config import (
+    LOG_PATH,
+    LOG_LEVEL,
+    LOG_JSON,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLING
+)
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        sampled = getattr(record, 'sample_rate', None)
+        if sampled is not None:
+            entry['sample_rate'] = sampled
+        return json.dumps(entry, ensure_ascii=False)
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Ротация по времени (when) и по размеру (max_bytes), что наступит раньше.
+    Несколько ротаций по размеру за один период получают суффиксы .1, .2, ... - номер
+    всегда больше всех существующих, поэтому имена освободившихся файлов не переиспользуются,
+    а при очистке остаются backup_count самых новых по (период, номер)
+    """
+
+    def __init__(self, filename, max_bytes=0, when='midnight', backup_count=0, encoding='utf-8'):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def _backups(self):
+        """Файлы ротации от старых к новым: [(период, номер, путь)]"""
+        directory, base = os.path.split(self.baseFilename)
+        pattern = re.compile(rf'{re.escape(base)}\.(.+?)(?:\.(\d+))?')
+        backups = []
+        for name in os.listdir(directory or '.'):
+            match = pattern.fullmatch(name)
+            if match and self.extMatch.fullmatch(match.group(1)):
+                backups.append((match.group(1), int(match.group(2) or 0), os.path.join(directory, name)))
+        backups.sort()
+        return backups
+
+    def rotation_filename(self, default_name):
+        stamp = default_name[len(self.baseFilename) + 1:]
+        indexes = [index for backup_stamp, index, _ in self._backups() if backup_stamp == stamp]
+        if not indexes:
+            return default_name
+        return f'{default_name}.{max(indexes) + 1}'
+
+    def getFilesToDelete(self):
+        backups = self._backups()
+        if len(backups) <= self.backupCount:
+            return []
+        return [path for _, _, path in backups[:len(backups) - self.backupCount]]
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживание записей INFO и ниже для отдельных логгеров: имя (или префикс) -> доля,
+    которую нужно оставить. Предупреждения и ошибки проходят всегда
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._cache = {}  # имя логгера -> доля (None - без прореживания)
+        self.dropped = 0
+
+    def _rate(self, name):
+        rate = self._cache.get(name, False)
+        if rate is False:
+            rate = None
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate is None:
+            return True
+        if random.random() < rate:
+            record.sample_rate = rate
+            return True
+        self.dropped += 1
+        return False
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не блокирует"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Сообщение и трассировка превращаются в строки до передачи в поток записи"""
+        # Запись создана для этого вызова и больше никуда не передаётся - копия не нужна
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LoggingPipeline:
+    """Очередь логов, фоновый поток записи и статистика"""
+
+    def __init__(self, queue_handler, listener, sampling):
+        self.queue_handler = queue_handler
+        self.listener = listener
+        self.sampling = sampling
+
+    def stats(self):
+        return {
+            'queued': self.queue_handler.queue.qsize(),
+            'dropped_full': self.queue_handler.dropped,
+            'dropped_sampled': self.sampling.dropped,
+        }
+
+    def stop(self):
+        """Запись оставшихся логов и остановка потока"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+def setup_logging(path=LOG_PATH, level=LOG_LEVEL, json_lines=LOG_JSON, max_bytes=LOG_MAX_BYTES,
+                  backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN, queue_size=LOG_QUEUE_SIZE,
+                  sampling=LOG_SAMPLING, console=True):
+    """Настройка корневого логгера; возвращает LoggingPipeline для остановки при выходе"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    file_handler = SizeAndTimeRotatingFileHandler(path, max_bytes=max_bytes, when=when, backup_count=backup_count)
+    file_handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(CONSOLE_FORMAT))
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    sampling_filter = SamplingFilter(sampling)
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return LoggingPipeline(queue_handler, listener, sampling_filter)
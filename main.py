@@ -1,32 +1,54 @@
 #!/usr/bin/env python3
 """
 Discord Welcome Bot for Limonericx Server
-Main entry point for the bot application
+Main entry point for the bot application: a single bot process, or a supervisor
+running several sharded bot processes when BOT_SHARD_PROCESSES > 1
 """
 
 import asyncio
 import logging
 import os
+import signal
+from logging_setup import setup_logging
 from bot import DiscordWelcomeBot
+from sharding import ShardSupervisor
+from config import SHARD_COUNT, SHARD_PROCESSES, SHARD_WORKER_ID
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging: handlers only enqueue records, a background thread writes them
+logging_pipeline = setup_logging()
 
 logger = logging.getLogger(__name__)
 
+# Shutdown tasks started from signal handlers; the reference keeps them from being garbage-collected
+_shutdown_tasks = set()
+
+def _request_stop(bot):
+    """SIGTERM handler: start a graceful stop without blocking the event loop"""
+    task = asyncio.create_task(bot.stop_bot())
+    _shutdown_tasks.add(task)
+    task.add_done_callback(_shutdown_tasks.discard)
+
 async def main():
     """Main function to start the Discord bot"""
     try:
-        # Initialize and start the bot
+        # Supervisor process: spawn one bot process per group of shards
+        if SHARD_PROCESSES > 1 and SHARD_WORKER_ID is None:
+            supervisor = ShardSupervisor(SHARD_COUNT or SHARD_PROCESSES, SHARD_PROCESSES, os.path.abspath(__file__))
+            await supervisor.run()
+            return
+        
+        # Initialize and start the bot; SIGTERM from the supervisor stops it gracefully
         bot = DiscordWelcomeBot()
-        await bot.start_bot()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, _request_stop, bot)
+        except NotImplementedError:
+            pass  # Windows
+        # Whatever ends the bot (SIGTERM, Ctrl+C, a disconnect error), pending welcomes are flushed,
+        # the DM and timer workers stopped and the state database closed
+        try:
+            await bot.start_bot()
+        finally:
+            await bot.stop_bot()
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
@@ -40,3 +62,5 @@ if __name__ == "__main__":
         logger.info("Application stopped by user")
     except Exception as e:
         logger.error(f"Application failed to start: {e}")
+    finally:
+        logging_pipeline.stop()
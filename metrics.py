@@ -0,0 +1,197 @@
+"""
+Лёгкие метрики для внутренних систем бота
+Счётчики и гистограммы задержек с фиксированными корзинами, реестр метрик
+и их выдача в текстовом формате Prometheus
+"""
+
+import math
+from bisect import bisect_left
+
+# Корзины гистограмм задержек в секундах
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+class Counter:
+    """Монотонно растущий счётчик"""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: O(log n) на наблюдение, постоянная память"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # Последняя корзина - всё, что больше верхней границы (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Добавление одного наблюдения"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            if index < len(self.buckets):
+                lower = self.buckets[index]
+        return self.max
+
+    def snapshot(self):
+        """Сводка для логов и отладки"""
+        return {
+            'count': self.count,
+            'avg': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+# Типы метрик в текстовом формате Prometheus
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+class MetricFamily:
+    """Метрика с метками: отдельный Counter или Histogram на каждый набор значений меток"""
+
+    __slots__ = ('name', 'help', 'kind', 'labelnames', 'buckets', '_children')
+
+    def __init__(self, name, help, kind, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}  # значения меток -> Counter/Histogram
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name}: ожидались метки {self.labelnames}')
+            child = Histogram(self.buckets) if self.kind == HISTOGRAM else Counter()
+            self._children[values] = child
+        return child
+
+    # Метрика без меток работает как обычный счётчик или гистограмма
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        return [(dict(zip(self.labelnames, values)), child) for values, child in self._children.items()]
+
+class MetricsRegistry:
+    """
+    Набор метрик для выдачи в формате Prometheus. Кроме собственных семейств принимает
+    коллекторы - функции, которые при запросе превращают stats() подсистем в метрики
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+
+    def _family(self, name, help, kind, labelnames, **kwargs):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = MetricFamily(name, help, kind, labelnames, **kwargs)
+        return family
+
+    def counter(self, name, help, labelnames=()):
+        return self._family(name, help, COUNTER, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._family(name, help, HISTOGRAM, labelnames, buckets=buckets)
+
+    def collector(self, func):
+        """
+        Регистрация func() -> [(имя, тип, описание, [(метки, значение или Histogram)])].
+        Вызывается только при запросе метрик
+        """
+        self._collectors.append(func)
+        return func
+
+    def collect(self):
+        for family in self._families.values():
+            yield family.name, family.kind, family.help, family.samples()
+        for func in self._collectors:
+            yield from func()
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = []
+        for name, kind, help, samples in self.collect():
+            if not samples:
+                continue
+            lines.append(f'# HELP {name} {_escape_help(help)}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    _render_histogram(lines, name, labels, value)
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(getattr(value, "value", value))}')
+        lines.append('')
+        return '\n'.join(lines)
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, float):
+        if math.isfinite(value):
+            return repr(value)
+        return 'NaN' if math.isnan(value) else ('+Inf' if value > 0 else '-Inf')
+    return str(int(value))
+
+def _render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_format_labels(dict(labels, le=repr(float(bound))))} {cumulative}')
+    lines.append(f'{name}_bucket{_format_labels(dict(labels, le="+Inf"))} {histogram.count}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {repr(float(histogram.sum))}')
+    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+# Общий реестр метрик бота
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,235 @@
+"""
+HTTP-эндпоинт метрик бота в формате Prometheus
+Сервер aiohttp работает в цикле событий бота и отдаёт GET /metrics. Собственные счётчики
+подсистем обновляются на месте, а состояние очередей, кэшей и хранилищ собирается
+коллекторами только в момент запроса, поэтому в обычной работе накладных расходов почти нет
+"""
+
+import logging
+import time
+import aiohttp
+from aiohttp import web
+from metrics import REGISTRY, COUNTER, GAUGE, HISTOGRAM
+from outbound import Priority
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Запросы к REST API Discord (по трассировке aiohttp-сессии discord.py)
+REST_REQUESTS = REGISTRY.counter(
+    'limonericx_rest_requests_total', 'Запросы к REST API Discord', ('method', 'status')
+)
+REST_LATENCY = REGISTRY.histogram(
+    'limonericx_rest_request_seconds', 'Время запроса к REST API Discord', ('method',)
+)
+REST_RATE_LIMITED = REGISTRY.counter(
+    'limonericx_rest_rate_limited_total', 'Ответы 429 от Discord', ('scope',)
+)
+REST_ERRORS = REGISTRY.counter(
+    'limonericx_rest_errors_total', 'Запросы к Discord, завершившиеся ошибкой соединения', ('method',)
+)
+SCRAPE_LATENCY = REGISTRY.histogram(
+    'limonericx_metrics_render_seconds', 'Время формирования ответа /metrics'
+)
+
+def rest_trace_config():
+    """Трассировка HTTP-сессии discord.py: счётчики ответов, 429 и задержки запросов"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        status = params.response.status
+        REST_REQUESTS.labels(params.method, status).inc()
+        REST_LATENCY.labels(params.method).observe(time.perf_counter() - context.started)
+        if status == 429:
+            REST_RATE_LIMITED.labels(params.response.headers.get('X-RateLimit-Scope', 'unknown')).inc()
+
+    async def on_request_exception(session, context, params):
+        REST_ERRORS.labels(params.method).inc()
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+def _counters(name, help, values):
+    return name, COUNTER, help, [(labels, value) for labels, value in values]
+
+def bot_collector(bot):
+    """Коллектор состояния подсистем бота (всё, что создаётся лениво, может отсутствовать)"""
+
+    def collect():
+        latency = bot.latency
+        yield 'limonericx_gateway_latency_seconds', GAUGE, 'Задержка heartbeat шлюза', [({}, latency)]
+
+        # Шарды этого процесса (есть только у AutoShardedBot)
+        latencies = getattr(bot, 'latencies', None)
+        if latencies:
+            yield 'limonericx_shard_latency_seconds', GAUGE, 'Задержка heartbeat шарда', [
+                ({'shard': str(shard_id)}, shard_latency) for shard_id, shard_latency in latencies
+            ]
+
+        yield 'limonericx_cache_size', GAUGE, 'Размер кэшей discord.py', [
+            ({'cache': 'guilds'}, len(bot.guilds)),
+            ({'cache': 'users'}, len(bot.users)),
+            ({'cache': 'messages'}, len(bot.cached_messages)),
+            ({'cache': 'members'}, sum(guild.member_count or 0 for guild in bot.guilds)),
+            ({'cache': 'channels'}, sum(len(guild.channels) for guild in bot.guilds)),
+        ]
+
+        message_latency = getattr(bot, 'message_latency', None)
+        if message_latency is not None:
+            yield ('limonericx_on_message_seconds', HISTOGRAM,
+                   'Время от получения сообщения до обработки команд', [({}, message_latency)])
+
+        outbound = getattr(bot, 'outbound', None)
+        if outbound is not None:
+            depth = outbound.metrics()['queue_depth']
+            yield 'limonericx_outbound_queue_depth', GAUGE, 'Запросов в очереди исходящих', [
+                ({'priority': priority.name}, depth[priority.name]) for priority in Priority
+            ]
+            yield 'limonericx_outbound_in_flight', GAUGE, 'Выполняемых исходящих запросов', [
+                ({}, outbound.metrics()['in_flight'])
+            ]
+            for name, counters, help in (
+                ('limonericx_outbound_sent_total', outbound.sent, 'Отправленные исходящие запросы'),
+                ('limonericx_outbound_failed_total', outbound.failed, 'Исходящие запросы с ошибкой'),
+                ('limonericx_outbound_dropped_total', outbound.dropped, 'Отброшенные исходящие запросы'),
+            ):
+                yield _counters(name, help, (({'priority': priority.name}, counters[priority]) for priority in Priority))
+            yield 'limonericx_outbound_latency_seconds', HISTOGRAM, 'Ожидание и выполнение исходящего запроса', [
+                ({'priority': priority.name}, outbound.latency[priority]) for priority in Priority
+            ]
+
+        router = getattr(bot, 'event_router', None)
+        if router is not None:
+            routes = list(router._routes.values())
+            yield _counters('limonericx_handler_calls_total', 'Вызовы обработчиков событий',
+                            (({'handler': route.name}, route.stats.calls) for route in routes))
+            yield _counters('limonericx_handler_errors_total', 'Ошибки обработчиков событий',
+                            (({'handler': route.name}, route.stats.errors) for route in routes))
+            yield 'limonericx_handler_seconds', HISTOGRAM, 'Время обработчика события', [
+                ({'handler': route.name}, route.stats.latency) for route in routes
+            ]
+            yield _counters('limonericx_events_unrouted_total', 'События без обработчиков', [({}, router.unrouted)])
+
+        admission = getattr(bot, 'admission', None)
+        if admission is not None:
+            yield _counters('limonericx_admission_admitted_total', 'Допущенные действия пользователей',
+                            (({'action': action}, counter) for action, counter in admission.admitted.items()))
+            yield _counters('limonericx_admission_rejected_total', 'Отклонённые действия пользователей',
+                            (({'action': action, 'reason': reason}, counter)
+                             for (action, reason), counter in admission.rejected.items()))
+            yield _counters('limonericx_admission_refunded_total', 'Возвращённые токены несостоявшихся действий',
+                            (({'action': action}, counter) for action, counter in admission.refunded.items()))
+
+        store = getattr(bot, 'ticket_store', None)
+        if store is not None:
+            yield 'limonericx_tickets', GAUGE, 'Тикеты по состояниям', [
+                ({'state': state}, count) for state, count in store.stats().items() if state != 'users_with_tickets'
+            ]
+
+        batcher = getattr(bot, 'welcome_batcher', None)
+        if batcher is not None:
+            stats = batcher.stats()
+            # Отправленные приветствия уже считает limonericx_welcome_messages_total из REGISTRY
+            yield 'limonericx_welcome_pending', GAUGE, 'Участники, ждущие приветствия', [({}, stats['pending'])]
+            for name, key, help in (
+                ('limonericx_welcome_joins_total', 'joins_received', 'Заходы участников, переданные в батчинг'),
+                ('limonericx_welcome_batches_total', 'batches_sent', 'Объединённые приветствия на нескольких участников'),
+                ('limonericx_welcome_sends_saved_total', 'sends_saved', 'Отправки, сэкономленные объединением'),
+                ('limonericx_welcome_send_errors_total', 'send_errors', 'Приветствия с ошибкой отправки'),
+            ):
+                yield _counters(name, help, [({}, stats[key])])
+
+        timers = getattr(bot, 'timers', None)
+        if timers is not None:
+            stats = timers.stats()
+            yield 'limonericx_timers_pending', GAUGE, 'Отложенные действия в очереди', [({}, stats['pending'])]
+            yield _counters('limonericx_timers_total', 'Выполненные отложенные действия', [
+                ({'result': 'executed'}, stats['executed']), ({'result': 'failed'}, stats['failed'])
+            ])
+
+        dm_queue = getattr(bot, 'dm_queue', None)
+        if dm_queue is not None:
+            stats = dm_queue.stats()
+            yield 'limonericx_dm_pending', GAUGE, 'Личные сообщения в очереди', [({}, stats['pending'])]
+            yield _counters('limonericx_dm_total', 'Доставка личных сообщений', [
+                ({'result': result}, stats[result]) for result in ('sent', 'failed', 'retried')
+            ])
+
+        activity = getattr(bot, 'activity_system', None)
+        if activity is not None:
+            yield 'limonericx_activity_channels', GAUGE, 'Каналы системы активности', [({}, len(activity.channels))]
+            yield 'limonericx_activity_timers', GAUGE, 'События в куче таймеров активности', [({}, len(activity._heap))]
+            background = activity.background.stats()
+            yield 'limonericx_activity_background_in_flight', GAUGE, 'Фоновые задачи активности', [
+                ({}, background['in_flight'])
+            ]
+            yield _counters('limonericx_activity_background_total', 'Фоновые задачи активности', [
+                ({'result': result}, background[result]) for result in ('started', 'dropped', 'failed')
+            ])
+
+        engine = getattr(bot, 'reply_engine', None)
+        if engine is not None and engine.enabled:
+            stats = engine.stats()
+            yield _counters('limonericx_llm_requests_total', 'Запросы к движку ответов', [
+                ({'result': result}, stats[result])
+                for result in ('calls', 'cache_hits', 'coalesced', 'timeouts', 'errors', 'fallbacks')
+            ])
+            yield _counters('limonericx_llm_tokens_total', 'Израсходованные токены LLM', [({}, stats['tokens'])])
+            yield 'limonericx_llm_seconds', HISTOGRAM, 'Время ответа LLM', [({}, engine.latency)]
+
+    return collect
+
+class MetricsServer:
+    """Локальный HTTP-сервер с GET /metrics"""
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+        self._bot = None
+
+    async def start(self, bot):
+        """Запуск сервера (повторный вызов ничего не делает)"""
+        if self._runner is not None:
+            return
+        if self._bot is None:
+            self._bot = bot
+            self.registry.collector(bot_collector(bot))
+
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        # Порт 0 - выбрать свободный (для стендов и тестов)
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f'Метрики доступны на http://{self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request):
+        started = time.perf_counter()
+        body = self.registry.render()
+        SCRAPE_LATENCY.observe(time.perf_counter() - started)
+        return web.Response(body=body.encode('utf-8'), headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+def get_metrics_server(bot):
+    """Сервер метрик бота или None, если метрики выключены (создаётся при первом обращении)"""
+    if not METRICS_ENABLED:
+        return None
+    server = getattr(bot, 'metrics_server', None)
+    if server is None:
+        server = MetricsServer()
+        bot.metrics_server = server
+    return server
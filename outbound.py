@@ -0,0 +1,336 @@
+"""
+Общий планировщик исходящих запросов к Discord
+Все системы бота отправляют сообщения, реакции и правки через одну очередь с приоритетами,
+чтобы болтовня системы активности не отнимала лимиты у тикетов и действий персонала
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from metrics import Counter, Histogram
+from state_backend import SharedTokenBucket
+from config import (
+    OUTBOUND_ROUTE_LIMITS,
+    OUTBOUND_SHARED_ROUTES,
+    OUTBOUND_MAX_QUEUE,
+    OUTBOUND_MAX_CONCURRENCY,
+    OUTBOUND_ACTIVITY_MAX_AGE
+)
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Классы приоритета исходящих запросов (меньше - важнее)"""
+    STAFF = 0     # Тикеты, заявки и действия персонала
+    WELCOME = 1   # Приветствия и прощания
+    ACTIVITY = 2  # Сообщения и реакции системы активности
+
+# Приоритет -> сколько секунд запрос может ждать в очереди, прежде чем будет выброшен
+DROP_AFTER = {Priority.ACTIVITY: OUTBOUND_ACTIVITY_MAX_AGE}
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, now=None, tokens=1):
+        """Забрать токены, если они есть"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def refund(self, now=None, tokens=1):
+        """Возврат токенов неиспользованного действия (не больше capacity)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def delay(self, now=None, tokens=1):
+        """Через сколько секунд появятся нужные токены"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        missing = tokens - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate
+
+    def is_full(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _OutboundItem:
+    """Один отложенный запрос в очереди"""
+
+    __slots__ = ('priority', 'route', 'factory', 'future', 'enqueued_at', 'key')
+
+    def __init__(self, priority, route, factory, future, enqueued_at, key=None):
+        self.priority = priority
+        self.route = route
+        self.factory = factory
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.key = key
+
+class OutboundScheduler:
+    """Очередь исходящих запросов с приоритетами и ограничением скорости по маршрутам"""
+
+    # Сколько элементов одной очереди просматривать в поисках свободного маршрута
+    SCAN_LIMIT = 32
+    # После скольких маршрутов начинать выбрасывать простаивающие bucket'ы
+    MAX_BUCKETS = 10000
+
+    def __init__(self, route_limits=None, max_queue=OUTBOUND_MAX_QUEUE,
+                 max_concurrency=OUTBOUND_MAX_CONCURRENCY, drop_after=None, backend=None,
+                 shared_routes=OUTBOUND_SHARED_ROUTES):
+        self.route_limits = dict(OUTBOUND_ROUTE_LIMITS if route_limits is None else route_limits)
+        # Маршруты на весь бот (ЛС) при общем бэкенде состояния делят bucket со всеми процессами;
+        # маршруты каналов остаются локальными - канал обслуживает один процесс
+        self.backend = backend if backend is not None and backend.shared else None
+        self.shared_routes = frozenset(shared_routes)
+        self.max_queue = max_queue
+        self.max_concurrency = max_concurrency
+        self.drop_after = dict(DROP_AFTER if drop_after is None else drop_after)
+
+        self._queues = {priority: deque() for priority in Priority}
+        self._coalesced = {}  # ключ объединения -> запрос, ещё ждущий в очереди
+        self._tasks = set()   # выполняющиеся запросы (ссылки, чтобы задачи не собрал GC)
+        self._buckets = {}
+        self._worker = None
+        self._wakeup = None
+        self._slots = None
+        self._in_flight = 0
+
+        # Метрики
+        self.sent = {priority: Counter() for priority in Priority}
+        self.failed = {priority: Counter() for priority in Priority}
+        self.dropped = {priority: Counter() for priority in Priority}
+        self.latency = {priority: Histogram() for priority in Priority}
+
+    @property
+    def depth(self):
+        """Общее количество запросов в очереди"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def metrics(self):
+        """Глубина очередей, счётчики и задержки по приоритетам"""
+        return {
+            'queue_depth': {priority.name: len(self._queues[priority]) for priority in Priority},
+            'in_flight': self._in_flight,
+            'sent': {priority.name: self.sent[priority].value for priority in Priority},
+            'failed': {priority.name: self.failed[priority].value for priority in Priority},
+            'dropped': {priority.name: self.dropped[priority].value for priority in Priority},
+            'latency': {priority.name: self.latency[priority].snapshot() for priority in Priority},
+        }
+
+    def _ensure_worker(self):
+        """Запуск фоновой задачи при первом запросе"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.create_task(self._run())
+
+    def _bucket(self, route):
+        """Token bucket маршрута; маршрут - кортеж (тип запроса, ID канала/сервера)"""
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._prune_buckets()
+            rate, capacity = self.route_limits.get(route[0], self.route_limits['default'])
+            if self.backend is not None and route[0] in self.shared_routes:
+                bucket = SharedTokenBucket(self.backend, f'route:{route[0]}:{route[1]}', rate, capacity)
+            else:
+                bucket = TokenBucket(rate, capacity)
+            self._buckets[route] = bucket
+        return bucket
+
+    def _prune_buckets(self):
+        """Удаление полностью восстановившихся bucket'ов - они равны новым"""
+        now = time.monotonic()
+        for route in [route for route, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[route]
+
+    def submit_nowait(self, priority, route, factory, key=None):
+        """
+        Постановка запроса в очередь. factory - функция без аргументов, возвращающая корутину.
+        key объединяет запросы: если запрос с тем же ключом ещё ждёт в очереди, он получает
+        новую factory (выполнится только последнее состояние) и общий future.
+        Возвращает future с результатом; None, если запрос был отброшен под нагрузкой
+        """
+        self._ensure_worker()
+        if key is not None:
+            queued = self._coalesced.get(key)
+            if queued is not None and not queued.future.done():
+                queued.factory = factory
+                return queued.future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # Под нагрузкой низкоприоритетная работа отбрасывается сразу
+        if priority == Priority.ACTIVITY and self.depth >= self.max_queue:
+            self.dropped[priority].inc()
+            future.set_result(None)
+            return future
+
+        item = _OutboundItem(priority, route, factory, future, time.monotonic(), key)
+        self._queues[priority].append(item)
+        if key is not None:
+            self._coalesced[key] = item
+        self._wakeup.set()
+        return future
+
+    async def submit(self, priority, route, factory, key=None):
+        """Постановка запроса в очередь и ожидание его выполнения"""
+        return await self.submit_nowait(priority, route, factory, key)
+
+    def _dequeued(self, item):
+        """Запрос покинул очередь: новые запросы с его ключом становятся в очередь заново"""
+        if item.key is not None and self._coalesced.get(item.key) is item:
+            del self._coalesced[item.key]
+
+    def _next_ready(self):
+        """Самый приоритетный запрос со свободным маршрутом и время ожидания, если такого нет"""
+        now = time.monotonic()
+        wait = None
+
+        for priority in Priority:
+            queue = self._queues[priority]
+
+            # Устаревшая низкоприоритетная работа выбрасывается
+            max_age = self.drop_after.get(priority)
+            if max_age is not None:
+                while queue and now - queue[0].enqueued_at > max_age:
+                    item = queue.popleft()
+                    self._dequeued(item)
+                    self.dropped[priority].inc()
+                    if not item.future.done():
+                        item.future.set_result(None)
+
+            for index, item in enumerate(queue):
+                if index >= self.SCAN_LIMIT:
+                    break
+                if item.future.done():
+                    # Отменён вызывающим кодом
+                    del queue[index]
+                    self._dequeued(item)
+                    return None, 0.0
+                bucket = self._bucket(item.route)
+                if bucket.try_acquire(now):
+                    del queue[index]
+                    self._dequeued(item)
+                    return item, None
+                delay = bucket.delay(now)
+                wait = delay if wait is None else min(wait, delay)
+
+        return None, wait
+
+    async def _run(self):
+        """Основной цикл: выбор запроса и запуск его выполнения"""
+        while True:
+            try:
+                await self._slots.acquire()
+                item, wait = self._next_ready()
+                if item is None:
+                    self._slots.release()
+                    if wait == 0.0:
+                        continue
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self._in_flight += 1
+                task = asyncio.create_task(self._execute(item))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка в планировщике исходящих запросов: {e}')
+
+    async def _execute(self, item):
+        """Выполнение одного запроса и учёт метрик"""
+        try:
+            result = await item.factory()
+        except Exception as e:
+            self.failed[item.priority].inc()
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            self.sent[item.priority].inc()
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            # Задержка от постановки в очередь до ответа Discord
+            self.latency[item.priority].observe(time.monotonic() - item.enqueued_at)
+            self._in_flight -= 1
+            self._slots.release()
+            self._wakeup.set()
+
+    async def close(self):
+        """Остановка планировщика; ожидающие запросы отменяются"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        for queue in self._queues.values():
+            while queue:
+                item = queue.popleft()
+                if not item.future.done():
+                    item.future.cancel()
+        self._coalesced.clear()
+
+async def schedule(bot, priority, route, factory, key=None):
+    """Отправка запроса через планировщик бота, либо напрямую, если планировщика нет"""
+    scheduler = getattr(bot, 'outbound', None)
+    if scheduler is None:
+        return await factory()
+    return await scheduler.submit(priority, route, factory, key)
+
+# Запросы post() без планировщика (ссылки, чтобы задачи не собрал GC)
+_detached = set()
+
+def post(bot, priority, route, factory, key=None):
+    """
+    Постановка запроса без ожидания результата - для малоценных отправок (прощания,
+    переименования каналов), которые не должны держать обработчик события или кнопку.
+    Ошибки пишутся в лог. Возвращает future (или задачу, если планировщика нет)
+    """
+    scheduler = getattr(bot, 'outbound', None)
+    if scheduler is None:
+        future = asyncio.ensure_future(factory())
+        _detached.add(future)
+        future.add_done_callback(_detached.discard)
+    else:
+        future = scheduler.submit_nowait(priority, route, factory, key)
+
+    def log_failure(done):
+        if not done.cancelled() and done.exception() is not None:
+            logger.error(f'Ошибка отложенного запроса {route[0]} ({route[1]}): {done.exception()}')
+
+    future.add_done_callback(log_failure)
+    return future
@@ -0,0 +1,197 @@
+"""
+Реестр панелей бота (поддержка, заявки в администрацию)
+Запоминает ID сообщения каждой панели и хэш её содержимого, чтобы при повторном
+on_ready не удалять и не публиковать панели заново.
+Когда бот работает в нескольких процессах, записи хранятся в общем бэкенде состояния
+(ключ panel:<имя>), чтобы процессы не перезаписывали файл друг друга
+"""
+
+import hashlib
+import json
+import logging
+import os
+import discord
+from outbound import Priority, schedule
+from state_backend import get_state_backend
+from config import PANEL_REGISTRY_PATH
+
+logger = logging.getLogger(__name__)
+
+def panel_hash(embed, view):
+    """Хэш содержимого панели: embed и компоненты view"""
+    payload = {
+        'embed': embed.to_dict(),
+        'components': view.to_components() if view else []
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class PanelRegistry:
+    """Хранилище записей о панелях: имя -> канал, сообщение, хэш содержимого"""
+
+    # Префикс ключей записей в общем бэкенде
+    KEY_PREFIX = 'panel:'
+
+    def __init__(self, path=PANEL_REGISTRY_PATH, backend=None):
+        self.path = path
+        self.backend = backend if backend is not None and backend.shared else None
+        self._panels = {}
+        self._by_message = {}  # ID сообщения -> имя панели
+        self._load()
+
+    def _load(self):
+        """Загрузка реестра с диска или из общего бэкенда"""
+        if self.backend is not None:
+            self._load_shared()
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._panels = json.load(f)
+        except FileNotFoundError:
+            self._panels = {}
+        except (OSError, ValueError) as e:
+            logger.error(f'Не удалось прочитать реестр панелей {self.path}: {e}')
+            self._panels = {}
+
+        self._by_message = {record['message_id']: name for name, record in self._panels.items()}
+
+    def _load_shared(self):
+        """Загрузка из бэкенда; при первом запуске в нём записи переносятся из файла реестра"""
+        records = self.backend.items(self.KEY_PREFIX)
+        if not records and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    imported = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f'Не удалось прочитать реестр панелей {self.path}: {e}')
+                imported = {}
+            for name, record in imported.items():
+                self.backend.set(self.KEY_PREFIX + name, record)
+            records = self.backend.items(self.KEY_PREFIX)
+            logger.info(f'Реестр панелей перенесён в общий бэкенд: {len(records)} записей')
+
+        self._panels = {key[len(self.KEY_PREFIX):]: record for key, record in records}
+        self._by_message = {record['message_id']: name for name, record in self._panels.items()}
+
+    def _save(self, name):
+        """Сохранение изменённой записи: в общий бэкенд или атомарной записью файла"""
+        if self.backend is not None:
+            record = self._panels.get(name)
+            if record is None:
+                self.backend.delete(self.KEY_PREFIX + name)
+            else:
+                self.backend.set(self.KEY_PREFIX + name, record)
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._panels, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name):
+        return self._panels.get(name)
+
+    def set(self, name, channel_id, message_id, content_hash):
+        old = self._panels.get(name)
+        if old:
+            self._by_message.pop(old['message_id'], None)
+
+        self._panels[name] = {
+            'channel_id': channel_id,
+            'message_id': message_id,
+            'hash': content_hash
+        }
+        self._by_message[message_id] = name
+        self._save(name)
+
+    def forget_message(self, message_id):
+        """Удаление записи, если сообщение панели было удалено. Возвращает имя панели или None"""
+        name = self._by_message.pop(message_id, None)
+        if name is not None:
+            self._panels.pop(name, None)
+            self._save(name)
+        return name
+
+    async def ensure_panel(self, bot, name, channel, embed, view):
+        """
+        Публикация панели без лишних запросов:
+        не изменилась - не трогаем, изменилась - правим на месте, нет - публикуем
+        """
+        content_hash = panel_hash(embed, view)
+        record = self.get(name)
+
+        if record and record['channel_id'] == channel.id:
+            message_id = record['message_id']
+
+            if record['hash'] == content_hash:
+                # Содержимое актуально, но сообщение могли удалить, пока бот был выключен
+                # (событие удаления тогда не пришло) - одна проверка при настройке панели
+                try:
+                    await channel.fetch_message(message_id)
+                    exists = True
+                except discord.NotFound:
+                    exists = False
+                except discord.HTTPException as e:
+                    logger.warning(f'Не удалось проверить сообщение панели {name} ({message_id}): {e}')
+                    exists = True
+
+                if exists:
+                    # Панель актуальна - только подключаем постоянную view
+                    bot.add_view(view, message_id=message_id)
+                    logger.info(f'Панель {name} не изменилась, сообщение {message_id} оставлено')
+                    return message_id
+                logger.warning(f'Сообщение панели {name} ({message_id}) удалено, публикуем заново')
+            else:
+                try:
+                    message = channel.get_partial_message(message_id)
+                    await schedule(
+                        bot,
+                        Priority.STAFF,
+                        ('edit', channel.id),
+                        lambda: message.edit(embed=embed, view=view)
+                    )
+                    bot.add_view(view, message_id=message_id)
+                    self.set(name, channel.id, message_id, content_hash)
+                    logger.info(f'Панель {name} обновлена на месте (сообщение {message_id})')
+                    return message_id
+                except discord.NotFound:
+                    logger.warning(f'Сообщение панели {name} ({message_id}) не найдено, публикуем заново')
+        elif record:
+            # Панель переехала в другой канал - старое сообщение больше не нужно
+            old_channel = bot.get_channel(record['channel_id'])
+            if old_channel:
+                try:
+                    await old_channel.get_partial_message(record['message_id']).delete()
+                except discord.HTTPException:
+                    pass
+        else:
+            # Первый запуск с реестром: убираем панели, опубликованные прежним способом
+            async for message in channel.history(limit=10):
+                if message.author == bot.user:
+                    try:
+                        await message.delete()
+                    except discord.HTTPException:
+                        pass
+
+        message = await schedule(
+            bot,
+            Priority.STAFF,
+            ('send', channel.id),
+            lambda: channel.send(embed=embed, view=view)
+        )
+        self.set(name, channel.id, message.id, content_hash)
+        logger.info(f'Панель {name} опубликована (сообщение {message.id})')
+        return message.id
+
+def get_panel_registry(bot):
+    """Общий реестр панелей бота (создаётся при первом обращении)"""
+    registry = getattr(bot, 'panel_registry', None)
+    if registry is None:
+        registry = PanelRegistry(backend=get_state_backend(bot))
+        bot.panel_registry = registry
+    return registry
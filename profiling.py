@@ -0,0 +1,263 @@
+"""
+Профилирование обработчиков по запросу
+Администратор включает cProfile для выбранных обработчиков (события бота, отправка формы
+тикета, кнопки рассмотрения заявок) на ограниченное время без перезапуска. Обработчики
+подменяются обёртками только на время сеанса, поэтому без сеанса накладных расходов нет.
+Профиль собирается только пока выполняется код обработчика (ожидание ответа Discord и
+чужие задачи в него не попадают); результат - файл .prof и краткая сводка top-N
+"""
+
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import time
+from collections import defaultdict
+from datetime import datetime
+from metrics import Histogram
+from support_system import TicketModal
+from admin_applications import ApplicationReviewView
+from config import PROFILE_DIR, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS, PROFILE_TOP_N
+
+logger = logging.getLogger(__name__)
+
+class _ProfiledCoroutine:
+    """Выполнение корутины обработчика с профилировщиком, включённым только на время её шагов"""
+
+    __slots__ = ('coro', 'session', 'name')
+
+    def __init__(self, coro, session, name):
+        self.coro = coro
+        self.session = session
+        self.name = name
+
+    def __await__(self):
+        coro = self.coro
+        session = self.session
+        value = None
+        error = None
+        while True:
+            started = time.perf_counter()
+            session._enable()
+            try:
+                if error is None:
+                    future = coro.send(value)
+                else:
+                    future = coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                session._disable()
+                session.cpu[self.name] += time.perf_counter() - started
+            try:
+                value = yield future
+                error = None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as e:  # отмена задачи и т.п. передаются в обработчик
+                value = None
+                error = e
+
+class ProfileSession:
+    """Один сеанс профилирования: подменённые обработчики и собранная статистика"""
+
+    def __init__(self, targets, duration):
+        self.targets = targets  # имя -> (объект, атрибут)
+        self.duration = duration
+        self.started_at = time.time()
+        self.profile = cProfile.Profile()
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.cpu = defaultdict(float)  # время шагов обработчика под профилировщиком
+        self.latency = defaultdict(Histogram)  # полное время обработчика, включая ожидание
+        self.finished = False
+        self._depth = 0
+        self._patched = []  # (объект, атрибут, был ли свой атрибут, исходное значение)
+
+    def _enable(self):
+        self._depth += 1
+        if self._depth == 1 and not self.finished:
+            self.profile.enable()
+
+    def _disable(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.profile.disable()
+
+    def _wrap(self, name, func):
+        session = self
+
+        @functools.wraps(func)
+        async def profiled(*args, **kwargs):
+            if session.finished:
+                return await func(*args, **kwargs)  # обёртка осталась в уже запущенном вызове
+            started = time.perf_counter()
+            try:
+                return await _ProfiledCoroutine(func(*args, **kwargs), session, name)
+            except Exception:
+                session.errors[name] += 1
+                raise
+            finally:
+                session.calls[name] += 1
+                session.latency[name].observe(time.perf_counter() - started)
+
+        return profiled
+
+    def attach(self):
+        for name, (owner, attribute) in self.targets.items():
+            own = attribute in vars(owner)
+            original = getattr(owner, attribute)
+            self._patched.append((owner, attribute, own, vars(owner).get(attribute)))
+            setattr(owner, attribute, self._wrap(name, original))
+
+    def detach(self):
+        self.finished = True
+        for owner, attribute, own, original in reversed(self._patched):
+            if own:
+                setattr(owner, attribute, original)
+            else:
+                delattr(owner, attribute)  # атрибут был унаследован - снова берётся из базового класса
+        self._patched.clear()
+
+    def summary(self, top_n):
+        """Сводка: вызовы и время по обработчикам, затем top-N функций по суммарному времени"""
+        elapsed = time.time() - self.started_at
+        lines = [
+            f"Профиль {datetime.fromtimestamp(self.started_at):%Y-%m-%d %H:%M:%S}, {elapsed:.0f} с, "
+            f"цели: {', '.join(self.targets)}"
+        ]
+        for name in self.targets:
+            latency = self.latency[name].snapshot()
+            lines.append(
+                f"{name}: вызовов {self.calls[name]}, ошибок {self.errors[name]}, "
+                f"в коде {self.cpu[name] * 1000:.1f} мс, p50 {latency['p50'] * 1000:.2f} мс, "
+                f"p99 {latency['p99'] * 1000:.2f} мс"
+            )
+
+        try:
+            stats = pstats.Stats(self.profile)
+        except TypeError:
+            lines.append('Обработчики не вызывались')
+            return '\n'.join(lines)
+
+        for title, column in (('суммарному', 3), ('собственному', 2)):
+            lines.append('')
+            lines.append(f'Top-{top_n} по {title} времени (суммарное мс, собственное мс, вызовов, функция):')
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][column], reverse=True)[:top_n]
+            for (filename, line, function), (_, calls, tottime, cumtime, _) in rows:
+                location = f'{os.path.basename(filename)}:{line}' if line else filename
+                lines.append(f'{cumtime * 1000:9.2f} {tottime * 1000:9.2f} {calls:>7}  {location}({function})')
+        return '\n'.join(lines)
+
+class HandlerProfiler:
+    """Сеансы профилирования обработчиков бота (не больше одного одновременно)"""
+
+    def __init__(self, bot, directory=PROFILE_DIR, top_n=PROFILE_TOP_N, max_duration=PROFILE_MAX_SECONDS):
+        self.bot = bot
+        self.directory = directory
+        self.top_n = top_n
+        self.max_duration = max_duration
+        self.targets = {}  # имя -> (объект, атрибут)
+        self.session = None
+        self.last_result = None  # (путь .prof, путь сводки, текст сводки)
+        self._expiry = None
+        self._on_finish = None
+
+        self.register('on_member_join', bot, 'on_member_join')
+        self.register('on_member_remove', bot, 'on_member_remove')
+        self.register('on_message', bot, 'on_message')
+        self.register('ticket_submit', TicketModal, 'on_submit')
+        # Кнопки рассмотрения: все обратные вызовы вида проходят через _scheduled_task,
+        # поэтому подмена охватывает и уже отправленные сообщения с заявками
+        self.register('application_review', ApplicationReviewView, '_scheduled_task')
+
+    def register(self, name, owner, attribute):
+        """Обработчик, доступный для профилирования: owner.attribute - корутинная функция"""
+        self.targets[name] = (owner, attribute)
+
+    @property
+    def active(self):
+        return self.session is not None
+
+    def start(self, names, duration=PROFILE_DEFAULT_SECONDS, on_finish=None):
+        """
+        Запуск сеанса для обработчиков names на duration секунд (не больше max_duration).
+        on_finish(result) - корутина, вызываемая с результатом по окончании
+        """
+        if self.session is not None:
+            raise ValueError('Профилирование уже идёт')
+        unknown = [name for name in names if name not in self.targets]
+        if unknown or not names:
+            raise ValueError(f"Неизвестные обработчики: {', '.join(unknown) or '-'}. Доступны: {', '.join(self.targets)}")
+
+        duration = max(1.0, min(float(duration), self.max_duration))
+        session = ProfileSession({name: self.targets[name] for name in names}, duration)
+        session.attach()
+        self.session = session
+        self._on_finish = on_finish
+        self._expiry = asyncio.create_task(self._expire(duration))
+        logger.info(f"Профилирование запущено на {duration:.0f} с: {', '.join(names)}")
+        return session
+
+    async def _expire(self, duration):
+        await asyncio.sleep(duration)
+        self._expiry = None
+        await self.stop()
+
+    async def stop(self):
+        """Завершение сеанса: обработчики возвращаются, профиль и сводка пишутся на диск"""
+        session = self.session
+        if session is None:
+            return None
+        self.session = None
+        session.detach()
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+        try:
+            result = await asyncio.to_thread(self._write, session)
+        except Exception as e:
+            logger.error(f'Ошибка при сохранении профиля: {e}')
+            return None
+        self.last_result = result
+        logger.info(f'Профиль сохранён: {result[0]}')
+
+        on_finish, self._on_finish = self._on_finish, None
+        if on_finish is not None:
+            try:
+                await on_finish(result)
+            except Exception as e:
+                logger.error(f'Ошибка при отправке сводки профиля: {e}')
+        return result
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f'profile-{datetime.fromtimestamp(session.started_at):%Y%m%d-%H%M%S}')
+        summary = session.summary(self.top_n)
+        session.profile.create_stats()
+        profile_path = f'{base}.prof'
+        session.profile.dump_stats(profile_path)
+        summary_path = f'{base}.txt'
+
+        # Полная таблица pstats - в файл сводки, после краткой части
+        stream = io.StringIO()
+        if session.profile.stats:
+            pstats.Stats(session.profile, stream=stream).sort_stats('cumulative').print_stats(self.top_n * 4)
+        with open(summary_path, 'w', encoding='utf-8') as file:
+            file.write(summary)
+            file.write('\n\n')
+            file.write(stream.getvalue())
+        return profile_path, summary_path, summary
+
+def get_profiler(bot):
+    """Профилировщик обработчиков бота (создаётся при первом обращении)"""
+    profiler = getattr(bot, 'handler_profiler', None)
+    if profiler is None:
+        profiler = HandlerProfiler(bot)
+        bot.handler_profiler = profiler
+    return profiler
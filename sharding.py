@@ -0,0 +1,129 @@
+"""
+Шарды шлюза и процессы бота
+Сервер обслуживается шардом (guild_id >> 22) % shard_count. Супервизор делит шарды между
+несколькими процессами (каждый - AutoShardedBot со своими shard_ids, своим циклом событий
+и своим ядром процессора), перезапускает упавшие процессы и останавливает все по сигналу.
+Общее между процессами состояние идёт через бэкенд состояния (state_backend.py)
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from config import (
+    SHARD_RESTART_DELAY,
+    SHARD_RESTART_MAX_DELAY,
+    SHARD_STABLE_AFTER,
+    LOG_PATH,
+    METRICS_PORT
+)
+
+logger = logging.getLogger(__name__)
+
+def shard_for_guild(guild_id, shard_count):
+    """Номер шарда, через который Discord отправляет события сервера"""
+    return (guild_id >> 22) % shard_count
+
+def owns_guild(bot, guild_id):
+    """Обслуживает ли этот процесс сервер (без шардирования - все серверы)"""
+    shard_count = getattr(bot, 'shard_count', None)
+    shard_ids = getattr(bot, 'shard_ids', None)
+    if not shard_count or shard_ids is None:
+        return True
+    return shard_for_guild(guild_id, shard_count) in shard_ids
+
+def plan_workers(shard_count, processes):
+    """Шарды каждого процесса: по очереди, чтобы процессы получили поровну"""
+    processes = max(1, min(processes, shard_count))
+    return [list(range(index, shard_count, processes)) for index in range(processes)]
+
+class ShardWorker:
+    """Один процесс бота с набором шардов"""
+
+    def __init__(self, index, shard_ids):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.restart_delay = SHARD_RESTART_DELAY
+
+class ShardSupervisor:
+    """Запуск процессов бота по плану шардов, перезапуск упавших и общая остановка"""
+
+    def __init__(self, shard_count, processes, entry_point):
+        self.shard_count = shard_count
+        self.entry_point = entry_point  # скрипт, который запускается в каждом процессе
+        self.workers = [ShardWorker(index, shards) for index, shards in enumerate(plan_workers(shard_count, processes))]
+        self._stopping = asyncio.Event()
+
+    def _environment(self, worker):
+        """Окружение процесса: его шарды, общий бэкенд состояния, свои лог и порт метрик"""
+        env = dict(os.environ)
+        root, extension = os.path.splitext(LOG_PATH)
+        env.update({
+            'BOT_WORKER_ID': str(worker.index),
+            'BOT_SHARD_COUNT': str(self.shard_count),
+            'BOT_SHARD_IDS': ','.join(map(str, worker.shard_ids)),
+            'BOT_SHARD_PROCESSES': '1',
+            'BOT_LOG_PATH': f'{root}.worker{worker.index}{extension}',
+        })
+        env.setdefault('BOT_STATE_BACKEND', 'sqlite')
+        if METRICS_PORT:
+            env['BOT_METRICS_PORT'] = str(METRICS_PORT + 1 + worker.index)
+        return env
+
+    async def _spawn(self, worker):
+        worker.process = await asyncio.create_subprocess_exec(
+            sys.executable, self.entry_point, env=self._environment(worker)
+        )
+        worker.started_at = time.monotonic()
+        logger.info(f'Процесс {worker.index} запущен (PID {worker.process.pid}), шарды: {worker.shard_ids}')
+
+    async def _watch(self, worker):
+        """Ожидание завершения процесса и перезапуск с растущей паузой при частых падениях"""
+        while not self._stopping.is_set():
+            await self._spawn(worker)
+            code = await worker.process.wait()
+            if self._stopping.is_set():
+                break
+
+            if time.monotonic() - worker.started_at >= SHARD_STABLE_AFTER:
+                worker.restart_delay = SHARD_RESTART_DELAY
+            logger.error(f'Процесс {worker.index} завершился с кодом {code}, перезапуск через {worker.restart_delay:.0f} с')
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=worker.restart_delay)
+            except asyncio.TimeoutError:
+                pass
+            worker.restarts += 1
+            worker.restart_delay = min(SHARD_RESTART_MAX_DELAY, worker.restart_delay * 2)
+
+    def stop(self):
+        """Остановка: процессам отправляется SIGTERM, супервизор ждёт их завершения"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.terminate()
+
+    async def run(self):
+        """Работа до сигнала остановки (SIGINT/SIGTERM)"""
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except NotImplementedError:
+                pass  # Windows: остановка через KeyboardInterrupt
+
+        logger.info(f'Супервизор: {self.shard_count} шардов в {len(self.workers)} процессах')
+        try:
+            await asyncio.gather(*(self._watch(worker) for worker in self.workers))
+        finally:
+            self.stop()
+            for worker in self.workers:
+                if worker.process is not None:
+                    await worker.process.wait()
+        logger.info('Все процессы бота остановлены')
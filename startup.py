@@ -0,0 +1,59 @@
+"""
+Однократный запуск подсистем бота
+Независимые подсистемы настраиваются параллельно, время готовности каждой замеряется
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class StartupPipeline:
+    """Набор шагов настройки, который выполняется ровно один раз за жизнь процесса"""
+
+    def __init__(self):
+        self._steps = []
+        self._task = None
+        self.timings = {}   # имя подсистемы -> секунды до готовности
+        self.failed = {}    # имя подсистемы -> текст ошибки (шаг сообщает о сбое исключением)
+        self.total_time = None
+
+    def add(self, name, setup):
+        """Добавление шага: setup - корутина, принимающая бота"""
+        self._steps.append((name, setup))
+
+    @property
+    def completed(self):
+        return self._task is not None and self._task.done()
+
+    async def run(self, bot):
+        """Запуск всех шагов. Повторные вызовы (переподключения) ждут или сразу выходят"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_all(bot))
+        elif self._task.done():
+            logger.info('Подсистемы уже настроены, повторная настройка пропущена')
+            return
+        await asyncio.shield(self._task)
+
+    async def _run_step(self, bot, name, setup):
+        """Выполнение одного шага с замером времени"""
+        started = time.perf_counter()
+        try:
+            await setup(bot)
+        except Exception as e:
+            self.failed[name] = str(e)
+            logger.error(f'Ошибка настройки подсистемы {name}: {e}')
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    async def _run_all(self, bot):
+        """Параллельный запуск всех шагов"""
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_step(bot, name, setup) for name, setup in self._steps))
+        self.total_time = time.perf_counter() - started
+
+        summary = ', '.join(f'{name}: {seconds * 1000:.0f} мс' for name, seconds in self.timings.items())
+        logger.info(f'Подсистемы настроены за {self.total_time * 1000:.0f} мс ({summary})')
+        if self.failed:
+            logger.warning(f'Подсистемы с ошибками настройки: {", ".join(self.failed)}')
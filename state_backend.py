@@ -0,0 +1,199 @@
+"""
+Общее состояние процессов бота
+Когда шарды шлюза работают в нескольких процессах, лимиты частоты (действия пользователей,
+личные сообщения, IDENTIFY) и реестр панелей должны быть одни на всех, иначе процессы
+обходят лимиты друг друга и перезаписывают чужие записи. Бэкенд выбирается в config.py:
+local - память текущего процесса (один процесс), sqlite - общий файл SQLite, где каждая
+операция - одна короткая транзакция.
+Лимиты частоты проверяются в цикле событий, поэтому блокировку общей базы они ждут не дольше
+STATE_LOCK_TIMEOUT; если другой процесс держит её дольше, решение принимает локальный bucket
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from config import STATE_BACKEND, STATE_DB_PATH, STATE_LOCK_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+def _spend(available, tokens, rate, capacity):
+    """
+    (ожидание, остаток): 0.0 - токены забраны, иначе через сколько секунд они появятся.
+    Отрицательное tokens возвращает токены (не больше capacity)
+    """
+    if available >= tokens:
+        return 0.0, min(capacity, available - tokens)
+    return (tokens - available) / rate, available
+
+class LocalStateBackend:
+    """Состояние в памяти одного процесса"""
+
+    shared = False
+
+    def __init__(self):
+        self._buckets = {}  # имя -> (токены, время обновления)
+        self._values = {}
+
+    def take(self, name, rate, capacity, tokens=1):
+        """Забрать токены из bucket name; 0.0 - забраны, иначе через сколько секунд они появятся"""
+        now = time.time()
+        stored, updated = self._buckets.get(name, (float(capacity), now))
+        available = min(capacity, stored + max(0.0, now - updated) * rate)
+        wait, available = _spend(available, tokens, rate, capacity)
+        self._buckets[name] = (available, now)
+        return wait
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+
+    def delete(self, key):
+        self._values.pop(key, None)
+
+    def items(self, prefix):
+        """Пары (ключ, значение) с ключами, начинающимися с prefix"""
+        return [(key, value) for key, value in self._values.items() if key.startswith(prefix)]
+
+    def close(self):
+        pass
+
+class SQLiteStateBackend:
+    """Состояние в общем файле SQLite: одна база на все процессы бота"""
+
+    shared = True
+
+    # Раз в столько операций take удаляются полностью восстановившиеся bucket'ы - они равны новым
+    PURGE_EVERY = 1000
+
+    def __init__(self, path=STATE_DB_PATH, lock_timeout=STATE_LOCK_TIMEOUT):
+        self.path = path
+        self._takes = 0
+        self._fallback = LocalStateBackend()  # лимиты на время, пока база занята другим процессом
+        self.fallbacks = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Записи реестра панелей редки и могут подождать чужую транзакцию; лимиты частоты
+        # ждут блокировку не дольше lock_timeout (сами транзакции - доли миллисекунды)
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+        self._buckets_db = sqlite3.connect(self.path, isolation_level=None, timeout=lock_timeout)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL NOT NULL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def take(self, name, rate, capacity, tokens=1):
+        """
+        Забрать токены из общего bucket name; 0.0 - забраны, иначе через сколько секунд они появятся.
+        Если база занята дольше lock_timeout, решает локальный bucket процесса
+        """
+        db = self._buckets_db
+        try:
+            # BEGIN IMMEDIATE сразу берёт блокировку записи: чтение и списание не разделяются другим процессом
+            db.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            self.fallbacks += 1
+            if self.fallbacks % self.PURGE_EVERY == 1:
+                logger.warning(f'Общая база состояния занята, лимит {name} проверен локально: {e}')
+            return self._fallback.take(name, rate, capacity, tokens)
+        try:
+            now = time.time()
+            row = db.execute('SELECT tokens, updated FROM buckets WHERE name = ?', (name,)).fetchone()
+            stored, updated = row if row else (float(capacity), now)
+            available = min(capacity, stored + max(0.0, now - updated) * rate)
+            wait, available = _spend(available, tokens, rate, capacity)
+            db.execute(
+                'INSERT OR REPLACE INTO buckets (name, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                (name, available, now, now + (capacity - available) / rate)
+            )
+            self._takes += 1
+            if self._takes % self.PURGE_EVERY == 0:
+                db.execute('DELETE FROM buckets WHERE full_at <= ?', (now,))
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return wait
+
+    def get(self, key, default=None):
+        row = self._db.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        self._db.execute(
+            'INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False))
+        )
+
+    def delete(self, key):
+        self._db.execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def items(self, prefix):
+        """Пары (ключ, значение) с ключами, начинающимися с prefix (по диапазону первичного ключа)"""
+        rows = self._db.execute(
+            'SELECT key, value FROM kv WHERE key >= ? AND key < ?', (prefix, prefix + '\uffff')
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def close(self):
+        self._buckets_db.close()
+        self._db.close()
+
+class SharedTokenBucket:
+    """
+    Token bucket в бэкенде состояния с интерфейсом outbound.TokenBucket.
+    delay() возвращает ожидание, посчитанное последним try_acquire()
+    """
+
+    __slots__ = ('backend', 'name', 'rate', 'capacity', '_wait')
+
+    def __init__(self, backend, name, rate, capacity):
+        self.backend = backend
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._wait = 0.0
+
+    def try_acquire(self, now=None, tokens=1):
+        self._wait = self.backend.take(self.name, self.rate, self.capacity, tokens)
+        return self._wait == 0.0
+
+    def delay(self, now=None, tokens=1):
+        return self._wait
+
+    def refund(self, now=None, tokens=1):
+        self.backend.take(self.name, self.rate, self.capacity, -tokens)
+
+    def is_full(self, now=None):
+        return False  # состояние живёт в бэкенде, локальная запись не вытесняется
+
+# Доступные бэкенды: значение STATE_BACKEND -> класс
+BACKENDS = {
+    'local': LocalStateBackend,
+    'sqlite': SQLiteStateBackend,
+}
+
+def get_state_backend(bot):
+    """Бэкенд общего состояния бота (создаётся при первом обращении)"""
+    backend = getattr(bot, 'state_backend', None)
+    if backend is None:
+        backend_class = BACKENDS.get(STATE_BACKEND)
+        if backend_class is None:
+            raise ValueError(f"Неизвестный бэкенд состояния {STATE_BACKEND!r}, доступны: {', '.join(BACKENDS)}")
+        backend = backend_class()
+        bot.state_backend = backend
+        logger.info(f'Бэкенд общего состояния: {STATE_BACKEND}')
+    return backend
@@ -4,24 +4,42 @@
 """
 
 import discord
-from discord.ext import commands
 import asyncio
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime
-from config import (
-    SUPPORT_CHANNEL_ID,
-    SUPPORT_EMBED_COLOR,
-    SUPPORT_TITLE,
-    SUPPORT_DESCRIPTION,
-    SUPPORT_FIELDS,
-    SUPPORT_BUTTON_LABEL,
-    TICKET_CATEGORIES,
-    SUPPORT_ROLE_ID,
-    TICKETS_CATEGORY_ID
-)
+from embed_templates import guild_icon_url
+from config_store import get_config
+from sharding import owns_guild
+from outbound import Priority, schedule, post
+from panel_registry import get_panel_registry
+from ticket_categories import TicketCategoryIndex
+from timer_service import get_timer_service
+from admission import admit
+from metrics import REGISTRY
+from ticket_store import get_ticket_store, OPEN, IN_PROGRESS, CLOSED
+from config import TICKET_DELETE_DELAY
 
 logger = logging.getLogger(__name__)
 
+# Метрики тикетов
+TICKETS_CREATED = REGISTRY.counter('limonericx_tickets_created_total', 'Созданные тикеты', ('category', 'result'))
+TICKET_CREATE_SECONDS = REGISTRY.histogram('limonericx_ticket_create_seconds', 'Время создания тикета от отправки формы')
+TICKETS_CLOSED = REGISTRY.counter('limonericx_tickets_closed_total', 'Закрытые тикеты', ('reason',))
+
+# Заголовки карточки и префиксы названия канала по состоянию тикета
+TICKET_STATE_TITLES = {
+    OPEN: "Тикет поддержки",
+    IN_PROGRESS: "Тикет в работе",
+    CLOSED: "Закрытый тикет",
+}
+TICKET_CHANNEL_PREFIXES = {
+    OPEN: "тикет",
+    IN_PROGRESS: "🔧",
+    CLOSED: "🔒-закрыт",
+}
+
 class TicketModal(discord.ui.Modal, title='Создание тикета тех. поддержки'):
     def __init__(self, ticket_category):
         super().__init__()
@@ -51,34 +69,126 @@ class TicketModal(discord.ui.Modal, title='Создание тикета тех.
     )
 
     async def on_submit(self, interaction: discord.Interaction):
+        pipeline = get_ticket_pipeline(interaction.client)
+        
+        # Повторная доставка того же взаимодействия не должна создавать второй канал
+        if pipeline.is_known(interaction.id):
+            logger.info(f'Повторная отправка формы тикета {interaction.id} пропущена')
+            return
+        
+        if not await admit(
+            interaction,
+            'ticket:submit',
+            self.ticket_category['value'],
+            self.minecraft_nick.value,
+            self.problem_description.value
+        ):
+            return
+        
+        # Канал создаётся в фоне, форма подтверждается первым же шагом
+        task = pipeline.submit(
+            interaction,
+            self.ticket_category,
+            self.minecraft_nick.value,
+            self.problem_description.value,
+            self.additional_info.value
+        )
+        if task is None:
+            await interaction.response.send_message(
+                ticket_limit_message(pipeline.store, interaction.user.id),
+                ephemeral=True
+            )
+
+class TicketPipeline:
+    """
+    Создание тикетов: ответ на взаимодействие сразу, настройка канала в фоне.
+    Категория выбирается по индексу вместимости, задачи запоминаются по interaction.id
+    """
+
+    # Сколько последних взаимодействий помнить для защиты от повторов
+    MAX_REMEMBERED = 1000
+
+    def __init__(self, store):
+        self.store = store
+        self.categories = {}  # ID сервера -> индекс категорий тикетов этого сервера
+        self._jobs = OrderedDict()  # interaction.id -> задача создания тикета
+
+    def category_index(self, guild_id):
+        """Индекс категорий тикетов сервера (создаётся при первом тикете на сервере)"""
+        index = self.categories.get(guild_id)
+        if index is None:
+            index = self.categories[guild_id] = TicketCategoryIndex()
+        return index
+
+    def is_known(self, interaction_id):
+        return interaction_id in self._jobs
+
+    def submit(self, interaction, ticket_category, minecraft_nick, description, additional_info):
+        """
+        Запуск создания тикета в фоне (повторный вызов с тем же interaction.id вернёт ту же задачу).
+        Возвращает None, если у пользователя уже максимум открытых тикетов
+        """
+        task = self._jobs.get(interaction.id)
+        if task is not None:
+            return task
+        
+        # Место в лимите пользователя занимается до создания канала
+        record = self.store.create(
+            interaction.id,
+            interaction.user.id,
+            interaction.user.name,
+            minecraft_nick,
+            ticket_category['value']
+        )
+        if record is None:
+            return None
+        
+        task = asyncio.create_task(
+            self._create_ticket(interaction, record, ticket_category, description, additional_info)
+        )
+        self._jobs[interaction.id] = task
+        
+        # Старые завершённые задачи забываем, чтобы память не росла
+        while len(self._jobs) > self.MAX_REMEMBERED:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done():
+                break
+            del self._jobs[oldest_id]
+        return task
+
+    async def _create_channel(self, guild, support_role, name, overwrites, topic):
+        """Создание канала тикета в категории со свободным местом"""
+        categories = self.category_index(guild.id)
+        for attempt in range(2):
+            category = await categories.acquire(guild, support_role)
+            try:
+                return await guild.create_text_channel(name, category=category, overwrites=overwrites, topic=topic)
+            except discord.HTTPException as e:
+                if attempt == 0 and e.code == 50035 and 'parent_id' in e.text:
+                    # Категорию заполнили в обход бота - пробуем следующую
+                    logger.warning(f'Категория тикетов {category.name} заполнена, выбираем другую')
+                    categories.mark_full(category.id)
+                    continue
+                categories.cancel(category.id)
+                raise
+
+    async def _create_ticket(self, interaction, record, ticket_category, description, additional_info):
+        """Создание канала тикета, отправка карточки тикета и ответ пользователю"""
+        started = time.perf_counter()
+        
+        # Подтверждаем форму сразу, чтобы уложиться в 3 секунды
         try:
-            # Создаем или находим категорию для тикетов
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        except discord.HTTPException as e:
+            logger.error(f'Не удалось подтвердить форму тикета {interaction.id}: {e}')
+        
+        try:
+            support = get_config(interaction.client).snapshot.guild(interaction.guild_id)['support']
             guild = interaction.guild
-            support_role = guild.get_role(SUPPORT_ROLE_ID)
-            
-            tickets_category = None
-            for category in guild.categories:
-                if category.name == "🎫 Тикеты поддержки":
-                    tickets_category = category
-                    break
-            
-            if not tickets_category:
-                # Создаем категорию для тикетов
-                tickets_category = await guild.create_category(
-                    "🎫 Тикеты поддержки",
-                    overwrites={
-                        guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                        support_role: discord.PermissionOverwrite(
-                            view_channel=True,
-                            send_messages=True,
-                            read_message_history=True,
-                            manage_messages=True
-                        )
-                    }
-                )
+            support_role = guild.get_role(support['role_id'])
             
             # Создаем приватный канал для тикета
-            ticket_name = f"тикет-{interaction.user.name}-{interaction.id}"[:50]
+            ticket_name = ticket_channel_name(record)
             
             overwrites = {
                 guild.default_role: discord.PermissionOverwrite(view_channel=False),
@@ -87,27 +197,29 @@ class TicketModal(discord.ui.Modal, title='Создание тикета тех.
                     send_messages=True,
                     read_message_history=True,
                     attach_files=True
-                ),
-                support_role: discord.PermissionOverwrite(
+                )
+            }
+            if support_role:
+                overwrites[support_role] = discord.PermissionOverwrite(
                     view_channel=True,
                     send_messages=True,
                     read_message_history=True,
                     manage_messages=True,
                     manage_channels=True
                 )
-            }
             
-            ticket_channel = await guild.create_text_channel(
+            ticket_channel = await self._create_channel(
+                guild,
+                support_role,
                 ticket_name,
-                category=tickets_category,
-                overwrites=overwrites,
-                topic=f"Тикет поддержки от {interaction.user.name} | Minecraft: {self.minecraft_nick.value}"
+                overwrites,
+                f"Тикет поддержки от {interaction.user.name} | Minecraft: {record.minecraft_nick}"
             )
             
             # Создаем embed для тикета в приватном канале
             embed = discord.Embed(
-                title=f"🎫 Тикет поддержки: {self.ticket_category['label']}",
-                color=SUPPORT_EMBED_COLOR,
+                title=ticket_title(record, support['categories']),
+                color=support['color'],
                 timestamp=datetime.now()
             )
             
@@ -119,26 +231,26 @@ class TicketModal(discord.ui.Modal, title='Создание тикета тех.
             
             embed.add_field(
                 name="🎮 Ник в Minecraft",
-                value=f"`{self.minecraft_nick.value}`",
+                value=f"`{record.minecraft_nick}`",
                 inline=True
             )
             
             embed.add_field(
                 name="📂 Категория",
-                value=f"{self.ticket_category['emoji']} {self.ticket_category['label']}",
+                value=f"{ticket_category['emoji']} {ticket_category['label']}",
                 inline=True
             )
             
             embed.add_field(
                 name="📝 Описание проблемы",
-                value=self.problem_description.value,
+                value=description,
                 inline=False
             )
             
-            if self.additional_info.value:
+            if additional_info:
                 embed.add_field(
                     name="ℹ️ Дополнительная информация",
-                    value=self.additional_info.value,
+                    value=additional_info,
                     inline=False
                 )
             
@@ -147,46 +259,131 @@ class TicketModal(discord.ui.Modal, title='Создание тикета тех.
                 icon_url=interaction.user.display_avatar.url
             )
             
-            # Создаем кнопки для управления тикетом
-            view = TicketControlView(ticket_channel)
+            self.store.attach_channel(interaction.id, ticket_channel.id)
+            
+            # Кнопки управления тикетом постоянные: тикет определяется по каналу
+            view = TicketControlView()
             
             # Отправляем тикет в приватный канал
-            await ticket_channel.send(
-                f"Добро пожаловать, {interaction.user.mention}! {support_role.mention if support_role else '@Поддержка'} поможет вам с проблемой.",
-                embed=embed,
-                view=view
+            await schedule(
+                interaction.client,
+                Priority.STAFF,
+                ('send', ticket_channel.id),
+                lambda: ticket_channel.send(
+                    f"Добро пожаловать, {interaction.user.mention}! {support_role.mention if support_role else '@Поддержка'} поможет вам с проблемой.",
+                    embed=embed,
+                    view=view
+                )
             )
             
-            # Отвечаем пользователю
+            # Отвечаем пользователю (заменяет индикатор "думает...")
             success_embed = discord.Embed(
                 title="✅ Тикет создан успешно!",
                 description=f"Ваш приватный тикет создан: {ticket_channel.mention}\n\nМодераторы уже уведомлены и ответят в ближайшее время.",
                 color=0x00ff00
             )
-            await interaction.response.send_message(embed=success_embed, ephemeral=True)
+            await interaction.followup.send(embed=success_embed, ephemeral=True)
             
-            logger.info(f'Создан приватный тикет от {interaction.user.name} (Minecraft: {self.minecraft_nick.value}) в канале {ticket_channel.name}')
+            TICKETS_CREATED.labels(record.category, 'created').inc()
+            TICKET_CREATE_SECONDS.observe(time.perf_counter() - started)
+            logger.info(f'Создан приватный тикет от {interaction.user.name} (Minecraft: {record.minecraft_nick}) в канале {ticket_channel.name}')
+            return ticket_channel
                 
         except Exception as e:
+            TICKETS_CREATED.labels(record.category, 'failed').inc()
             logger.error(f'Ошибка при создании тикета: {e}')
-            await interaction.response.send_message("❌ Произошла ошибка при создании тикета. Попробуйте позже.", ephemeral=True)
+            if record.channel_id is None:
+                # Канал не создан - тикет не должен занимать лимит пользователя
+                self.store.discard(record.ticket_id)
+            try:
+                await interaction.followup.send("❌ Произошла ошибка при создании тикета. Попробуйте позже.", ephemeral=True)
+            except discord.HTTPException:
+                pass
+
+    async def channel_deleted(self, channel):
+        """Канал удалён: освобождается место в категории, активный тикет закрывается"""
+        record = self.store.channel_deleted(channel.id)
+        if record is not None:
+            TICKETS_CLOSED.labels('channel_deleted').inc()
+            logger.info(f'Канал тикета {record.ticket_id} удалён, тикет закрыт')
+        categories = self.categories.get(channel.guild.id)
+        if categories is not None:
+            await categories.channel_deleted(channel)
+
+def get_ticket_pipeline(bot):
+    """Общий конвейер создания тикетов бота (создаётся при первом обращении)"""
+    pipeline = getattr(bot, 'ticket_pipeline', None)
+    if pipeline is None:
+        pipeline = TicketPipeline(get_ticket_store(bot))
+        bot.ticket_pipeline = pipeline
+    return pipeline
+
+def ticket_limit_message(store, user_id):
+    """Сообщение пользователю, у которого уже максимум открытых тикетов"""
+    channels = ', '.join(
+        f'<#{record.channel_id}>' for record in store.open_for_user(user_id) if record.channel_id
+    )
+    return (
+        f"❌ У вас уже есть открытые тикеты ({store.max_open_per_user} максимум): {channels or 'создаются'}.\n"
+        "Дождитесь ответа в них или попросите модераторов закрыть старый тикет."
+    )
+
+def ticket_title(record, categories):
+    """Заголовок карточки тикета по его состоянию в хранилище"""
+    category = next((cat for cat in categories if cat["value"] == record.category), None)
+    label = category['label'] if category else record.category
+    return f"🎫 {TICKET_STATE_TITLES[record.state]}: {label}"
+
+def ticket_channel_name(record):
+    """Название канала тикета по его состоянию в хранилище"""
+    return f"{TICKET_CHANNEL_PREFIXES[record.state]}-{record.author_name}-{record.ticket_id}"[:50]
 
 class TicketControlView(discord.ui.View):
-    def __init__(self, ticket_channel):
+    """
+    Кнопки управления тикетом. View постоянная и общая для всех тикетов:
+    тикет определяется по каналу, состояние берётся из хранилища
+    """
+    
+    def __init__(self, state=OPEN):
         super().__init__(timeout=None)
-        self.ticket_channel = ticket_channel
+        self.take_ticket.disabled = state != OPEN
+        self.close_ticket.disabled = state == CLOSED
     
-    @discord.ui.button(label='✅ Взять в работу', style=discord.ButtonStyle.green)
-    async def take_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Проверяем права пользователя
-        support_role = interaction.guild.get_role(SUPPORT_ROLE_ID)
+    async def _resolve(self, interaction):
+        """Проверка прав и поиск тикета канала: (конфигурация сервера, тикет); None - ответ уже отправлен"""
+        config = get_config(interaction.client).snapshot.guild(interaction.guild_id)
+        if config is None:
+            await interaction.response.send_message("❌ Поддержка на этом сервере не настроена.", ephemeral=True)
+            return None
+        
+        support_role = interaction.guild.get_role(config['support']['role_id'])
         if support_role not in interaction.user.roles:
             await interaction.response.send_message("❌ У вас нет прав для управления тикетами!", ephemeral=True)
+            return None
+        
+        if not await admit(interaction, 'ticket:manage'):
+            return None
+        
+        record = get_ticket_store(interaction.client).by_channel(interaction.channel_id)
+        if record is None:
+            await interaction.response.send_message("❌ Тикет не найден или уже закрыт.", ephemeral=True)
+            return None
+        return config, record
+    
+    @discord.ui.button(label='✅ Взять в работу', style=discord.ButtonStyle.green, custom_id="ticket:take")
+    async def take_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        resolved = await self._resolve(interaction)
+        if resolved is None:
+            return
+        config, record = resolved
+        
+        if get_ticket_store(interaction.client).assign(record.ticket_id, interaction.user.id) is None:
+            await interaction.response.send_message("❌ Тикет уже взят в работу.", ephemeral=True)
             return
         
         embed = interaction.message.embeds[0]
         embed.color = 0xffaa00  # Оранжевый - в работе
-        embed.title = embed.title.replace("Тикет поддержки", "Тикет в работе")
+        embed.title = ticket_title(record, config['support']['categories'])
         
         embed.add_field(
             name="👨‍💻 Взял в работу",
@@ -194,26 +391,34 @@ class TicketControlView(discord.ui.View):
             inline=True
         )
         
-        button.disabled = True
-        await interaction.response.edit_message(embed=embed, view=self)
+        await interaction.response.edit_message(embed=embed, view=TicketControlView(record.state))
         
-        # Обновляем название канала
-        new_name = f"🔧-{self.ticket_channel.name[6:]}"  # Убираем "тикет-" и добавляем эмодзи
-        await self.ticket_channel.edit(name=new_name)
+        # Обновляем название канала. Переименования ограничены 2 за 10 минут, поэтому кнопка
+        # их не ждёт, а ожидающие в очереди правки канала объединяются до последней
+        channel = interaction.channel
+        new_name = ticket_channel_name(record)
+        post(
+            interaction.client,
+            Priority.STAFF,
+            ('channel_edit', channel.id),
+            lambda: channel.edit(name=new_name),
+            key=('channel_edit', channel.id)
+        )
         
-        logger.info(f'Тикет взят в работу пользователем {interaction.user.name}')
+        logger.info(f'Тикет {record.ticket_id} взят в работу пользователем {interaction.user.name}')
     
-    @discord.ui.button(label='🔒 Закрыть тикет', style=discord.ButtonStyle.red)
+    @discord.ui.button(label='🔒 Закрыть тикет', style=discord.ButtonStyle.red, custom_id="ticket:close")
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Проверяем права пользователя
-        support_role = interaction.guild.get_role(SUPPORT_ROLE_ID)
-        if support_role not in interaction.user.roles:
-            await interaction.response.send_message("❌ У вас нет прав для управления тикетами!", ephemeral=True)
+        resolved = await self._resolve(interaction)
+        if resolved is None:
             return
+        config, record = resolved
+        
+        get_ticket_store(interaction.client).close(record.ticket_id, interaction.user.id)
         
         embed = interaction.message.embeds[0]
         embed.color = 0x808080  # Серый - закрыт
-        embed.title = embed.title.replace("Тикет поддержки", "Закрытый тикет").replace("Тикет в работе", "Закрытый тикет")
+        embed.title = ticket_title(record, config['support']['categories'])
         
         embed.add_field(
             name="🔒 Закрыл тикет",
@@ -221,121 +426,159 @@ class TicketControlView(discord.ui.View):
             inline=True
         )
         
-        # Отключаем все кнопки
-        for item in self.children:
-            if hasattr(item, 'disabled'):
-                item.disabled = True
-        
-        await interaction.response.edit_message(embed=embed, view=self)
+        # Все кнопки отключены
+        await interaction.response.edit_message(embed=embed, view=TicketControlView(record.state))
         
         # Обновляем название канала на закрытый
-        new_name = f"🔒-закрыт-{self.ticket_channel.name.split('-', 1)[1] if '-' in self.ticket_channel.name else 'тикет'}"
-        await self.ticket_channel.edit(name=new_name)
+        channel = interaction.channel
+        new_name = ticket_channel_name(record)
         
         # Убираем доступ автора тикета к каналу
-        overwrites = self.ticket_channel.overwrites
+        overwrites = channel.overwrites
         for target, overwrite in overwrites.items():
             if isinstance(target, discord.Member) and target != interaction.guild.me:
                 overwrite.view_channel = False
                 overwrites[target] = overwrite
         
-        await self.ticket_channel.edit(overwrites=overwrites)
+        # Название и права обновляются одним запросом, который заменяет ещё не выполненное
+        # переименование из "Взять в работу"
+        post(
+            interaction.client,
+            Priority.STAFF,
+            ('channel_edit', channel.id),
+            lambda: channel.edit(name=new_name, overwrites=overwrites),
+            key=('channel_edit', channel.id)
+        )
         
         # Отправляем сообщение о закрытии
-        await self.ticket_channel.send(
-            "🔒 **Тикет закрыт**\n"
-            f"Закрыл: {interaction.user.mention}\n"
-            "Канал будет удален через 24 часа."
+        await schedule(
+            interaction.client,
+            Priority.STAFF,
+            ('send', channel.id),
+            lambda: channel.send(
+                "🔒 **Тикет закрыт**\n"
+                f"Закрыл: {interaction.user.mention}\n"
+                "Канал будет удален через 24 часа."
+            )
         )
         
-        logger.info(f'Тикет закрыт пользователем {interaction.user.name}, канал: {self.ticket_channel.name}')
+        # Удаление канала через 24 часа планируется в постоянном таймере (переживает перезапуск)
+        get_timer_service(interaction.client).schedule(
+            'delete_channel',
+            time.time() + TICKET_DELETE_DELAY,
+            {'channel_id': channel.id, 'reason': "Тикет закрыт более 24 часов назад"},
+            key=f'delete_channel:{channel.id}',
+            guild_id=interaction.guild_id
+        )
         
-        # Планируем удаление канала через 24 часа
-        await asyncio.sleep(86400)  # 24 часа
-        try:
-            await self.ticket_channel.delete(reason="Тикет закрыт более 24 часов назад")
-            logger.info(f'Канал тикета {self.ticket_channel.name} удален автоматически')
-        except:
-            pass  # Канал уже мог быть удален вручную
+        TICKETS_CLOSED.labels('staff').inc()
+        logger.info(f'Тикет {record.ticket_id} закрыт пользователем {interaction.user.name}, канал: {channel.name}')
+
+async def delete_ticket_channel(bot, payload):
+    """Отложенное действие таймера: удаление канала закрытого тикета"""
+    channel = bot.get_channel(payload['channel_id'])
+    if channel is None:
+        return  # Канал уже мог быть удален вручную
+    
+    try:
+        await schedule(
+            bot,
+            Priority.STAFF,
+            ('channel_delete', channel.guild.id),
+            lambda: channel.delete(reason=payload.get('reason'))
+        )
+        logger.info(f'Канал тикета {channel.name} удален автоматически')
+    except discord.NotFound:
+        pass
 
 class CategorySelectView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, categories):
         super().__init__(timeout=300)
-        
-    @discord.ui.select(
-        placeholder="Выберите категорию проблемы...",
-        options=[
+        # Категории берутся из снимка конфигурации на момент открытия списка
+        self.categories = categories
+        self.select_category.options = [
             discord.SelectOption(
                 label=cat["label"],
                 value=cat["value"],
                 emoji=cat["emoji"]
-            ) for cat in TICKET_CATEGORIES
+            ) for cat in categories
         ]
-    )
+        
+    @discord.ui.select(placeholder="Выберите категорию проблемы...")
     async def select_category(self, interaction: discord.Interaction, select: discord.ui.Select):
-        selected_category = next(cat for cat in TICKET_CATEGORIES if cat["value"] == select.values[0])
+        if not await admit(interaction, 'ticket:open'):
+            return
+        
+        selected_category = next(cat for cat in self.categories if cat["value"] == select.values[0])
         modal = TicketModal(selected_category)
         await interaction.response.send_modal(modal)
 
 class SupportTicketView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, label=None):
         super().__init__(timeout=None)
+        # Для обработки нажатий важен только custom_id, подпись нужна при публикации панели
+        if label is not None:
+            self.create_ticket.label = label
     
-    @discord.ui.button(label=SUPPORT_BUTTON_LABEL, style=discord.ButtonStyle.primary, emoji="🎫")
+    @discord.ui.button(label='🎫 Создать тикет', style=discord.ButtonStyle.primary, emoji="🎫", custom_id="support:create_ticket")
     async def create_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = CategorySelectView()
+        if not await admit(interaction, 'ticket:open'):
+            return
+        
+        store = get_ticket_store(interaction.client)
+        if not store.can_open(interaction.user.id):
+            await interaction.response.send_message(ticket_limit_message(store, interaction.user.id), ephemeral=True)
+            return
+        
+        config = get_config(interaction.client).snapshot.guild(interaction.guild_id)
+        if config is None:
+            await interaction.response.send_message("❌ Поддержка на этом сервере не настроена.", ephemeral=True)
+            return
+        
+        support = config['support']
+        view = CategorySelectView(support['categories'])
         
         embed = discord.Embed(
             title="📋 Выбор категории тикета",
             description="Пожалуйста, выберите категорию, которая лучше всего описывает вашу проблему:",
-            color=SUPPORT_EMBED_COLOR
+            color=support['color']
         )
         
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
-async def setup_support_system(bot):
-    """Настройка системы поддержки"""
-    try:
-        support_channel = bot.get_channel(SUPPORT_CHANNEL_ID)
-        if not support_channel:
-            logger.error(f'Канал поддержки не найден: {SUPPORT_CHANNEL_ID}')
-            return
-        
-        # Создаем красивое сообщение с информацией о поддержке
-        embed = discord.Embed(
-            title=SUPPORT_TITLE,
-            description=SUPPORT_DESCRIPTION,
-            color=SUPPORT_EMBED_COLOR
-        )
-        
-        # Добавляем поля с информацией
-        for field in SUPPORT_FIELDS:
-            embed.add_field(
-                name=field["name"],
-                value=field["value"],
-                inline=field["inline"]
+async def setup_support_system(bot, guild_ids=None):
+    """
+    Настройка системы поддержки на серверах guild_ids (None - на всех настроенных).
+    Ошибка на одном сервере не мешает остальным; если такие были, в конце выбрасывается RuntimeError
+    """
+    snapshot = get_config(bot).snapshot
+    failed = []
+    for guild_id in (snapshot.guilds if guild_ids is None else guild_ids):
+        config = snapshot.guild(guild_id)
+        if config is None or config['support']['channel_id'] is None or not owns_guild(bot, guild_id):
+            continue  # сервер убран из конфигурации, поддержка на нём не включена или его обслуживает другой процесс
+        try:
+            support_channel = bot.get_channel(config['support']['channel_id'])
+            if not support_channel:
+                logger.error(f"Канал поддержки не найден: {config['support']['channel_id']}")
+                failed.append(guild_id)
+                continue
+            
+            # Создаем красивое сообщение с информацией о поддержке
+            embed = config.templates['support'].render(
+                footer_icon_url=guild_icon_url(support_channel.guild)
             )
-        
-        embed.set_footer(
-            text="Команда поддержки Limonericx • Мы всегда готовы помочь!",
-            icon_url=support_channel.guild.icon.url if support_channel.guild.icon else None
-        )
-        
-        # Создаем кнопку для создания тикета
-        view = SupportTicketView()
-        
-        # Очищаем канал от старых сообщений бота (опционально)
-        async for message in support_channel.history(limit=10):
-            if message.author == bot.user:
-                try:
-                    await message.delete()
-                except:
-                    pass
-        
-        # Отправляем новое сообщение с системой тикетов
-        await support_channel.send(embed=embed, view=view)
-        
-        logger.info(f'Система поддержки настроена в канале: {support_channel.name}')
-        
-    except Exception as e:
-        logger.error(f'Ошибка настройки системы поддержки: {e}')
\ No newline at end of file
+            
+            # Создаем кнопку для создания тикета
+            view = SupportTicketView(config['support']['button_label'])
+            
+            # Публикуем панель или обновляем существующую на месте
+            await get_panel_registry(bot).ensure_panel(bot, config.panel_name('support'), support_channel, embed, view)
+            
+            logger.info(f'Система поддержки настроена в канале: {support_channel.name}')
+            
+        except Exception as e:
+            logger.error(f'Ошибка настройки системы поддержки на сервере {guild_id}: {e}')
+            failed.append(guild_id)
+    if failed:
+        raise RuntimeError(f'поддержка не настроена на серверах: {", ".join(map(str, failed))}')
\ No newline at end of file
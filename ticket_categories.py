@@ -0,0 +1,174 @@
+"""
+Индекс вместимости категорий тикетов
+Discord ограничивает категорию 50 каналами, поэтому тикеты распределяются по основной
+категории и дополнительным ("🎫 Тикеты поддержки 2", "... 3"), которые создаются при
+заполнении и удаляются, когда опустеют
+"""
+
+import asyncio
+import logging
+import discord
+from config import TICKETS_CATEGORY_ID, TICKET_CATEGORY_NAME, TICKET_CATEGORY_CHANNEL_LIMIT
+
+logger = logging.getLogger(__name__)
+
+class TicketCategoryIndex:
+    """
+    Счётчики каналов по категориям тикетов и множество категорий со свободными местами.
+    Место резервируется до создания канала, поэтому одновременные тикеты не переполняют категорию
+    """
+
+    def __init__(self, base_name=TICKET_CATEGORY_NAME, limit=TICKET_CATEGORY_CHANNEL_LIMIT,
+                 primary_id=TICKETS_CATEGORY_ID):
+        self.base_name = base_name
+        self.limit = limit
+        self.primary_id = primary_id
+        self._counts = {}       # ID категории -> занятых мест
+        self._shards = {}       # ID категории -> номер (1 - основная)
+        self._available = {}    # ID категорий со свободными местами (dict как упорядоченное множество)
+        self._lock = asyncio.Lock()
+        self._loaded_guild = None
+
+    def shard_number(self, name):
+        """Номер категории по её имени или None, если это не категория тикетов"""
+        if name == self.base_name:
+            return 1
+        prefix = f'{self.base_name} '
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            return int(name[len(prefix):])
+        return None
+
+    def _track(self, category_id, shard, count):
+        self._counts[category_id] = count
+        self._shards[category_id] = shard
+        if count < self.limit:
+            self._available[category_id] = None
+        else:
+            self._available.pop(category_id, None)
+
+    def _untrack(self, category_id):
+        self._counts.pop(category_id, None)
+        self._shards.pop(category_id, None)
+        self._available.pop(category_id, None)
+
+    def load(self, guild):
+        """Однократный подсчёт каналов в существующих категориях тикетов"""
+        self._counts.clear()
+        self._shards.clear()
+        self._available.clear()
+
+        for category in guild.categories:
+            shard = 1 if category.id == self.primary_id else self.shard_number(category.name)
+            if shard is not None:
+                self._track(category.id, shard, len(category.channels))
+
+        self._loaded_guild = guild.id
+        logger.info(f'Индекс категорий тикетов: {len(self._counts)} категорий, '
+                    f'{sum(self._counts.values())} каналов')
+
+    def _reserve(self, guild):
+        """Резервирование места в первой категории со свободными местами"""
+        for category_id in self._available:
+            category = guild.get_channel(category_id)
+            if not isinstance(category, discord.CategoryChannel):
+                # Категорию удалили вручную
+                self._untrack(category_id)
+                return self._reserve(guild)
+
+            self._counts[category_id] += 1
+            if self._counts[category_id] >= self.limit:
+                del self._available[category_id]
+            return category
+        return None
+
+    async def acquire(self, guild, support_role):
+        """Категория с зарезервированным местом под новый канал тикета"""
+        if self._loaded_guild != guild.id:
+            self.load(guild)
+
+        category = self._reserve(guild)
+        if category is not None:
+            return category
+
+        # Свободных мест нет - создаём следующую категорию (одну на всех ожидающих)
+        async with self._lock:
+            category = self._reserve(guild)
+            if category is not None:
+                return category
+
+            category = await self._create_category(guild, support_role)
+            self._track(category.id, self._shards[category.id], 1)
+            return category
+
+    async def _create_category(self, guild, support_role):
+        used = set(self._shards.values())
+        shard = 1
+        while shard in used:
+            shard += 1
+        name = self.base_name if shard == 1 else f'{self.base_name} {shard}'
+
+        overwrites = {guild.default_role: discord.PermissionOverwrite(view_channel=False)}
+        if support_role:
+            overwrites[support_role] = discord.PermissionOverwrite(
+                view_channel=True,
+                send_messages=True,
+                read_message_history=True,
+                manage_messages=True
+            )
+
+        category = await guild.create_category(name, overwrites=overwrites)
+        self._shards[category.id] = shard
+        if shard == 1:
+            self.primary_id = category.id
+        logger.info(f'Создана категория тикетов: {category.name} ({category.id})')
+        return category
+
+    def cancel(self, category_id):
+        """Возврат зарезервированного места, если канал создать не удалось"""
+        if category_id in self._counts:
+            self._counts[category_id] = max(0, self._counts[category_id] - 1)
+            self._available[category_id] = None
+
+    def mark_full(self, category_id):
+        """
+        Discord отказал в создании канала (категорию заполнили в обход бота):
+        место возвращается, категория выводится из выбора до освобождения канала
+        """
+        if category_id in self._counts:
+            self._counts[category_id] = max(0, self._counts[category_id] - 1)
+            self._available.pop(category_id, None)
+
+    async def channel_deleted(self, channel):
+        """Канал удалён: место освобождается, пустая дополнительная категория удаляется"""
+        if isinstance(channel, discord.CategoryChannel):
+            # Категорию удалили вручную
+            self._untrack(channel.id)
+            return
+
+        category_id = channel.category_id
+        if category_id not in self._counts:
+            return
+
+        self._counts[category_id] = max(0, self._counts[category_id] - 1)
+        self._available[category_id] = None
+
+        if self._counts[category_id] > 0 or self._shards[category_id] == 1:
+            return
+
+        # Убираем из индекса до удаления, чтобы туда не попали новые тикеты
+        self._untrack(category_id)
+        category = channel.guild.get_channel(category_id)
+        if category is None:
+            return
+        try:
+            await category.delete(reason='Пустая дополнительная категория тикетов')
+            logger.info(f'Удалена пустая категория тикетов: {category.name}')
+        except discord.HTTPException as e:
+            logger.error(f'Не удалось удалить категорию тикетов {category.name}: {e}')
+
+    def stats(self):
+        return {
+            'categories': len(self._counts),
+            'channels': sum(self._counts.values()),
+            'available': len(self._available),
+        }
@@ -0,0 +1,314 @@
+"""
+Хранилище тикетов поддержки
+Состояние тикета (автор, ник, категория, исполнитель, время) хранится в SQLite,
+а не в embed и названии канала. Активные тикеты держатся в памяти с индексами
+по пользователю, состоянию, категории и каналу - проверки выполняются за O(1).
+Если базу делят несколько процессов бота (шарды), лимит пользователя и счётчики
+берутся из базы: тикеты других процессов в памяти этого процесса не видны
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from state_backend import get_state_backend
+from config import TICKETS_DB_PATH, MAX_OPEN_TICKETS_PER_USER, TICKET_RESERVATION_GRACE
+
+logger = logging.getLogger(__name__)
+
+# Состояния тикета
+OPEN = 'open'
+IN_PROGRESS = 'in_progress'
+CLOSED = 'closed'
+ACTIVE_STATES = (OPEN, IN_PROGRESS)
+
+class TicketRecord:
+    """Одна запись о тикете"""
+
+    __slots__ = (
+        'ticket_id', 'channel_id', 'author_id', 'author_name', 'minecraft_nick', 'category',
+        'state', 'assignee_id', 'created_at', 'taken_at', 'closed_at', 'closed_by'
+    )
+
+    def __init__(self, ticket_id, channel_id, author_id, author_name, minecraft_nick, category,
+                 state=OPEN, assignee_id=None, created_at=None, taken_at=None, closed_at=None, closed_by=None):
+        self.ticket_id = ticket_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.minecraft_nick = minecraft_nick
+        self.category = category
+        self.state = state
+        self.assignee_id = assignee_id
+        self.created_at = time.time() if created_at is None else created_at
+        self.taken_at = taken_at
+        self.closed_at = closed_at
+        self.closed_by = closed_by
+
+    @property
+    def is_active(self):
+        return self.state in ACTIVE_STATES
+
+    def as_row(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+class TicketStore:
+    """Тикеты в SQLite плюс индексы активных тикетов в памяти"""
+
+    def __init__(self, path=TICKETS_DB_PATH, max_open_per_user=MAX_OPEN_TICKETS_PER_USER, shared=False,
+                 reservation_grace=TICKET_RESERVATION_GRACE):
+        self.path = path
+        self.max_open_per_user = max_open_per_user
+        self.reservation_grace = reservation_grace
+        self.shared = shared  # база общая с другими процессами
+
+        # Индексы активных тикетов
+        self._active = {}                           # ID тикета -> запись
+        self._by_user = defaultdict(set)            # ID автора -> ID тикетов
+        self._by_state = {state: set() for state in ACTIVE_STATES}
+        self._by_category = defaultdict(set)        # категория -> ID тикетов
+        self._by_channel = {}                       # ID канала -> ID тикета
+        self._closed_count = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id INTEGER PRIMARY KEY,
+                channel_id INTEGER,
+                author_id INTEGER NOT NULL,
+                author_name TEXT NOT NULL,
+                minecraft_nick TEXT NOT NULL,
+                category TEXT NOT NULL,
+                state TEXT NOT NULL,
+                assignee_id INTEGER,
+                created_at REAL NOT NULL,
+                taken_at REAL,
+                closed_at REAL,
+                closed_by INTEGER
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tickets_author ON tickets (author_id, created_at)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tickets_state ON tickets (state)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tickets_category ON tickets (category, state)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tickets_channel ON tickets (channel_id)')
+        self._load()
+
+    def _load(self):
+        """Загрузка активных тикетов в память; закрытые остаются только на диске"""
+        reaped = self._reap_reservations()
+        if reaped:
+            logger.warning(f'Удалено тикетов без канала (создание прервано): {reaped}')
+
+        columns = ', '.join(TicketRecord.__slots__)
+        placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+        rows = self._db.execute(
+            f'SELECT {columns} FROM tickets WHERE state IN ({placeholders})', ACTIVE_STATES
+        ).fetchall()
+        for row in rows:
+            self._index(TicketRecord(*row))
+
+        self._closed_count = self._db.execute(
+            'SELECT COUNT(*) FROM tickets WHERE state = ?', (CLOSED,)
+        ).fetchone()[0]
+        logger.info(f'Хранилище тикетов: активных {len(self._active)}, закрытых {self._closed_count}')
+
+    def _reap_reservations(self, author_id=None):
+        """
+        Удаление тикетов, канал которых так и не был создан (процесс упал между create и
+        attach_channel): иначе они навсегда занимают место в лимите пользователя.
+        Возвращает количество удалённых записей
+        """
+        placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+        conditions = f'channel_id IS NULL AND state IN ({placeholders}) AND created_at < ?'
+        params = [*ACTIVE_STATES, time.time() - self.reservation_grace]
+        if author_id is not None:
+            conditions += ' AND author_id = ?'
+            params.append(author_id)
+        return self._db.execute(f'DELETE FROM tickets WHERE {conditions}', params).rowcount
+
+    def _index(self, record):
+        self._active[record.ticket_id] = record
+        self._by_user[record.author_id].add(record.ticket_id)
+        self._by_state[record.state].add(record.ticket_id)
+        self._by_category[record.category].add(record.ticket_id)
+        if record.channel_id is not None:
+            self._by_channel[record.channel_id] = record.ticket_id
+
+    def _unindex(self, record):
+        self._active.pop(record.ticket_id, None)
+        self._by_state[record.state].discard(record.ticket_id)
+        for index, key in ((self._by_user, record.author_id), (self._by_category, record.category)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(record.ticket_id)
+                if not ids:
+                    del index[key]
+        if record.channel_id is not None:
+            self._by_channel.pop(record.channel_id, None)
+
+    def _save(self, record):
+        columns = ', '.join(TicketRecord.__slots__)
+        placeholders = ', '.join('?' for _ in TicketRecord.__slots__)
+        self._db.execute(f'INSERT OR REPLACE INTO tickets ({columns}) VALUES ({placeholders})', record.as_row())
+
+    # ------------------------------------------------------------------
+    # Запросы
+
+    def get(self, ticket_id):
+        """Активный тикет по ID"""
+        return self._active.get(ticket_id)
+
+    def by_channel(self, channel_id):
+        """Активный тикет по ID его канала"""
+        ticket_id = self._by_channel.get(channel_id)
+        return self._active.get(ticket_id) if ticket_id is not None else None
+
+    def _active_rows_for_user(self, user_id):
+        columns = ', '.join(TicketRecord.__slots__)
+        placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+        return self._db.execute(
+            f'SELECT {columns} FROM tickets WHERE author_id = ? AND state IN ({placeholders})',
+            (user_id, *ACTIVE_STATES)
+        ).fetchall()
+
+    def open_for_user(self, user_id):
+        """Активные тикеты пользователя"""
+        if self.shared:
+            return [self._active.get(row[0]) or TicketRecord(*row) for row in self._active_rows_for_user(user_id)]
+        return [self._active[ticket_id] for ticket_id in self._by_user.get(user_id, ())]
+
+    def open_count_for_user(self, user_id):
+        if self.shared:
+            return len(self._active_rows_for_user(user_id))
+        return len(self._by_user.get(user_id, ()))
+
+    def can_open(self, user_id):
+        """Не превышен ли лимит открытых тикетов пользователя"""
+        return self.open_count_for_user(user_id) < self.max_open_per_user
+
+    def count(self, state):
+        """Количество тикетов в состоянии"""
+        if self.shared:
+            return self._db.execute('SELECT COUNT(*) FROM tickets WHERE state = ?', (state,)).fetchone()[0]
+        if state == CLOSED:
+            return self._closed_count
+        return len(self._by_state[state])
+
+    def active_in_category(self, category):
+        return [self._active[ticket_id] for ticket_id in self._by_category.get(category, ())]
+
+    def history_for_user(self, user_id, limit=20):
+        """Последние тикеты пользователя, включая закрытые (по индексу в SQLite)"""
+        columns = ', '.join(TicketRecord.__slots__)
+        rows = self._db.execute(
+            f'SELECT {columns} FROM tickets WHERE author_id = ? ORDER BY created_at DESC LIMIT ?',
+            (user_id, limit)
+        ).fetchall()
+        return [self._active.get(row[0]) or TicketRecord(*row) for row in rows]
+
+    def stats(self):
+        return {
+            'open': self.count(OPEN),
+            'in_progress': self.count(IN_PROGRESS),
+            'closed': self.count(CLOSED),
+            'users_with_tickets': len(self._by_user),
+        }
+
+    # ------------------------------------------------------------------
+    # Изменения
+
+    def create(self, ticket_id, author_id, author_name, minecraft_nick, category):
+        """
+        Регистрация нового тикета до создания канала: место в лимите пользователя
+        занимается сразу. Возвращает None, если лимит исчерпан
+        """
+        if ticket_id in self._active:
+            return self._active[ticket_id]
+
+        record = TicketRecord(ticket_id, None, author_id, author_name, minecraft_nick, category)
+        if self.shared:
+            # Проверка лимита и запись - одна транзакция: другой процесс не займёт место между ними
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                # Брошенные резервы упавших процессов освобождают место
+                self._reap_reservations(author_id)
+                if len(self._active_rows_for_user(author_id)) >= self.max_open_per_user:
+                    self._db.execute('ROLLBACK')
+                    return None
+                self._save(record)
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            self._index(record)
+            return record
+
+        if not self.can_open(author_id):
+            return None
+        self._index(record)
+        self._save(record)
+        return record
+
+    def attach_channel(self, ticket_id, channel_id):
+        record = self._active.get(ticket_id)
+        if record is None:
+            return None
+        record.channel_id = channel_id
+        self._by_channel[channel_id] = ticket_id
+        self._db.execute('UPDATE tickets SET channel_id = ? WHERE ticket_id = ?', (channel_id, ticket_id))
+        return record
+
+    def discard(self, ticket_id):
+        """Удаление тикета, канал которого так и не был создан"""
+        record = self._active.get(ticket_id)
+        if record is not None:
+            self._unindex(record)
+        self._db.execute('DELETE FROM tickets WHERE ticket_id = ?', (ticket_id,))
+
+    def assign(self, ticket_id, assignee_id):
+        """Тикет взят в работу"""
+        record = self._active.get(ticket_id)
+        if record is None or record.state != OPEN:
+            return None
+        self._by_state[OPEN].discard(ticket_id)
+        record.state = IN_PROGRESS
+        record.assignee_id = assignee_id
+        record.taken_at = time.time()
+        self._by_state[IN_PROGRESS].add(ticket_id)
+        self._save(record)
+        return record
+
+    def close(self, ticket_id, closed_by=None):
+        """Закрытие тикета: он уходит из индексов в памяти и остаётся в истории"""
+        record = self._active.get(ticket_id)
+        if record is None:
+            return None
+        self._unindex(record)
+        record.state = CLOSED
+        record.closed_at = time.time()
+        record.closed_by = closed_by
+        self._closed_count += 1
+        self._save(record)
+        return record
+
+    def channel_deleted(self, channel_id):
+        """Канал активного тикета удалён вручную - тикет считается закрытым"""
+        record = self.by_channel(channel_id)
+        if record is not None:
+            self.close(record.ticket_id)
+        return record
+
+def get_ticket_store(bot):
+    """Общее хранилище тикетов бота (создаётся при первом обращении)"""
+    store = getattr(bot, 'ticket_store', None)
+    if store is None:
+        store = TicketStore(shared=get_state_backend(bot).shared)
+        bot.ticket_store = store
+    return store
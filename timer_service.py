@@ -0,0 +1,223 @@
+"""
+Постоянный планировщик отложенных действий ("удалить канал X в момент T")
+Действия хранятся в SQLite, в памяти держится только время ближайшего срока.
+Один цикл таймера обрабатывает наступившие действия пачками; всё, что наступило
+за время простоя бота, выполняется при следующем запуске.
+Действие сервера выполняет процесс, обслуживающий шард этого сервера; пачка забирается
+на время аренды (срок переносится вперёд), поэтому два процесса не выполнят одно действие
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from config import TIMERS_DB_PATH, TIMER_BATCH_SIZE, TIMER_MAX_ATTEMPTS, STATE_LEASE_SECONDS, LIMONERICX_SERVER_ID
+
+logger = logging.getLogger(__name__)
+
+class TimerService:
+    """Очередь отложенных действий в SQLite с одним циклом обработки"""
+
+    # Максимальная пауза цикла: страховка от рассинхронизации часов
+    MAX_SLEEP = 300.0
+    # Задержка повтора после ошибки: RETRY_BASE * 2^попытка, не больше RETRY_MAX
+    RETRY_BASE = 30.0
+    RETRY_MAX = 3600.0
+
+    def __init__(self, path=TIMERS_DB_PATH, batch_size=TIMER_BATCH_SIZE, max_attempts=TIMER_MAX_ATTEMPTS,
+                 lease=STATE_LEASE_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._handlers = {}
+        self._scope = ''  # условие SQL на серверы шардов этого процесса
+        self._scope_params = ()
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._next_due = None
+        self._bot = None
+
+        # Метрики
+        self.executed = 0
+        self.failed = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS timers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                action TEXT NOT NULL,
+                due_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                key TEXT UNIQUE,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                guild_id INTEGER
+            )
+        ''')
+        # Действия, запланированные до поддержки шардов, относятся к основному серверу
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(timers)')}
+        if 'guild_id' not in columns:
+            self._db.execute('ALTER TABLE timers ADD COLUMN guild_id INTEGER')
+            self._db.execute('UPDATE timers SET guild_id = ?', (LIMONERICX_SERVER_ID,))
+        self._db.execute('CREATE INDEX IF NOT EXISTS timers_due_at ON timers (due_at)')
+
+    def register(self, action, handler):
+        """Регистрация обработчика: async handler(bot, payload)"""
+        self._handlers[action] = handler
+
+    def schedule(self, action, due_at, payload, key=None, guild_id=None):
+        """
+        Планирование действия на момент due_at (unix-время).
+        key делает запись уникальной: повторное планирование с тем же ключом переносит срок.
+        guild_id - сервер, в процессе которого выполнять действие (None - в любом)
+        """
+        raw = json.dumps(payload, ensure_ascii=False)
+        self._db.execute(
+            '''
+            INSERT INTO timers (action, due_at, payload, key, guild_id) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET action = excluded.action, due_at = excluded.due_at,
+                payload = excluded.payload, attempts = 0, guild_id = excluded.guild_id
+            ''',
+            (action, due_at, raw, key, guild_id)
+        )
+
+        # Будим цикл, только если новое действие раньше ближайшего
+        if self._next_due is None or due_at < self._next_due:
+            self._next_due = due_at
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Отмена запланированного действия по ключу"""
+        cursor = self._db.execute('DELETE FROM timers WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    @property
+    def pending(self):
+        return self._db.execute('SELECT COUNT(*) FROM timers').fetchone()[0]
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'executed': self.executed,
+            'failed': self.failed,
+            'next_due_in': None if self._next_due is None else max(0.0, self._next_due - time.time()),
+        }
+
+    async def start(self, bot):
+        """Запуск цикла таймера (повторный вызов ничего не делает)"""
+        self._bot = bot
+        # Процесс с частью шардов выполняет только действия своих серверов
+        shard_ids = getattr(bot, 'shard_ids', None)
+        if bot.shard_count and shard_ids is not None:
+            placeholders = ', '.join('?' for _ in shard_ids)
+            self._scope = f'AND (guild_id IS NULL OR (guild_id >> 22) % ? IN ({placeholders}))'
+            self._scope_params = (bot.shard_count, *shard_ids)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f'Таймер отложенных действий запущен, ожидает: {self.pending}')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._db.close()
+
+    def _refresh_next_due(self):
+        row = self._db.execute(f'SELECT MIN(due_at) FROM timers WHERE 1 {self._scope}', self._scope_params).fetchone()
+        self._next_due = row[0]
+
+    async def _run(self):
+        """Основной цикл: спим до ближайшего срока, затем обрабатываем наступившие действия пачками"""
+        while True:
+            try:
+                self._refresh_next_due()
+                now = time.time()
+
+                if self._next_due is not None and self._next_due <= now:
+                    await self._process_batch(now)
+                    continue
+
+                timeout = self.MAX_SLEEP if self._next_due is None else min(self.MAX_SLEEP, self._next_due - now)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка в цикле таймера: {e}')
+                await asyncio.sleep(5)
+
+    async def _process_batch(self, now):
+        """Выполнение одной пачки наступивших действий"""
+        # Пачка забирается одним UPDATE: срок переносится на время аренды, и другой процесс
+        # её не возьмёт; если процесс упадёт, действия выполнятся после окончания аренды
+        rows = self._db.execute(
+            f'''
+            UPDATE timers SET due_at = ? WHERE id IN (
+                SELECT id FROM timers WHERE due_at <= ? {self._scope} ORDER BY due_at LIMIT ?
+            )
+            RETURNING id, action, payload, attempts
+            ''',
+            (now + self.lease, now, *self._scope_params, self.batch_size)
+        ).fetchall()
+
+        results = await asyncio.gather(
+            *(self._execute(action, payload) for _, action, payload, _ in rows),
+            return_exceptions=True
+        )
+
+        done = []
+        retry = []
+        for (timer_id, action, _, attempts), result in zip(rows, results):
+            if not isinstance(result, Exception):
+                self.executed += 1
+                done.append((timer_id,))
+                continue
+
+            self.failed += 1
+            attempts += 1
+            if attempts >= self.max_attempts:
+                logger.error(f'Отложенное действие {action} ({timer_id}) не выполнено после {attempts} попыток: {result}')
+                done.append((timer_id,))
+            else:
+                delay = min(self.RETRY_MAX, self.RETRY_BASE * 2 ** (attempts - 1))
+                logger.warning(f'Ошибка отложенного действия {action} ({timer_id}), повтор через {delay:.0f} с: {result}')
+                retry.append((now + delay, attempts, timer_id))
+
+        # Результаты пачки записываются одной транзакцией
+        self._db.execute('BEGIN')
+        try:
+            self._db.executemany('DELETE FROM timers WHERE id = ?', done)
+            self._db.executemany('UPDATE timers SET due_at = ?, attempts = ? WHERE id = ?', retry)
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    async def _execute(self, action, payload):
+        handler = self._handlers.get(action)
+        if handler is None:
+            raise LookupError(f'нет обработчика для действия {action}')
+        await handler(self._bot, json.loads(payload))
+
+def get_timer_service(bot):
+    """Общий планировщик отложенных действий бота (создаётся при первом обращении)"""
+    timers = getattr(bot, 'timers', None)
+    if timers is None:
+        timers = TimerService()
+        bot.timers = timers
+    return timers
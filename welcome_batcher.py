@@ -0,0 +1,128 @@
+"""
+Объединение приветствий при массовых заходах на сервер
+Участник, зашедший в тишине, приветствуется сразу; те, кто зашёл в течение окна
+после предыдущей отправки, собираются и получают одно сообщение на всех
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WelcomeBatcher:
+    """Копит новых участников и отдаёт их пачками в callback отправки"""
+
+    def __init__(self, flush_callback, window=3.0, max_size=10, settings=None):
+        """
+        flush_callback - корутина, принимающая список участников одной пачки
+        window - сколько секунд после отправки собирать следующих участников в пачку
+        max_size - максимальное количество участников в одном сообщении
+        settings - функция ключ -> (window, max_size) для параметров своего ключа
+                   (например, из настроек сервера); None - у всех ключей общие значения
+        """
+        self.flush_callback = flush_callback
+        self.window = window
+        self.max_size = max(1, max_size)
+        self.settings = settings
+
+        self._pending = {}  # ключ (обычно ID сервера) -> список участников
+        self._timers = {}   # ключ -> задача отложенной отправки
+        self._last_flush = {}  # ключ -> время последней отправки (loop.time())
+
+        # Счётчики для оценки эффекта
+        self.joins_received = 0
+        self.messages_sent = 0
+        self.batches_sent = 0
+        self.sends_saved = 0  # сколько отдельных отправок заменено объединёнными
+        self.send_errors = 0
+
+    @property
+    def pending_count(self):
+        """Сколько участников ждёт отправки"""
+        return sum(len(members) for members in self._pending.values())
+
+    def stats(self):
+        """Текущие счётчики батчинга"""
+        return {
+            'joins_received': self.joins_received,
+            'messages_sent': self.messages_sent,
+            'batches_sent': self.batches_sent,
+            'sends_saved': self.sends_saved,
+            'send_errors': self.send_errors,
+            'pending': self.pending_count,
+        }
+
+    async def add(self, key, member):
+        """
+        Добавление участника в текущую пачку. Если отправка идёт сразу (тишина
+        или пачка заполнена), её ошибка передаётся вызывающему
+        """
+        self.joins_received += 1
+        pending = self._pending.setdefault(key, [])
+        pending.append(member)
+        window, max_size = self._settings(key)
+
+        # Пачка заполнена - отправляем сразу, не дожидаясь окна
+        if len(pending) >= max_size:
+            await self.flush(key)
+            return
+
+        if key in self._timers:
+            return
+        # Всплеска нет (с последней отправки прошло больше окна) - участник не ждёт окно
+        now = asyncio.get_running_loop().time()
+        wait = self._last_flush.get(key, float('-inf')) + window - now
+        if wait <= 0:
+            await self.flush(key)
+            return
+        self._timers[key] = asyncio.create_task(self._flush_later(key, wait))
+
+    def _settings(self, key):
+        """Окно и размер пачки для ключа"""
+        if self.settings is None:
+            return self.window, self.max_size
+        window, max_size = self.settings(key)
+        return window, max(1, max_size)
+
+    async def _flush_later(self, key, delay):
+        """Отправка пачки, когда закончится окно после предыдущей отправки"""
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        # Таймер больше не нужен - снимаем до отправки, чтобы flush его не отменил
+        self._timers.pop(key, None)
+        try:
+            await self.flush(key)
+        except Exception as e:
+            logger.error(f'Ошибка при отправке пачки приветствий: {e}')
+
+    async def flush(self, key):
+        """Немедленная отправка накопленной пачки; ошибка отправки передаётся вызывающему"""
+        timer = self._timers.pop(key, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+        members = self._pending.pop(key, None)
+        if not members:
+            return
+
+        self._last_flush[key] = asyncio.get_running_loop().time()
+        try:
+            await self.flush_callback(members)
+        except Exception:
+            self.send_errors += 1
+            raise
+        self.messages_sent += 1
+        if len(members) > 1:
+            self.batches_sent += 1
+            self.sends_saved += len(members) - 1
+            logger.info(f'Отправлено объединённое приветствие для {len(members)} участников')
+
+    async def flush_all(self):
+        """Отправка всех накопленных пачек (например, при остановке бота)"""
+        for key in list(self._pending):
+            try:
+                await self.flush(key)
+            except Exception as e:
+                logger.error(f'Ошибка при отправке пачки приветствий: {e}')